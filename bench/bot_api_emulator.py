@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lokal Telegram Bot API emulyatoru (offline end-to-end və yük testləri üçün).
+
+Botun istifadə etdiyi metodların alt çoxluğunu real HTTP üzərindən
+cavablandırır; bot BOT_API_BASE_URL ilə bura yönləndirilir və bütün httpx
+yığını (bağlantı pulu, timeout-lar, send scheduler, RetryAfter təkrarları)
+real şəbəkə ilə olduğu kimi işləyir.
+
+Metodlar: getMe, getUpdates (long polling), setWebhook / deleteWebhook /
+getWebhookInfo (webhook təyin olunubsa yeniliklər ona POST edilir),
+sendMessage, sendPhoto, sendDocument, editMessageText, editMessageCaption,
+editMessageReplyMarkup, answerCallbackQuery, getFile, fayl yükləmə;
+qalanları {"ok": true, "result": true} qaytarır.
+
+Xəta inyeksiyası:
+    --latency-ms / --jitter-ms   hər cavabdan əvvəl gecikmə
+    --flood                      Telegram limitləri: 30 mesaj/san ümumi,
+                                 şəxsi chat-a ~1/san, qrupa 20/dəq -> 429
+    --error-429 0.02             göndərişlərin təsadüfi payına 429 RetryAfter
+    --retry-after 3              429 cavablarında retry_after (san)
+    --migrate=-100123:-100999    köhnə qrup ID-sinə göndəriş -> 400 + migrate_to_chat_id
+
+İdarə API-si (/_emulator/...):
+    POST /_emulator/updates   yenilik(lər) əlavə et; tam Update JSON-u və ya
+                              qısa forma: {"user_id": 1, "text": "/start"},
+                              {"user_id": 1, "photo": "file-id"},
+                              {"user_id": 1, "data": "confirm", "message_id": 5, "chat_id": 1}
+    GET  /_emulator/stats     metod sayları, 429/miqrasiya sayları, növbə
+    GET  /_emulator/chats/ID  chat-a göndərilmiş son mesajlar
+    POST /_emulator/config    gecikmə/xəta parametrlərini iş zamanı dəyiş
+    POST /_emulator/reset     vəziyyəti sıfırla
+
+İstifadə:
+    python bench/bot_api_emulator.py --port 8081 --latency-ms 40 --flood
+    BOT_API_BASE_URL=http://127.0.0.1:8081/bot python run.py
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import tornado.web
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.httpserver import HTTPServer
+
+logger = logging.getLogger("bot-api-emulator")
+
+BOT_USER = {"id": 1000001, "is_bot": True, "first_name": "DSMF Emulator", "username": "dsmf_emulator_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+# 1x1 boz PNG - yüklənməmiş file_id-lər üçün
+_PLACEHOLDER_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010800000000"
+    "3a7e9b550000000a4944415478da63680000008200814a3c5b6e0000000049454e44ae426082"
+)
+_TEXT_PARAMS = {"text", "caption", "data", "callback_query_id", "file_id", "photo", "document", "url",
+                "secret_token", "parse_mode", "file_name"}
+_SEND_METHODS = {"sendMessage", "sendPhoto", "sendDocument", "editMessageText", "editMessageCaption",
+                 "editMessageReplyMarkup"}
+
+
+def _inline_markup(markup: Any) -> Optional[Dict[str, Any]]:
+    """Telegram mesajda yalnız inline klaviaturanı qaytarır (reply klaviaturası/remove yox)"""
+    if isinstance(markup, dict) and markup.get("inline_keyboard"):
+        return markup
+    return None
+
+
+class ApiError(Exception):
+    def __init__(self, code: int, description: str, parameters: Optional[Dict[str, Any]] = None):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+        self.parameters = parameters
+
+
+class EmulatorState:
+    """Emulyatorun bütün vəziyyəti (bir proses - bir bot)"""
+
+    def __init__(self, *, latency_ms: float = 0.0, jitter_ms: float = 0.0, flood: bool = False,
+                 error_429: float = 0.0, retry_after: int = 3, migrations: Optional[Dict[int, int]] = None,
+                 history: int = 200, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.flood = flood
+        self.error_429 = error_429
+        self.retry_after = retry_after
+        self.migrations: Dict[int, int] = dict(migrations or {})
+        self.history = history
+        self.rnd = random.Random(seed)
+        self.reset()
+
+    def reset(self) -> None:
+        self.updates: Deque[Dict[str, Any]] = deque()
+        self.next_update_id = 1
+        self._new_updates = asyncio.Event()
+        self.message_ids: Dict[int, int] = defaultdict(lambda: 100)
+        self.messages: Dict[int, Deque[Dict[str, Any]]] = defaultdict(lambda: deque(maxlen=self.history))
+        self.files: Dict[str, bytes] = {}
+        self.webhook: Optional[Tuple[str, Optional[str]]] = None
+        self.calls: Counter = Counter()
+        self.injected: Counter = Counter()
+        self._global_sends: Deque[float] = deque()
+        self._chat_sends: Dict[int, Deque[float]] = defaultdict(deque)
+        self.started = time.time()
+
+    # ---------- Yeniliklər ----------
+    def add_update(self, update: Dict[str, Any]) -> int:
+        update = dict(update)
+        update_id = update.get("update_id") or self.next_update_id
+        update["update_id"] = update_id
+        self.next_update_id = max(self.next_update_id, update_id + 1)
+        self.updates.append(update)
+        self._new_updates.set()
+        return update_id
+
+    async def wait_updates(self, offset: int, limit: int, timeout: float) -> List[Dict[str, Any]]:
+        # offset-dən kiçik yeniliklər təsdiqlənib - silinir
+        while self.updates and self.updates[0]["update_id"] < offset:
+            self.updates.popleft()
+        if not self.updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(self.updates)[:limit]
+
+    # ---------- Xəta inyeksiyası ----------
+    def check_send(self, method: str, chat_id: Optional[int]) -> None:
+        if chat_id is not None and chat_id in self.migrations:
+            self.injected["migrate"] += 1
+            raise ApiError(400, "Bad Request: group chat was upgraded to a supergroup chat",
+                           {"migrate_to_chat_id": self.migrations[chat_id]})
+        if self.error_429 and self.rnd.random() < self.error_429:
+            self._too_many(self.retry_after)
+        if self.flood and chat_id is not None:
+            now = time.monotonic()
+            self._limit(self._global_sends, now, 1.0, 30)
+            # Şəxsi chat: orta hesabla 1/san, qısa partlayışa (3) icazə var; qrup: 20/dəq
+            window, limit = (3.0, 3) if chat_id > 0 else (60.0, 20)
+            self._limit(self._chat_sends[chat_id], now, window, limit)
+            self._global_sends.append(now)
+            self._chat_sends[chat_id].append(now)
+
+    def _limit(self, sends: Deque[float], now: float, window: float, limit: int) -> None:
+        while sends and now - sends[0] >= window:
+            sends.popleft()
+        if len(sends) >= limit:
+            self._too_many(max(1, int(window - (now - sends[0]) + 0.999)))
+
+    def _too_many(self, retry_after: int) -> None:
+        self.injected["429"] += 1
+        raise ApiError(429, f"Too Many Requests: retry after {retry_after}", {"retry_after": retry_after})
+
+    async def delay(self) -> None:
+        if self.latency_ms or self.jitter_ms:
+            ms = max(0.0, self.latency_ms + self.rnd.uniform(-self.jitter_ms, self.jitter_ms))
+            await asyncio.sleep(ms / 1000)
+
+    # ---------- Mesajlar ----------
+    def _chat(self, chat_id: int) -> Dict[str, Any]:
+        if chat_id > 0:
+            return {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"}
+        return {"id": chat_id, "type": "supergroup" if str(chat_id).startswith("-100") else "group",
+                "title": f"chat{chat_id}"}
+
+    def store_message(self, chat_id: int, **fields) -> Dict[str, Any]:
+        fields["reply_markup"] = _inline_markup(fields.get("reply_markup"))
+        self.message_ids[chat_id] += 1
+        message = {"message_id": self.message_ids[chat_id], "date": int(time.time()),
+                   "chat": self._chat(chat_id), "from": BOT_USER}
+        message.update({k: v for k, v in fields.items() if v is not None})
+        self.messages[chat_id].append(message)
+        return message
+
+    def find_message(self, chat_id: int, message_id: int) -> Dict[str, Any]:
+        for message in reversed(self.messages.get(chat_id, ())):
+            if message["message_id"] == message_id:
+                return message
+        raise ApiError(400, "Bad Request: message to edit not found")
+
+    def register_file(self, data: bytes) -> str:
+        file_id = f"emu-{len(self.files) + 1}-{self.rnd.getrandbits(32):08x}"
+        self.files[file_id] = data
+        return file_id
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "calls": dict(self.calls.most_common()),
+            "injected": dict(self.injected),
+            "pending_updates": len(self.updates),
+            "chats": len(self.messages),
+            "webhook": self.webhook[0] if self.webhook else "",
+            "config": {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms, "flood": self.flood,
+                       "error_429": self.error_429, "retry_after": self.retry_after,
+                       "migrations": {str(k): v for k, v in self.migrations.items()}},
+        }
+
+
+# ---------- Qısa formadan Update ----------
+def build_update(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """{"user_id", "text"|"photo"|"data", ...} -> Bot API Update JSON-u"""
+    if "message" in spec or "callback_query" in spec or "update_id" in spec:
+        return spec
+    user_id = int(spec["user_id"])
+    chat_id = int(spec.get("chat_id", user_id))
+    user = {"id": user_id, "is_bot": False, "first_name": spec.get("first_name", "Test"),
+            "username": spec.get("username", f"user{user_id}")}
+    chat = {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"}
+    if "data" in spec:
+        message: Dict[str, Any] = {"message_id": int(spec.get("message_id", 1)), "date": int(time.time()),
+                                   "chat": chat, "from": BOT_USER}
+        if spec.get("caption") is not None:
+            message["caption"] = spec["caption"]
+        else:
+            message["text"] = spec.get("message_text", "…")
+        return {"callback_query": {"id": str(random.getrandbits(48)), "chat_instance": str(chat_id),
+                                   "from": user, "data": spec["data"], "message": message}}
+    message = {"message_id": random.randrange(1, 1 << 30), "date": int(time.time()), "chat": chat, "from": user}
+    if "photo" in spec:
+        file_id = spec["photo"]
+        message["photo"] = [{"file_id": file_id, "file_unique_id": f"u{file_id}", "width": 640, "height": 480}]
+    else:
+        text = spec.get("text", "")
+        message["text"] = text
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"message": message}
+
+
+# ---------- HTTP ----------
+class _Base(tornado.web.RequestHandler):
+    def initialize(self, state: EmulatorState) -> None:
+        self.state = state
+
+    def check_xsrf_cookie(self) -> None:
+        pass
+
+    def _json_body(self) -> Any:
+        return json.loads(self.request.body or b"{}")
+
+
+class BotApiHandler(_Base):
+    """POST/GET /bot<token>/<method>"""
+
+    def _params(self) -> Dict[str, Any]:
+        content_type = self.request.headers.get("Content-Type", "")
+        if content_type.startswith("application/json"):
+            return self._json_body()
+        params: Dict[str, Any] = {k: v[-1].decode() for k, v in self.request.arguments.items()}
+        # Sətir olmayan dəyərlər JSON kimi göndərilir (reply_markup, chat_id və s.); mətn sahələri olduğu kimi
+        for key, value in list(params.items()):
+            if key in _TEXT_PARAMS:
+                continue
+            if value[:1] in ("{", "[") or value.lstrip("-").isdigit() or value in ("true", "false"):
+                try:
+                    params[key] = json.loads(value)
+                except ValueError:
+                    pass
+        for key, files in self.request.files.items():
+            params[key] = self.state.register_file(files[0]["body"])
+        return params
+
+    async def get(self, token: str, method: str) -> None:
+        await self.post(token, method)
+
+    async def post(self, token: str, method: str) -> None:
+        state = self.state
+        state.calls[method] += 1
+        await state.delay()
+        try:
+            params = self._params()
+            result = await self._dispatch(method, params)
+        except ApiError as e:
+            body: Dict[str, Any] = {"ok": False, "error_code": e.code, "description": e.description}
+            if e.parameters:
+                body["parameters"] = e.parameters
+            self.set_status(e.code)
+            self.finish(body)
+            return
+        self.finish({"ok": True, "result": result})
+
+    async def _dispatch(self, method: str, p: Dict[str, Any]) -> Any:
+        state = self.state
+        chat_id = int(p["chat_id"]) if "chat_id" in p and str(p["chat_id"]).lstrip("-").isdigit() else None
+        if method in _SEND_METHODS:
+            state.check_send(method, chat_id)
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            if state.webhook:
+                raise ApiError(409, "Conflict: can't use getUpdates method while webhook is active")
+            return await state.wait_updates(int(p.get("offset") or 0), int(p.get("limit") or 100),
+                                            float(p.get("timeout") or 0))
+        if method == "setWebhook":
+            state.webhook = (p.get("url", ""), p.get("secret_token"))
+            if p.get("drop_pending_updates"):
+                state.updates.clear()
+            return True
+        if method == "deleteWebhook":
+            state.webhook = None
+            if p.get("drop_pending_updates"):
+                state.updates.clear()
+            return True
+        if method == "getWebhookInfo":
+            return {"url": state.webhook[0] if state.webhook else "", "has_custom_certificate": False,
+                    "pending_update_count": len(state.updates)}
+        if method == "sendMessage":
+            return state.store_message(chat_id, text=p.get("text", ""), reply_markup=p.get("reply_markup"))
+        if method == "sendPhoto":
+            file_id = p.get("photo")
+            photo = [{"file_id": file_id, "file_unique_id": f"u{file_id}", "width": 640, "height": 480}]
+            return state.store_message(chat_id, photo=photo, caption=p.get("caption"),
+                                       reply_markup=p.get("reply_markup"))
+        if method == "sendDocument":
+            file_id = p.get("document")
+            return state.store_message(chat_id, caption=p.get("caption"),
+                                       document={"file_id": file_id, "file_unique_id": f"u{file_id}",
+                                                 "file_name": "document"})
+        if method in ("editMessageText", "editMessageCaption", "editMessageReplyMarkup"):
+            if chat_id is None:
+                return True  # inline mesaj
+            message = state.find_message(chat_id, int(p.get("message_id", 0)))
+            field = {"editMessageText": "text", "editMessageCaption": "caption"}.get(method)
+            new_markup = _inline_markup(p.get("reply_markup"))
+            if (field is None or message.get(field) == p.get(field)) and message.get("reply_markup") == new_markup:
+                raise ApiError(400, "Bad Request: message is not modified: specified new message content and "
+                                    "reply markup are exactly the same as a current content and reply markup "
+                                    "of the message")
+            if field is not None:
+                message[field] = p.get(field, "")
+            if new_markup is None:
+                message.pop("reply_markup", None)
+            else:
+                message["reply_markup"] = new_markup
+            message["edit_date"] = int(time.time())
+            return message
+        if method == "getFile":
+            file_id = p.get("file_id", "")
+            return {"file_id": file_id, "file_unique_id": f"u{file_id}", "file_path": f"photos/{file_id}.jpg",
+                    "file_size": len(state.files.get(file_id, _PLACEHOLDER_PNG))}
+        return True
+
+
+class FileHandler(_Base):
+    """GET /file/bot<token>/<path>"""
+
+    async def get(self, token: str, path: str) -> None:
+        await self.state.delay()
+        file_id = path.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        self.set_header("Content-Type", "application/octet-stream")
+        self.finish(self.state.files.get(file_id, _PLACEHOLDER_PNG))
+
+
+class UpdatesControl(_Base):
+    async def post(self) -> None:
+        body = self._json_body()
+        specs = body if isinstance(body, list) else [body]
+        ids = [self.state.add_update(build_update(spec)) for spec in specs]
+        self.finish({"update_ids": ids})
+
+
+class StatsControl(_Base):
+    def get(self) -> None:
+        self.finish(self.state.stats())
+
+
+class ChatControl(_Base):
+    def get(self, chat_id: str) -> None:
+        self.finish({"messages": list(self.state.messages.get(int(chat_id), ()))})
+
+
+class ConfigControl(_Base):
+    def post(self) -> None:
+        body = self._json_body()
+        for key in ("latency_ms", "jitter_ms", "error_429"):
+            if key in body:
+                setattr(self.state, key, float(body[key]))
+        if "retry_after" in body:
+            self.state.retry_after = int(body["retry_after"])
+        if "flood" in body:
+            self.state.flood = bool(body["flood"])
+        if "migrations" in body:
+            self.state.migrations = {int(k): int(v) for k, v in body["migrations"].items()}
+        self.finish(self.state.stats()["config"])
+
+
+class ResetControl(_Base):
+    def post(self) -> None:
+        self.state.reset()
+        self.finish({"ok": True})
+
+
+async def push_webhook(state: EmulatorState, stop: asyncio.Event) -> None:
+    """Webhook təyin olunubsa yeniliklər ardıcıl POST edilir (Telegram kimi, biri bitməmiş növbəti yox)"""
+    client = AsyncHTTPClient()
+    while not stop.is_set():
+        if not state.webhook or not state.updates:
+            state._new_updates.clear()
+            try:
+                await asyncio.wait_for(state._new_updates.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        url, secret = state.webhook
+        update = state.updates[0]
+        headers = {"Content-Type": "application/json"}
+        if secret:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+        try:
+            await client.fetch(HTTPRequest(url, method="POST", body=json.dumps(update), headers=headers,
+                                           request_timeout=60))
+            if state.updates and state.updates[0] is update:
+                state.updates.popleft()
+        except Exception as e:
+            logger.warning("Webhook çatdırılmadı (%s), 1 san sonra təkrar", e)
+            await asyncio.sleep(1)
+
+
+def make_app(state: EmulatorState) -> tornado.web.Application:
+    kw = {"state": state}
+    return tornado.web.Application([
+        (r"/bot([^/]+)/(\w+)", BotApiHandler, kw),
+        (r"/file/bot([^/]+)/(.+)", FileHandler, kw),
+        (r"/_emulator/updates", UpdatesControl, kw),
+        (r"/_emulator/stats", StatsControl, kw),
+        (r"/_emulator/chats/(-?\d+)", ChatControl, kw),
+        (r"/_emulator/config", ConfigControl, kw),
+        (r"/_emulator/reset", ResetControl, kw),
+    ])
+
+
+async def serve(state: EmulatorState, host: str, port: int, stop: Optional[asyncio.Event] = None) -> None:
+    """Emulyatoru işə sal; stop verilməyibsə əbədi işləyir"""
+    stop = stop or asyncio.Event()
+    server = HTTPServer(make_app(state), idle_connection_timeout=120)
+    server.listen(port, address=host)
+    pusher = asyncio.create_task(push_webhook(state, stop))
+    logger.info("🤖 Bot API emulyatoru: http://%s:%s/bot (BOT_API_BASE_URL)", host, port)
+    try:
+        await stop.wait()
+    finally:
+        pusher.cancel()
+        server.stop()
+        await server.close_all_connections()
+
+
+def _parse_migrations(values: List[str]) -> Dict[int, int]:
+    result = {}
+    for value in values:
+        old, _, new = value.partition(":")
+        result[int(old)] = int(new)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lokal Telegram Bot API emulyatoru")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--flood", action="store_true", help="Telegram göndəriş limitlərini tətbiq et")
+    parser.add_argument("--error-429", type=float, default=0.0, help="təsadüfi 429 payı (0..1)")
+    parser.add_argument("--retry-after", type=int, default=3)
+    parser.add_argument("--migrate", action="append", default=[], metavar="OLD:NEW",
+                        help="köhnə qrup ID-sinə göndəriş miqrasiya xətası qaytarır (--migrate=-100…:-100…)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    logging.getLogger("tornado.access").setLevel(logging.WARNING)
+
+    async def _run() -> None:
+        state = EmulatorState(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, flood=args.flood,
+                              error_429=args.error_429, retry_after=args.retry_after,
+                              migrations=_parse_migrations(args.migrate), seed=args.seed)
+        await serve(state, args.host, args.port)
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Söhbət yük benchmark-ı: real build_app() handler-ləri şəbəkəsiz Bot API ilə.
+
+N vətəndaş paralel olaraq tam anketi keçir (start → ad → telefon → FIN →
+vəsiqə şəkli → növ → mətn → təsdiq), M icraçı isə qrupa düşən müraciətləri
+cavablandırır və ya imtina edir. Yeniliklər Application.update_queue-yə
+qoyulur və real PerUserUpdateProcessor, ConversationHandler, persistence,
+send scheduler və DB funksiyalarından keçir; Bot API sorğularını şəbəkəyə
+çıxmadan FakeBotApi cavablandırır.
+
+Gecikmə: yeniliyin növbəyə qoyulmasından bütün handler qruplarının
+bitməsinə qədər (ən sonuncu qrupda ölçü handler-i). Hər backend ayrıca
+prosesdə işləyir - backend seçimi bot modulu import olunarkən edilir.
+
+Backend-lər:
+    sqlite      FORCE_SQLITE, diskdə fayl
+    sqlalchemy  db_operations (PostgreSQL kodu) SQLite URL ilə - Docker-siz əvəzçi
+    memory      FORCE_SQLITE, fayl /dev/shm-də (disk I/O xaric)
+
+İstifadə:
+    python bench/conversation_load.py [--citizens 200] [--executors 10]
+        [--backend all|sqlite|sqlalchemy|memory] [--think-ms 0] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+BACKENDS = ("sqlite", "sqlalchemy", "memory")
+EXECUTOR_CHAT_ID = -1009990000001
+CITIZEN_BASE = 7_000_000_000
+EXECUTOR_BASE = 8_000_000_000
+_EXEC_BUTTON = re.compile(r"exec_reply:(\d+)")
+_BODY = "Pensiya təyinatı ilə bağlı müraciətim cavablandırılmayıb, xahiş edirəm araşdırasınız. "
+
+
+# ---------- Şəbəkəsiz Bot API ----------
+def _fake_photo(seed: str) -> bytes:
+    """Hər file_id üçün fərqli kiçik PNG (photo_hash/media_store açıq olduqda)"""
+    import io
+    from PIL import Image
+    rnd = random.Random(seed)
+    img = Image.new("L", (64, 64))
+    img.putdata([rnd.randrange(256) for _ in range(64 * 64)])
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+class FakeBotApi:
+    """telegram.request.BaseRequest əvəzi: sorğuları yazır, şablon cavab qaytarır"""
+
+    def __init__(self, on_send: Optional[Callable[[str, Dict[str, Any], int], None]] = None):
+        from telegram.request import BaseRequest
+
+        outer = self
+
+        class _Request(BaseRequest):
+            @property
+            def read_timeout(self) -> Optional[float]:
+                return None
+
+            async def initialize(self) -> None:
+                pass
+
+            async def shutdown(self) -> None:
+                pass
+
+            async def do_request(self, url, method, request_data=None, *args, **kwargs) -> Tuple[int, bytes]:
+                return outer._handle(url, request_data)
+
+        self.request = _Request()
+        self.calls: Counter = Counter()
+        self._on_send = on_send
+        self._message_id = 1000
+        self.last_message: Dict[int, int] = {}
+
+    def _handle(self, url: str, request_data) -> Tuple[int, bytes]:
+        if "/file/bot" in url:
+            self.calls["downloadFile"] += 1
+            return 200, _fake_photo(url)
+        method = url.rsplit("/", 1)[-1]
+        self.calls[method] += 1
+        params = request_data.parameters if request_data is not None else {}
+        result: Any = True
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "dsmf_bench_bot"}
+        elif method in ("sendMessage", "sendPhoto", "sendDocument"):
+            self._message_id += 1
+            chat_id = int(params.get("chat_id", 0))
+            self.last_message[chat_id] = self._message_id
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            }
+            if method == "sendPhoto":
+                result["caption"] = params.get("caption", "")
+                result["photo"] = [{"file_id": params.get("photo"), "file_unique_id": "u", "width": 64, "height": 64}]
+            else:
+                result["text"] = params.get("text", "")
+            if self._on_send is not None:
+                self._on_send(method, params, self._message_id)
+        elif method == "getFile":
+            file_id = params.get("file_id", "")
+            result = {"file_id": file_id, "file_unique_id": "u" + file_id, "file_path": f"photos/{file_id}.png"}
+        elif method == "getUpdates":
+            result = []
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+# ---------- Sintetik yeniliklər ----------
+class Driver:
+    def __init__(self, app, api: FakeBotApi, think_ms: float, timeout: float):
+        self.app = app
+        self.api = api
+        self.think = think_ms / 1000
+        self.timeout = timeout
+        self._update_id = 0
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.timeouts = 0
+
+    async def on_done(self, update, context) -> None:
+        fut = self._waiting.pop(update.update_id, None)
+        if fut is not None and not fut.done():
+            fut.set_result(time.perf_counter())
+
+    def _user(self, uid: int) -> Dict[str, Any]:
+        return {"id": uid, "is_bot": False, "first_name": "Bench", "username": f"u{uid}"}
+
+    def message(self, uid: int, text: Optional[str] = None, photo: Optional[str] = None) -> Dict[str, Any]:
+        m: Dict[str, Any] = {
+            "message_id": random.randrange(1, 1 << 30),
+            "date": int(time.time()),
+            "chat": {"id": uid, "type": "private"},
+            "from": self._user(uid),
+        }
+        if photo:
+            m["photo"] = [{"file_id": photo, "file_unique_id": "u" + photo, "width": 64, "height": 64}]
+        else:
+            m["text"] = text
+            if text and text.startswith("/"):
+                m["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"message": m}
+
+    def callback(self, uid: int, data: str, chat_id: int, message_id: int,
+                 caption: Optional[str] = None, photo: Optional[str] = None) -> Dict[str, Any]:
+        msg: Dict[str, Any] = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+        }
+        if photo:
+            msg["photo"] = [{"file_id": photo, "file_unique_id": "u" + photo, "width": 64, "height": 64}]
+            msg["caption"] = caption or ""
+        else:
+            msg["text"] = caption or "…"
+        return {"callback_query": {
+            "id": str(random.randrange(1 << 40)), "chat_instance": "bench", "data": data,
+            "from": self._user(uid), "message": msg,
+        }}
+
+    async def send(self, step: str, payload: Dict[str, Any]) -> None:
+        from telegram import Update
+
+        if self.think:
+            await asyncio.sleep(random.uniform(0, self.think))
+        self._update_id += 1
+        payload["update_id"] = self._update_id
+        update = Update.de_json(payload, self.app.bot)
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting[self._update_id] = fut
+        started = time.perf_counter()
+        await self.app.update_queue.put(update)
+        try:
+            finished = await asyncio.wait_for(fut, self.timeout)
+        except asyncio.TimeoutError:
+            self._waiting.pop(self._update_id, None)
+            self.timeouts += 1
+            return
+        self.latencies[step].append(finished - started)
+
+
+async def citizen(d: Driver, i: int) -> None:
+    uid = CITIZEN_BASE + i
+    photo = f"bench-photo-{i}"
+    await d.send("start", d.message(uid, "/start"))
+    await d.send("fullname", d.message(uid, f"Məmmədov Əli{i} Rəşid oğlu"))
+    await d.send("phone", d.message(uid, f"+99450{i % 10_000_000:07d}"))
+    await d.send("fin", d.message(uid, f"{i:07X}"[-7:]))
+    await d.send("id_photo", d.message(uid, photo=photo))
+    form_type = ("type_complaint", "type_suggestion", "type_application")[i % 3]
+    await d.send("form_type", d.callback(uid, form_type, uid, d.api.last_message.get(uid, 1)))
+    await d.send("body", d.message(uid, f"{i}: " + _BODY * 2))
+    await d.send("confirm", d.callback(uid, "confirm", uid, d.api.last_message.get(uid, 1)))
+
+
+async def executor(d: Driver, n: int, work: "asyncio.Queue", reject_every: int) -> None:
+    uid = EXECUTOR_BASE + n
+    while True:
+        item = await work.get()
+        if item is None:
+            work.task_done()
+            return
+        app_id, message_id, caption, photo = item
+        try:
+            reject = reject_every > 0 and app_id % reject_every == 0
+            action = "exec_reject" if reject else "exec_reply"
+            await d.send(f"{action}_open", d.callback(
+                uid, f"{action}:{app_id}", EXECUTOR_CHAT_ID, message_id, caption=caption, photo=photo,
+            ))
+            text = "Səbəb: sənədlər natamamdır" if reject else "Müraciətiniz araşdırıldı, pensiya təyin olundu."
+            await d.send(action, d.message(uid, text))
+        finally:
+            work.task_done()
+
+
+# ---------- Ölçmə ----------
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def _rss_mb() -> float:
+    try:
+        import resource
+        # Linux-da KB, macOS-da bayt
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return 0.0
+
+
+class _ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.count += 1
+
+
+def _backend_env(backend: str, workdir: str) -> Dict[str, str]:
+    env = {}
+    if backend == "sqlalchemy":
+        env["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench_sa.db")
+        env["FORCE_SQLITE"] = "0"
+        env["DB_MODE"] = ""
+    else:
+        env["FORCE_SQLITE"] = "1"
+        env["SQLITE_DB_PATH"] = os.path.join(workdir, "bench.db")
+    return env
+
+
+async def _run(args) -> Dict[str, Any]:
+    import bot
+    from telegram import Update
+    from telegram.ext import TypeHandler
+
+    errors = _ErrorCounter()
+    logging.getLogger().addHandler(errors)
+    if bot.USE_SQLITE:
+        bot.init_sqlite_db()
+    else:
+        bot.init_db()
+
+    work: "asyncio.Queue" = asyncio.Queue()
+    submitted = 0
+
+    def on_send(method: str, params: Dict[str, Any], message_id: int) -> None:
+        nonlocal submitted
+        if int(params.get("chat_id", 0)) != EXECUTOR_CHAT_ID:
+            return
+        m = _EXEC_BUTTON.search(json.dumps(params.get("reply_markup") or {}))
+        if m:
+            submitted += 1
+            work.put_nowait((int(m.group(1)), message_id, params.get("caption") or params.get("text"),
+                             params.get("photo")))
+
+    api = FakeBotApi(on_send)
+    app = bot.build_app(request=api.request)
+    driver = Driver(app, api, args.think_ms, args.timeout)
+    # Ən son qrup: bütün handler-lər bitdikdən sonra gecikmə qeyd olunur
+    app.add_handler(TypeHandler(Update, driver.on_done), group=1000)
+
+    rss_before = _rss_mb()
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+
+    started = time.perf_counter()
+    executors = [asyncio.create_task(executor(driver, n, work, args.reject_every)) for n in range(args.executors)]
+    await asyncio.gather(*(citizen(driver, i) for i in range(args.citizens)))
+    citizens_done = time.perf_counter()
+    await work.join()
+    for _ in executors:
+        work.put_nowait(None)
+    await asyncio.gather(*executors)
+    finished = time.perf_counter()
+
+    await app.stop()
+    if app.post_stop:
+        await app.post_stop(app)
+    await app.shutdown()
+    logging.getLogger().removeHandler(errors)
+
+    all_latencies = [v for values in driver.latencies.values() for v in values]
+    citizen_seconds = citizens_done - started
+    return {
+        "backend": args.backend,
+        "citizens": args.citizens,
+        "executors": args.executors,
+        "submissions": submitted,
+        "submissions_per_sec": round(submitted / citizen_seconds, 2) if citizen_seconds else 0.0,
+        "updates": len(all_latencies),
+        "updates_per_sec": round(len(all_latencies) / (finished - started), 2),
+        "wall_seconds": round(finished - started, 3),
+        "p50_ms": round(_pct(all_latencies, 0.5) * 1000, 2),
+        "p99_ms": round(_pct(all_latencies, 0.99) * 1000, 2),
+        "steps": {
+            step: {
+                "n": len(values),
+                "p50_ms": round(_pct(values, 0.5) * 1000, 2),
+                "p99_ms": round(_pct(values, 0.99) * 1000, 2),
+                "max_ms": round(max(values) * 1000, 2),
+            }
+            for step, values in driver.latencies.items()
+        },
+        "rss_peak_mb": round(_rss_mb(), 1),
+        "rss_growth_mb": round(_rss_mb() - rss_before, 1),
+        "api_calls": dict(api.calls.most_common()),
+        "timeouts": driver.timeouts,
+        "errors": errors.count,
+    }
+
+
+def run_backend(args) -> Dict[str, Any]:
+    """Bir backend-i bu prosesdə işlət (env bot import olunmazdan əvvəl qurulur)"""
+    base = "/dev/shm" if args.backend == "memory" and os.path.isdir("/dev/shm") else None
+    workdir = tempfile.mkdtemp(prefix="dsmf-bench-", dir=base)
+    try:
+        os.environ.update(_backend_env(args.backend, workdir))
+        for key, value in {
+            "BOT_TOKEN": "0:bench",
+            "EXECUTOR_CHAT_ID": str(EXECUTOR_CHAT_ID),
+            "SEND_RATE_LIMIT": "0",
+            "HTTP_SERVER": "0",
+            "LOG_LEVEL": "WARNING",
+            "PHOTO_HASH": "1" if args.media else "0",
+            "MEDIA_STORE": "1" if args.media else "0",
+            "MEDIA_DIR": os.path.join(workdir, "media"),
+        }.items():
+            os.environ.setdefault(key, value)
+        os.environ.pop("BOT_API_BASE_URL", None)
+        return asyncio.run(_run(args))
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _print_report(results: List[Dict[str, Any]]) -> None:
+    print(f"{'backend':<11} {'subs':>6} {'subs/s':>8} {'upd/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'RSS MB':>7} {'+RSS':>6} {'xəta':>5}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<11} ❌ {r['error']}")
+            continue
+        print(f"{r['backend']:<11} {r['submissions']:>6} {r['submissions_per_sec']:>8} {r['updates_per_sec']:>8} "
+              f"{r['p50_ms']:>8} {r['p99_ms']:>8} {r['rss_peak_mb']:>7} {r['rss_growth_mb']:>6} "
+              f"{r['errors'] + r['timeouts']:>5}")
+    for r in results:
+        if "steps" not in r:
+            continue
+        print(f"\n{r['backend']}: addımlar üzrə gecikmə")
+        for step, s in r["steps"].items():
+            print(f"  {step:<18} n={s['n']:<6} p50={s['p50_ms']:>8} ms  p99={s['p99_ms']:>8} ms  max={s['max_ms']:>8} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Söhbət yük benchmark-ı (şəbəkəsiz)")
+    parser.add_argument("--backend", choices=BACKENDS + ("all",), default="all")
+    parser.add_argument("--citizens", type=int, default=200)
+    parser.add_argument("--executors", type=int, default=10)
+    parser.add_argument("--think-ms", type=float, default=0.0, help="addımlar arası təsadüfi fasilə (0..N ms)")
+    parser.add_argument("--reject-every", type=int, default=5, help="hər N-ci müraciət imtina edilir (0 = heç biri)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="bir yeniliyin maksimum gözləmə müddəti (san)")
+    parser.add_argument("--media", action="store_true", help="PHOTO_HASH və MEDIA_STORE açıq")
+    parser.add_argument("--keep", action="store_true", help="müvəqqəti DB fayllarını silmə")
+    parser.add_argument("--json", action="store_true", help="nəticəni JSON kimi çap et")
+    args = parser.parse_args()
+
+    if args.backend != "all":
+        results = [run_backend(args)]
+    else:
+        results = []
+        for backend in BACKENDS:
+            cmd = [sys.executable, os.path.abspath(__file__), "--backend", backend, "--json"]
+            for flag in ("citizens", "executors", "think_ms", "reject_every", "timeout"):
+                cmd += ["--" + flag.replace("_", "-"), str(getattr(args, flag))]
+            cmd += [f for f, on in (("--media", args.media), ("--keep", args.keep)) if on]
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True)
+            try:
+                results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            except (IndexError, ValueError):
+                results.append({"backend": backend, "error": f"exit code {proc.returncode}"})
+
+    if args.json:
+        print(json.dumps(results[0] if len(results) == 1 else results, ensure_ascii=False))
+    else:
+        _print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Qaralama yaddaş benchmark-ı: köhnə ApplicationData (dataclass + subject)
+ilə yığcam drafts.ApplicationData müqayisəsi.
+
+İstifadə:
+    python bench/draft_memory.py [--n 100000]
+"""
+import argparse
+import os
+import pickle
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+from config import BAKU_TZ  # noqa: E402
+from drafts import ApplicationData, FormType  # noqa: E402
+
+
+@dataclass
+class LegacyApplicationData:
+    """Dəyişiklikdən əvvəlki forma (müqayisə üçün)"""
+    fullname: Optional[str] = None
+    phone: Optional[str] = None
+    fin: Optional[str] = None
+    id_photo_file_id: Optional[str] = None
+    form_type: Optional[FormType] = None
+    subject: Optional[str] = None
+    body: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+
+_BODY = "Pensiya təyinatı ilə bağlı müraciətim hələ də cavablandırılmayıb, xahiş edirəm araşdırasınız. "
+_TYPES = list(FormType)
+
+
+def _fields(i: int, base: datetime) -> dict:
+    # Hər qaralama üçün unikal sətirlər (real istifadədə olduğu kimi)
+    body = f"{i}: " + _BODY * 2
+    return {
+        "fullname": f"Məmmədov Əli{i} Rəşid oğlu",
+        "phone": f"+99450{i:07d}",
+        "fin": f"{i:07X}"[-7:],
+        "id_photo_file_id": f"AgACAgIAAxkBAAI{i:012d}QWERTYUIOPASDFGHJKLZXCVBNM",
+        "form_type": _TYPES[i % 3],
+        "body": body,
+        "timestamp": base + timedelta(seconds=i),
+    }
+
+
+def measure(label: str, factory, n: int) -> dict:
+    base = datetime.now(BAKU_TZ)
+    raw = [_fields(i, base) for i in range(n)]
+    tracemalloc.start()
+    snap0 = tracemalloc.take_snapshot()
+    drafts = [factory(f) for f in raw]
+    snap1 = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # Xam sahə sətirləri hər iki variantda eynidir; yalnız obyektin özü və törəmə sətirlər sayılır
+    allocated = sum(s.size_diff for s in snap1.compare_to(snap0, "filename"))
+    pickled = sum(len(pickle.dumps(d, protocol=pickle.HIGHEST_PROTOCOL)) for d in drafts[:1000]) / min(n, 1000)
+    del drafts
+    return {"label": label, "bytes_per_draft": allocated / n, "pickle_bytes": pickled}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=100_000)
+    args = parser.parse_args()
+
+    def legacy(f: dict) -> LegacyApplicationData:
+        return LegacyApplicationData(subject=f["body"][:150], **f)
+
+    def compact(f: dict) -> ApplicationData:
+        return ApplicationData(**f)
+
+    rows = [measure("köhnə (dataclass + subject)", legacy, args.n), measure("yığcam (slots)", compact, args.n)]
+    print(f"{args.n} qaralama:")
+    for r in rows:
+        print(f"  {r['label']:<30} {r['bytes_per_draft']:8.0f} B/qaralama   pickle: {r['pickle_bytes']:6.0f} B")
+    saved = 1 - rows[1]["bytes_per_draft"] / rows[0]["bytes_per_draft"]
+    print(f"  Qənaət: {saved * 100:.0f}% ({(rows[0]['bytes_per_draft'] - rows[1]['bytes_per_draft']) * args.n / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Qeyd olunmuş (anonimləşdirilmiş) yenilik axınının təkrarı: real build_app() ilə.
+
+UPDATE_RECORD_FILE ilə yazılmış gzip JSON lines faylı oxunur və yeniliklər
+Application.update_queue-yə orijinal fasilələrlə, sürətləndirilmiş və ya
+maksimum sürətlə qoyulur. Bot API sorğularını conversation_load.FakeBotApi
+cavablandırır, DB hər dəfə təmiz başlayır.
+
+Sürət:
+    --speed 1     orijinal tempdə (elan sonrası partlayışlar, icraçıların
+                  toplu cavabları olduğu kimi)
+    --speed 20    20 dəfə sürətli
+    --speed 0     gözləmədən (maksimal ötürmə qabiliyyəti)
+Uzun boşluqlar --max-gap-s ilə qısaldılır.
+
+Müraciət ID-ləri: qeyddəki exec_reply:/exec_reject:/edit_reply: callback-ləri
+və /start reply_<id>|reject_<id> deep link-lərindəki ID-lər replay zamanı yaranan müraciətlərə ilk istifadədə, yaranma sırası ilə
+bağlanır (hələ yaranmayıbsa --remap-wait-s qədər gözlənilir).
+
+İstifadə:
+    python bench/replay.py data/updates.jsonl.gz [--speed 1] [--backend sqlite]
+        [--limit N] [--max-gap-s 30] [--json]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from conversation_load import BACKENDS, FakeBotApi, _backend_env, _ErrorCounter, _pct, _rss_mb
+
+_APPEAL_CALLBACK = re.compile(r"^(exec_reply|exec_reject|edit_reply):(\d+)$")
+_START_LINK = re.compile(r"^(/start(?:@\w+)? (?:reply|reject)_)(\d+)$")
+_EXEC_BUTTON = re.compile(r"exec_reply:(\d+)")
+
+
+def load(path: str, limit: int = 0) -> Tuple[Dict[str, Any], List[Tuple[float, Dict[str, Any]]]]:
+    """Faylı oxu: (son meta, [(t, update), ...]); kəsik gzip sonu (işləyən bot) nəzərə alınmır"""
+    opener = gzip.open if path.endswith(".gz") else open
+    meta: Dict[str, Any] = {}
+    events: List[Tuple[float, Dict[str, Any]]] = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    break  # yarımçıq son sətir
+                if "meta" in row:
+                    meta = row["meta"]
+                    continue
+                events.append((float(row["t"]), row["update"]))
+                if limit and len(events) >= limit:
+                    break
+        except (EOFError, zlib.error):
+            pass
+    events.sort(key=lambda e: e[0])
+    return meta, events
+
+
+def _kind(update: Dict[str, Any]) -> str:
+    if "callback_query" in update:
+        data = update["callback_query"].get("data") or ""
+        return "callback:" + (data.split(":", 1)[0] if ":" in data else data)
+    message = update.get("message") or update.get("edited_message")
+    if message is None:
+        return next((k for k in update if k != "update_id"), "unknown")
+    text = message.get("text") or ""
+    if text.startswith("/"):
+        return "command:" + text.split()[0].split("@")[0]
+    if "photo" in message:
+        return "photo"
+    return "text" if text else "message"
+
+
+def _user_key(update: Dict[str, Any]) -> Optional[int]:
+    for value in update.values():
+        if isinstance(value, dict):
+            user = value.get("from") or value.get("chat")
+            if isinstance(user, dict):
+                return user.get("id")
+    return None
+
+
+class Replayer:
+    def __init__(self, app, executor_chat_id: int, timeout: float, remap_wait: float):
+        self.app = app
+        self.executor_chat_id = executor_chat_id
+        self.timeout = timeout
+        self.remap_wait = remap_wait
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.timeouts = 0
+        # replay zamanı yaranan, hələ qeyddəki heç bir ID-yə bağlanmamış müraciətlər
+        self._created: Deque[int] = deque()
+        self._created_event = asyncio.Event()
+        self._appeal_map: Dict[str, str] = {}
+        self.remap_misses = 0
+        self.lag: List[float] = []
+
+    def on_send(self, method: str, params: Dict[str, Any], message_id: int) -> None:
+        if int(params.get("chat_id", 0)) != self.executor_chat_id:
+            return
+        m = _EXEC_BUTTON.search(json.dumps(params.get("reply_markup") or {}))
+        if m:
+            self._created.append(int(m.group(1)))
+            self._created_event.set()
+
+    async def on_done(self, update, context) -> None:
+        fut = self._waiting.pop(update.update_id, None)
+        if fut is not None and not fut.done():
+            fut.set_result(time.perf_counter())
+
+    async def _appeal_id(self, original: str) -> Optional[str]:
+        """Qeyddəki müraciət ID-sinə replay-də yaranan ID-ni bağla"""
+        if original not in self._appeal_map:
+            deadline = time.monotonic() + self.remap_wait
+            while not self._created and time.monotonic() < deadline:
+                self._created_event.clear()
+                try:
+                    await asyncio.wait_for(self._created_event.wait(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+            if not self._created:
+                self.remap_misses += 1
+                return None
+            self._appeal_map[original] = str(self._created.popleft())
+        return self._appeal_map[original]
+
+    async def _remap(self, payload: Dict[str, Any]) -> None:
+        query = payload.get("callback_query")
+        m = _APPEAL_CALLBACK.match((query or {}).get("data") or "")
+        if m:
+            appeal_id = await self._appeal_id(m.group(2))
+            if appeal_id is not None:
+                payload["callback_query"] = dict(query, data=f"{m.group(1)}:{appeal_id}")  # type: ignore[arg-type]
+            return
+        message = payload.get("message")
+        m = _START_LINK.match((message or {}).get("text") or "")
+        if m:
+            appeal_id = await self._appeal_id(m.group(2))
+            if appeal_id is not None:
+                payload["message"] = dict(message, text=m.group(1) + appeal_id)  # type: ignore[arg-type]
+
+    async def _measure(self, kind: str, update_id: int, fut: asyncio.Future, started: float) -> None:
+        try:
+            finished = await asyncio.wait_for(fut, self.timeout)
+        except asyncio.TimeoutError:
+            self._waiting.pop(update_id, None)
+            self.timeouts += 1
+            return
+        self.latencies[kind].append(finished - started)
+
+    async def run(self, events: List[Tuple[float, Dict[str, Any]]], speed: float, max_gap: float) -> None:
+        from telegram import Update
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        offset = 0.0
+        previous_t = events[0][0] if events else 0.0
+        for update_id, (t, payload) in enumerate(events, start=1):
+            offset += min(max(t - previous_t, 0.0), max_gap) if max_gap > 0 else max(t - previous_t, 0.0)
+            previous_t = t
+            if speed > 0:
+                delay = started + offset / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    self.lag.append(-delay)
+            payload = dict(payload, update_id=update_id)
+            await self._remap(payload)
+            update = Update.de_json(payload, self.app.bot)
+            fut = loop.create_future()
+            self._waiting[update_id] = fut
+            enqueued = time.perf_counter()
+            await self.app.update_queue.put(update)
+            self._tasks.append(asyncio.create_task(self._measure(_kind(payload), update_id, fut, enqueued)))
+        await asyncio.gather(*self._tasks)
+
+
+async def _run(args) -> Dict[str, Any]:
+    import bot
+    from telegram import Update
+    from telegram.ext import TypeHandler
+
+    meta, events = load(args.log, args.limit)
+    if not events:
+        raise SystemExit(f"{args.log}: yenilik tapılmadı")
+
+    errors = _ErrorCounter()
+    logging.getLogger().addHandler(errors)
+    if bot.USE_SQLITE:
+        bot.init_sqlite_db()
+    else:
+        bot.init_db()
+
+    replayer: Optional[Replayer] = None
+
+    def on_send(method: str, params: Dict[str, Any], message_id: int) -> None:
+        if replayer is not None:
+            replayer.on_send(method, params, message_id)
+
+    api = FakeBotApi(on_send)
+    app = bot.build_app(request=api.request)
+    replayer = Replayer(app, bot.EXECUTOR_CHAT_ID, args.timeout, args.remap_wait_s)
+    # Ən son qrup: bütün handler-lər bitdikdən sonra gecikmə qeyd olunur
+    app.add_handler(TypeHandler(Update, replayer.on_done), group=1000)
+
+    rss_before = _rss_mb()
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+
+    started = time.perf_counter()
+    await replayer.run(events, args.speed, args.max_gap_s)
+    finished = time.perf_counter()
+
+    await app.stop()
+    if app.post_stop:
+        await app.post_stop(app)
+    await app.shutdown()
+    logging.getLogger().removeHandler(errors)
+
+    all_latencies = [v for values in replayer.latencies.values() for v in values]
+    recorded_span = events[-1][0] - events[0][0]
+    users = {_user_key(u) for _, u in events}
+    return {
+        "backend": args.backend,
+        "log": os.path.basename(args.log),
+        "recorded_at": meta.get("started"),
+        "speed": args.speed,
+        "updates": len(events),
+        "users": len(users - {None}),
+        "recorded_seconds": round(recorded_span, 3),
+        "wall_seconds": round(finished - started, 3),
+        "updates_per_sec": round(len(all_latencies) / (finished - started), 2) if finished > started else 0.0,
+        "p50_ms": round(_pct(all_latencies, 0.5) * 1000, 2),
+        "p99_ms": round(_pct(all_latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(all_latencies, default=0.0) * 1000, 2),
+        "schedule_lag_p99_ms": round(_pct(replayer.lag, 0.99) * 1000, 2),
+        "kinds": {
+            kind: {
+                "n": len(values),
+                "p50_ms": round(_pct(values, 0.5) * 1000, 2),
+                "p99_ms": round(_pct(values, 0.99) * 1000, 2),
+                "max_ms": round(max(values) * 1000, 2),
+            }
+            for kind, values in sorted(replayer.latencies.items(), key=lambda kv: -len(kv[1]))
+        },
+        "appeals_remapped": len(replayer._appeal_map),
+        "remap_misses": replayer.remap_misses,
+        "rss_peak_mb": round(_rss_mb(), 1),
+        "rss_growth_mb": round(_rss_mb() - rss_before, 1),
+        "api_calls": dict(api.calls.most_common()),
+        "timeouts": replayer.timeouts,
+        "errors": errors.count,
+    }
+
+
+def run_backend(args) -> Dict[str, Any]:
+    """Bir backend-i bu prosesdə işlət (env bot import olunmazdan əvvəl qurulur)"""
+    meta, _ = load(args.log, 1)
+    base = "/dev/shm" if args.backend == "memory" and os.path.isdir("/dev/shm") else None
+    workdir = tempfile.mkdtemp(prefix="dsmf-replay-", dir=base)
+    try:
+        os.environ.update(_backend_env(args.backend, workdir))
+        executor_chat_id = args.executor_chat_id or meta.get("executor_chat_id") or -1009990000001
+        os.environ["EXECUTOR_CHAT_ID"] = str(executor_chat_id)
+        if meta.get("admin_ids"):
+            os.environ["ADMIN_USER_IDS"] = ",".join(str(i) for i in meta["admin_ids"])
+        for key, value in {
+            "BOT_TOKEN": "0:replay",
+            "SEND_RATE_LIMIT": "0",
+            "HTTP_SERVER": "0",
+            "LOG_LEVEL": "WARNING",
+            "PHOTO_HASH": "1" if args.media else "0",
+            "MEDIA_STORE": "1" if args.media else "0",
+            "MEDIA_DIR": os.path.join(workdir, "media"),
+        }.items():
+            os.environ.setdefault(key, value)
+        for key in ("BOT_API_BASE_URL", "UPDATE_RECORD_FILE"):
+            os.environ.pop(key, None)
+        return asyncio.run(_run(args))
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _print_report(results: List[Dict[str, Any]]) -> None:
+    print(f"{'backend':<11} {'upd':>6} {'wall s':>8} {'upd/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'lag p99':>8} {'RSS MB':>7} {'xəta':>5}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<11} ❌ {r['error']}")
+            continue
+        print(f"{r['backend']:<11} {r['updates']:>6} {r['wall_seconds']:>8} {r['updates_per_sec']:>8} "
+              f"{r['p50_ms']:>8} {r['p99_ms']:>8} {r['schedule_lag_p99_ms']:>8} {r['rss_peak_mb']:>7} "
+              f"{r['errors'] + r['timeouts']:>5}")
+    for r in results:
+        if "kinds" not in r:
+            continue
+        print(f"\n{r['backend']}: {r['users']} istifadəçi, qeyd {r['recorded_seconds']} s, sürət "
+              f"{r['speed'] or 'max'}, müraciət ID bağlandı {r['appeals_remapped']} (tapılmadı {r['remap_misses']})")
+        for kind, s in r["kinds"].items():
+            print(f"  {kind:<26} n={s['n']:<6} p50={s['p50_ms']:>8} ms  p99={s['p99_ms']:>8} ms  max={s['max_ms']:>8} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Qeyd olunmuş yenilik axınının təkrarı (şəbəkəsiz)")
+    parser.add_argument("log", help="UPDATE_RECORD_FILE ilə yazılmış fayl (.jsonl.gz və ya .jsonl)")
+    parser.add_argument("--backend", choices=BACKENDS + ("all",), default="sqlite")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = orijinal temp, N = N dəfə sürətli, 0 = maksimum")
+    parser.add_argument("--max-gap-s", type=float, default=30.0, help="yeniliklər arası boşluq limiti (0 = limitsiz)")
+    parser.add_argument("--limit", type=int, default=0, help="yalnız ilk N yenilik")
+    parser.add_argument("--executor-chat-id", type=int, default=0, help="qeyddəki meta əvəzinə")
+    parser.add_argument("--remap-wait-s", type=float, default=5.0,
+                        help="icraçı düyməsi üçün müraciətin yaranmasını gözləmə limiti")
+    parser.add_argument("--timeout", type=float, default=30.0, help="bir yeniliyin maksimum gözləmə müddəti (san)")
+    parser.add_argument("--media", action="store_true", help="PHOTO_HASH və MEDIA_STORE açıq")
+    parser.add_argument("--keep", action="store_true", help="müvəqqəti DB fayllarını silmə")
+    parser.add_argument("--json", action="store_true", help="nəticəni JSON kimi çap et")
+    args = parser.parse_args()
+
+    if args.backend != "all":
+        results = [run_backend(args)]
+    else:
+        results = []
+        for backend in BACKENDS:
+            cmd = [sys.executable, os.path.abspath(__file__), args.log, "--backend", backend, "--json"]
+            for flag in ("speed", "max_gap_s", "limit", "executor_chat_id", "remap_wait_s", "timeout"):
+                cmd += ["--" + flag.replace("_", "-"), str(getattr(args, flag))]
+            cmd += [f for f, on in (("--media", args.media), ("--keep", args.keep)) if on]
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True)
+            try:
+                results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            except (ValueError, IndexError):
+                results.append({"backend": backend, "error": f"exit code {proc.returncode}"})
+
+    if args.json:
+        print(json.dumps(results[0] if len(results) == 1 else results, ensure_ascii=False))
+    else:
+        _print_report(results)
+
+
+if __name__ == "__main__":
+    main()
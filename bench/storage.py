@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Saxlama qatının mikro-benchmark-ları (real həcmli məlumatla).
+
+applications və blacklisted_users cədvəlləri src/seed.py-nin sintetik
+sətirləri ilə doldurulur (real formatlı FIN, +994 nömrələr, Azərbaycan
+dilində mətn, istifadəçilər üzrə əyri paylanma), sonra
+db_sqlite.py və db_operations.py-nin ictimai funksiyaları ölçülür.
+Hər (backend, sətir sayı) cütü təmiz bazada ayrıca prosesdə işləyir.
+
+Nəticə JSON-dur; --baseline ilə əvvəlki nəticə ilə müqayisə olunur və
+--fail-over həddini aşan yavaşlama olarsa çıxış kodu 1 olur.
+
+Backend-lər:
+    sqlite      db_sqlite (FORCE_SQLITE)
+    sqlalchemy  db_operations; --database-url verilməsə SQLite URL ilə
+                (PostgreSQL üçün BOŞ test bazası verin - delete_all da ölçülür)
+
+İstifadə:
+    python bench/storage.py [--rows 10000,100000] [--backend all] [--repeat 200]
+        [--out bench/results/storage.json] [--baseline bench/results/baseline.json]
+        [--fail-over 1.3]
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from seed import USER_BASE, SyntheticData, load_sqlite, load_sqlalchemy
+
+BACKENDS = ("sqlite", "sqlalchemy")
+
+
+# ---------- Əməliyyatlar ----------
+class Sample:
+    """Ölçmə vaxtına düşməsin deyə arqumentlər əvvəlcədən seçilir"""
+
+    def __init__(self, data: SyntheticData):
+        # Bütün dövrü əhatə etsin deyə hər step-ci sətir (ən çox 50k)
+        step = max(1, data.total // 50_000)
+        self.rows = data.total
+        self.rnd = random.Random(data.seed + 2)
+        self.data = list(itertools.islice(data.rows(), 0, None, step))
+        self._saved = 0
+
+    def row(self) -> Dict[str, Any]:
+        return self.rnd.choice(self.data)
+
+    def app_id(self) -> int:
+        return self.rnd.randrange(1, self.rows + 1)
+
+    def new_row(self) -> Dict[str, Any]:
+        self._saved += 1
+        row = dict(self.row())
+        row["submit_key"] = f"bench:{self._saved}:{self.rnd.getrandbits(32)}"
+        row["created_at"] = datetime.now()
+        return row
+
+
+Op = Tuple[str, Callable[..., Any], Callable[[Sample], tuple], int]
+
+
+def sqlite_ops(workdir: str) -> List[Op]:
+    import db_sqlite as db
+
+    since = datetime.now() - timedelta(hours=72)
+    export_path = os.path.join(workdir, "export.json")
+    return [
+        ("save", lambda r: db.save_application_sqlite(
+            r["user_telegram_id"], r["user_username"], r["fullname"], r["phone"], r["fin"], r["id_photo_file_id"],
+            r["form_label"], r["body"][:150], r["body"], r["created_at"], r["body_hash"], r["simhash"],
+            r["submit_key"]), lambda s: (s.new_row(),), 1),
+        ("get_by_id", db.get_application_by_id_sqlite, lambda s: (s.app_id(),), 1),
+        ("get_latest_by_user", db.get_latest_application_by_user_sqlite, lambda s: (s.row()["user_telegram_id"],), 1),
+        ("get_id_by_submit_key", db.get_application_id_by_submit_key_sqlite,
+         lambda s: (f"seed:{s.app_id() - 1}",), 1),
+        ("find_pending_duplicate", db.find_pending_duplicate_sqlite,
+         lambda s: (s.row()["fin"], s.row()["body_hash"], since), 1),
+        ("get_recent_simhashes", db.get_recent_simhashes_sqlite,
+         lambda s: (s.row()["fin"], s.row()["user_telegram_id"], since - timedelta(days=27)), 1),
+        ("search_fin", lambda fin: db.search_applications_sqlite(fin=fin), lambda s: (s.row()["fin"],), 1),
+        ("search_phone", lambda phone: db.search_applications_sqlite(phone=phone), lambda s: (s.row()["phone"],), 1),
+        ("update_status", db.update_application_status_sqlite, lambda s: (s.app_id(), "completed", "bench"), 1),
+        ("is_blacklisted", db.is_user_blacklisted_sqlite, lambda s: (s.row()["user_telegram_id"],), 1),
+        ("blacklist_add_remove", lambda uid: (db.add_user_to_blacklist_sqlite(uid, "bench"),
+                                              db.remove_user_from_blacklist_sqlite(uid)),
+         lambda s: (USER_BASE - 1 - s.rnd.randrange(1_000_000),), 1),
+        ("list_blacklisted", db.list_blacklisted_users_sqlite, lambda s: (100,), 1),
+        ("count_user_rejections", db.count_user_rejections_sqlite, lambda s: (s.row()["user_telegram_id"], 30), 1),
+        ("count_user_recent", db.count_user_recent_applications_sqlite, lambda s: (s.row()["user_telegram_id"], 24), 1),
+        ("count_applicants", db.count_applicants_sqlite, lambda s: (), 10),
+        ("applicant_ids_page", db.get_applicant_ids_page_sqlite, lambda s: (USER_BASE + s.rnd.randrange(1000), 500), 1),
+        ("get_overdue", db.get_overdue_applications_sqlite, lambda s: (3,), 10),
+        ("get_photo_hashes", db.get_photo_hashes_sqlite, lambda s: (), 10),
+        ("statistics", db.get_statistics_sqlite, lambda s: (), 10),
+        ("export", db.export_to_json, lambda s: (export_path,), 20),
+        ("delete_all", db.delete_all_applications_sqlite, lambda s: (), 0),
+    ]
+
+
+def sqlalchemy_ops(workdir: str) -> List[Op]:
+    import db_operations as db
+    from database import ApplicationStatus
+
+    since = datetime.now() - timedelta(hours=72)
+    return [
+        ("save", lambda r: db.save_application(
+            r["user_telegram_id"], r["user_username"], r["fullname"], r["phone"], r["fin"], r["form_label"],
+            r["body"], r["created_at"], r["body_hash"], r["simhash"], r["submit_key"]),
+         lambda s: (s.new_row(),), 1),
+        ("get_by_id", db.get_application_by_id, lambda s: (s.app_id(),), 1),
+        ("get_latest_by_user", db.get_latest_application_by_user, lambda s: (s.row()["user_telegram_id"],), 1),
+        ("get_id_by_submit_key", db.get_application_id_by_submit_key, lambda s: (f"seed:{s.app_id() - 1}",), 1),
+        ("find_pending_duplicate", db.find_pending_duplicate, lambda s: (s.row()["fin"], s.row()["body_hash"], since), 1),
+        ("get_recent_simhashes", db.get_recent_simhashes,
+         lambda s: (s.row()["fin"], s.row()["user_telegram_id"], since - timedelta(days=27)), 1),
+        ("search_fin", lambda fin: db.search_applications(fin=fin), lambda s: (s.row()["fin"],), 1),
+        ("search_phone", lambda phone: db.search_applications(phone=phone), lambda s: (s.row()["phone"],), 1),
+        ("update_status", db.update_application_status,
+         lambda s: (s.app_id(), ApplicationStatus.COMPLETED, "bench"), 1),
+        ("is_blacklisted", db.is_user_blacklisted, lambda s: (s.row()["user_telegram_id"],), 1),
+        ("blacklist_add_remove", lambda uid: (db.add_user_to_blacklist(uid, "bench"),
+                                              db.remove_user_from_blacklist(uid)),
+         lambda s: (USER_BASE - 1 - s.rnd.randrange(1_000_000),), 1),
+        ("list_blacklisted", db.list_blacklisted_users, lambda s: (100,), 1),
+        ("count_user_rejections", db.count_user_rejections, lambda s: (s.row()["user_telegram_id"], 30), 1),
+        ("count_user_recent", db.count_user_recent_applications, lambda s: (s.row()["user_telegram_id"], 24), 1),
+        ("count_applicants", db.count_applicants, lambda s: (), 10),
+        ("applicant_ids_page", db.get_applicant_ids_page, lambda s: (USER_BASE + s.rnd.randrange(1000), 500), 1),
+        ("get_overdue", db.get_overdue_applications, lambda s: (3,), 10),
+        ("get_photo_hashes", db.get_photo_hashes, lambda s: (), 10),
+        ("export", db.export_to_csv, lambda s: (1000,), 20),
+        ("delete_all", db.delete_all_applications, lambda s: (), 0),
+    ]
+
+
+# ---------- Ölçmə ----------
+def _pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def measure(ops: List[Op], sample: Sample, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Hər əməliyyat repeat/bölən dəfə (ağır tam skanlar az), delete_all bir dəfə sonda"""
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, fn, make_args, divisor in ops:
+        n = 1 if divisor == 0 else max(1, repeat // divisor)
+        calls = [make_args(sample) for _ in range(n)]
+        timings: List[float] = []
+        error: Optional[str] = None
+        for args in calls:
+            started = time.perf_counter()
+            try:
+                fn(*args)
+            except Exception as e:
+                error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"[:200]
+                break
+            timings.append(time.perf_counter() - started)
+        entry: Dict[str, Any] = {"n": len(timings)}
+        if timings:
+            entry.update({
+                "mean_ms": round(sum(timings) / len(timings) * 1000, 4),
+                "p50_ms": round(_pct(timings, 0.5) * 1000, 4),
+                "p95_ms": round(_pct(timings, 0.95) * 1000, 4),
+                "min_ms": round(min(timings) * 1000, 4),
+                "max_ms": round(max(timings) * 1000, 4),
+            })
+        if error:
+            entry["error"] = error
+        results[name] = entry
+    return results
+
+
+def run_child(args) -> Dict[str, Any]:
+    """Bir (backend, sətir sayı) cütü - env modullar import olunmazdan əvvəl qurulur"""
+    workdir = tempfile.mkdtemp(prefix="dsmf-storage-")
+    try:
+        os.environ.setdefault("BOT_TOKEN", "0:bench")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        # EXPLAIN (ANALYZE) yavaş sorğunu təkrar icra edir - ölçüləri pozmasın
+        os.environ.setdefault("SLOW_QUERY_EXPLAIN", "0")
+        if args.backend == "sqlite":
+            db_path = os.path.join(workdir, "bench.db")
+            os.environ["FORCE_SQLITE"] = "1"
+            os.environ["SQLITE_DB_PATH"] = db_path
+        else:
+            db_path = os.path.join(workdir, "bench_sa.db")
+            os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + db_path
+
+        rows = args.rows[0]
+        started = time.perf_counter()
+        data = SyntheticData(rows, args.seed)
+        (load_sqlite if args.backend == "sqlite" else load_sqlalchemy)(data)
+        seed_seconds = time.perf_counter() - started
+        db_bytes = os.path.getsize(db_path) if os.path.exists(db_path) else None
+
+        ops = (sqlite_ops if args.backend == "sqlite" else sqlalchemy_ops)(workdir)
+        if args.only:
+            ops = [op for op in ops if op[0] in args.only]
+        ops_result = measure(ops, Sample(data), args.repeat)
+        return {
+            "backend": args.backend,
+            "rows": rows,
+            "database": "sqlite" if not args.database_url or args.backend == "sqlite" else args.database_url.split(":", 1)[0],
+            "seed_seconds": round(seed_seconds, 2),
+            "db_bytes": db_bytes,
+            "ops": ops_result,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# ---------- Baseline müqayisəsi ----------
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], fail_over: float, floor_ms: float) -> bool:
+    """p50 nisbətlərini çap et; fail_over-dan yavaş əməliyyat varsa False"""
+    base = {(r["backend"], r["rows"]): r["ops"] for r in baseline.get("results", [])}
+    ok = True
+    print(f"\nBaseline ilə müqayisə ({baseline.get('meta', {}).get('commit') or '?'}), p50:")
+    for result in current["results"]:
+        old_ops = base.get((result["backend"], result["rows"]))
+        if old_ops is None:
+            print(f"  {result['backend']}/{result['rows']}: baseline-da yoxdur")
+            continue
+        for name, new in result["ops"].items():
+            old = old_ops.get(name)
+            if not old or "p50_ms" not in old or "p50_ms" not in new:
+                continue
+            ratio = new["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+            slow = ratio > fail_over and new["p50_ms"] - old["p50_ms"] > floor_ms
+            if slow:
+                ok = False
+            mark = "❌" if slow else ("✅" if ratio < 1 / fail_over else "  ")
+            print(f"  {mark} {result['backend']:<10} {result['rows']:>8} {name:<22} "
+                  f"{old['p50_ms']:>10.3f} → {new['p50_ms']:>10.3f} ms  ×{ratio:.2f}")
+    return ok
+
+
+def _print_report(current: Dict[str, Any]) -> None:
+    for result in current["results"]:
+        if "error" in result:
+            print(f"\n{result['backend']} / {result['rows']} sətir: ❌ {result['error']}")
+            continue
+        print(f"\n{result['backend']} / {result['rows']} sətir (doldurma {result['seed_seconds']} san)")
+        for name, s in result["ops"].items():
+            if "p50_ms" not in s:
+                print(f"  {name:<22} ❌ {s.get('error')}")
+                continue
+            print(f"  {name:<22} n={s['n']:<5} p50={s['p50_ms']:>10.3f} ms  p95={s['p95_ms']:>10.3f} ms"
+                  + (f"  ⚠️ {s['error']}" if "error" in s else ""))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Saxlama qatının mikro-benchmark-ları")
+    parser.add_argument("--backend", choices=BACKENDS + ("all",), default="all")
+    parser.add_argument("--rows", default="10000,100000", help="vergüllə: 10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=200, help="sürətli əməliyyatların təkrar sayı")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", default="", help="yalnız bu əməliyyatlar (vergüllə)")
+    parser.add_argument("--database-url", default="", help="sqlalchemy üçün boş test bazası (default: SQLite)")
+    parser.add_argument("--out", default="", help="nəticə JSON faylı")
+    parser.add_argument("--baseline", default="", help="müqayisə üçün əvvəlki nəticə")
+    parser.add_argument("--fail-over", type=float, default=1.3, help="p50 bu qədər dəfə artıbsa uğursuz")
+    parser.add_argument("--floor-ms", type=float, default=0.05, help="bundan kiçik fərqlər nəzərə alınmır")
+    parser.add_argument("--json", action="store_true", help="nəticəni stdout-a JSON kimi çap et")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.rows = [int(r) for r in str(args.rows).split(",") if r.strip()]
+    args.only = [o.strip() for o in args.only.split(",") if o.strip()]
+
+    if args.child:
+        print(json.dumps(run_child(args), ensure_ascii=False))
+        return
+
+    results = []
+    for backend in (BACKENDS if args.backend == "all" else (args.backend,)):
+        for rows in args.rows:
+            cmd = [sys.executable, os.path.abspath(__file__), "--child", "--backend", backend, "--rows", str(rows),
+                   "--repeat", str(args.repeat), "--seed", str(args.seed)]
+            if args.only:
+                cmd += ["--only", ",".join(args.only)]
+            if args.database_url:
+                cmd += ["--database-url", args.database_url]
+            print(f"⏱ {backend} / {rows} sətir…", file=sys.stderr)
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True)
+            try:
+                results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            except (IndexError, ValueError):
+                results.append({"backend": backend, "rows": rows, "error": f"exit code {proc.returncode}", "ops": {}})
+
+    current = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(current, ensure_ascii=False))
+    else:
+        _print_report(current)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(current, baseline, args.fail_over, args.floor_ms):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 DSMF Vətəndaş Müraciət Botu - İşə Salma Skripti
+
+Arqumentsiz botu işə salır; alt əmrlər (migrate, stats, export, ...) üçün
+bax src/cli.py - onlar botu və Telegram-ı yükləmir.
 """
 import sys
 import os
@@ -15,12 +18,7 @@ if sys.platform == "win32":
 # src qovluğunu path-ə əlavə et
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from bot import main
-try:
-    from version import __version__
-except Exception:
-    __version__ = "0.0.0"
+from cli import main
 
 if __name__ == "__main__":
-    print(f"DSMF Müraciət Botu işə salınır... v{__version__}")
-    main()
+    sys.exit(main(sys.argv[1:]))
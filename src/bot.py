@@ -1,10 +1,9 @@
+import asyncio
 import logging
-from dataclasses import dataclass
 from enum import Enum, auto
 from typing import Optional, Any, Dict
 from datetime import datetime
 
-import phonenumbers
 from telegram import (
     Update,
     InlineKeyboardButton,
@@ -12,6 +11,7 @@ from telegram import (
     ReplyKeyboardRemove,
 )
 from telegram.error import Conflict
+from telegram.request import BaseRequest
 from telegram.ext import (
     Application,
     ApplicationBuilder,
@@ -21,6 +21,7 @@ from telegram.ext import (
     ConversationHandler,
     filters,
     CallbackQueryHandler,
+    TypeHandler,
 )
 
 from config import (
@@ -28,7 +29,6 @@ from config import (
     EXECUTOR_CHAT_ID,
     MESSAGES,
     MIN_NAME_LENGTH,
-    MIN_SUBJECT_LENGTH,
     MAX_SUBJECT_LENGTH,
     MIN_BODY_LENGTH,
     MAX_BODY_LENGTH,
@@ -37,15 +37,88 @@ from config import (
     MAX_DAILY_SUBMISSIONS,
     MAX_MONTHLY_SUBMISSIONS,
     ADMIN_USER_IDS,
+    SEND_RATE_LIMIT_ENABLED,
+    SEND_GLOBAL_PER_SEC,
+    SEND_PRIVATE_PER_SEC,
+    SEND_GROUP_PER_MIN,
+    SEND_BURST,
+    SEND_MAX_RETRIES,
+    BOT_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_MAX_CONNECTIONS,
+    HEALTH_PATH,
+    METRICS_PATH,
+    METRICS_TOKEN,
+    HTTP_SERVER_ENABLED,
+    HEALTH_POLL_STALE_S,
+    BOT_API_BASE_URL,
+    UPDATE_WORKERS,
+    UPDATE_MAX_PENDING,
+    PERSISTENCE_ENABLED,
+    PERSISTENCE_INTERVAL,
+    CONVERSATION_TIMEOUT_MIN,
+    EXEC_CONVERSATION_TIMEOUT_MIN,
+    USER_DATA_TTL_HOURS,
+    EVICTION_INTERVAL_MIN,
+    DRAFT_EXPIRED_NOTICE,
+    PROFILE_REUSE_ENABLED,
+    PROFILE_CACHE_TTL_MIN,
+    DEDUPE_WINDOW_HOURS,
+    DEDUPE_SIMILAR_DAYS,
+    SIMHASH_MAX_DISTANCE,
+    PHOTO_HASH_ENABLED,
+    PHOTO_HASH_WORKERS,
+    PHOTO_HASH_MAX_DISTANCE,
+    MEDIA_STORE_ENABLED,
+    MEDIA_DIR,
+    MEDIA_THUMB_PX,
+    LOOP_LAG_INTERVAL_MS,
+    TRACE_ENABLED,
+    TRACE_BUFFER,
+    TRACE_SAMPLE_RATE,
+    TRACE_FILE,
+    UPDATE_RECORD_FILE,
+    UPDATE_RECORD_KEY,
+    UPDATE_RECORD_MAX_MB,
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILE_MAX_SECONDS,
+    PROFILE_ON_START,
     setup_logging,
+    validate_bot_settings,
 )
 import re
-from telegram.error import BadRequest
+from telegram.error import BadRequest, ChatMigrated
+from send_scheduler import Priority, SendScheduler
+from drafts import ApplicationData, FormType
+from update_processor import PerUserUpdateProcessor
+from persistence import DBPersistence
+from delivery import DeliveryResult, mark_reachable, notice_for, send_to_citizen
+import broadcast
+import eviction
+import profiles
+import dedupe
+import photo_hash
+import media_store
+import perf
+import sql_trace
+import tracing
+import profiler
+import update_recorder
+from metrics import REGISTRY
+from phone import normalize_phone
 
 setup_logging()
 logger = logging.getLogger("dsmf-bot")
 EXECUTOR_CHAT_ID_RT = EXECUTOR_CHAT_ID  # Runtime-da yenilənə bilən icraçı chat ID
 
+_submissions = REGISTRY.counter("applications_submitted_total", "Təsdiqlənmiş müraciətlər (forma və nəticə üzrə)")
+_monitor_server = None  # polling rejimində /health və /metrics serveri
+
 # Ümumi error handler – PTB daxili səhvləri daha aydın loglamaq üçün
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     try:
@@ -68,6 +141,20 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
         "Unhandled error. user=%s chat=%s", user, chat, exc_info=context.error
     )
 
+async def _send_app_photo(bot, chat_id: int, caption: str, *, file_id: Optional[str], photo_key: Optional[str]) -> bool:
+    """Müraciət şəklini göndər: əvvəlcə Telegram file_id, alınmasa lokal media anbarı"""
+    if file_id:
+        try:
+            await bot.send_photo(chat_id=chat_id, photo=file_id, caption=caption)
+            return True
+        except BadRequest as e:
+            logger.warning("file_id ilə şəkil göndərilmədi (%s); lokal nüsxə yoxlanılır", e)
+    data = await media_store.read(photo_key)
+    if data:
+        await bot.send_photo(chat_id=chat_id, photo=data, caption=caption)
+        return True
+    return False
+
 # İstifadəçi məlumatları üçün təhlükəsiz köməkçi
 def _ud(context: ContextTypes.DEFAULT_TYPE) -> Dict[str, Any]:
     """Return a mutable user_data dict always (for type checker)."""
@@ -123,50 +210,19 @@ else:
             logger.error(f"❌ SQLite də yüklənmədi: {e2}. DB deaktivdir.")
             DB_ENABLED = False
 
-class FormType(str, Enum):
-    COMPLAINT = "Şikayət"
-    SUGGESTION = "Təklif"
-    APPLICATION = "Ərizə"
-
 class States(Enum):
     FULLNAME = auto()
     PHONE = auto()
     FIN = auto()
     ID_PHOTO = auto()
     FORM_TYPE = auto()
-    SUBJECT = auto()
+    SUBJECT = auto()  # istifadə edilmir; saxlanılmış vəziyyət dəyərləri sürüşməsin deyə qalır
     BODY = auto()
     CONFIRM = auto()
     EXEC_REPLY_TEXT = auto()
     EXEC_REJECT_REASON = auto()
     EXEC_EDIT_REPLY_TEXT = auto()
-
-@dataclass
-class ApplicationData:
-    fullname: Optional[str] = None
-    phone: Optional[str] = None
-    fin: Optional[str] = None
-    id_photo_file_id: Optional[str] = None
-    form_type: Optional[FormType] = None
-    subject: Optional[str] = None
-    body: Optional[str] = None
-    timestamp: Optional[datetime] = None
-
-    def summary_text(self) -> str:
-        # Tarix qısa formatda və sonunda
-        time_str = ""
-        if self.timestamp:
-            time_str = f"⏰ {self.timestamp.strftime('%d.%m.%y %H:%M:%S')}\n"
-        return (
-            "📋 Müraciət xülasəsi:\n"
-            # Ad xətti sadələşdirildi (uzun başlıq silindi)
-            f"👤 {self.fullname}\n"
-            f"📱 Mobil nömrə: {self.phone}\n"
-            f"🆔 FIN: {self.fin}\n"
-            # Form növü gizlədilib (istifadəçi və qrup mesajlarında göstərilmir)
-            f"✍️ Müraciət mətni: {self.body}\n\n"
-            f"{time_str}"
-        )
+    PROFILE = auto()  # təkrar müraciət: əvvəlki məlumatlardan istifadə
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     global ADMIN_USER_IDS
@@ -175,7 +231,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = getattr(update.effective_user, "id", None)
     cid = getattr(update.effective_chat, "id", None)
     ctype = getattr(update.effective_chat, "type", None)
-    logger.info(f"/start from user_id={uid} chat_id={cid} chat_type={ctype}")
+    logger.info("/start from user_id=%s chat_id=%s chat_type=%s", uid, cid, ctype)
     if not msg:
         logger.warning("/start çağırışı message obyektisiz gəldi")
         return ConversationHandler.END
@@ -201,7 +257,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     )
                     return ConversationHandler.END
         except Exception as e:
-            logger.error(f"Blacklist yoxlaması xətası: {e}")
+            logger.error("Blacklist yoxlaması xətası: %s", e)
     
     # Limitsiz rejim: rate limit yoxlaması deaktivdir
     
@@ -220,6 +276,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # Müraciət xülasəsini DM-də göstər və cavabı istə
                 app_text: Optional[str] = None
                 sqlite_photo_id: Optional[str] = None
+                photo_key: Optional[str] = None
                 if USE_SQLITE:
                     from db_sqlite import get_application_by_id_sqlite
                     app_data = get_application_by_id_sqlite(app_id)
@@ -238,10 +295,12 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         raw = app_data.get('id_photo_file_id')
                         if isinstance(raw, str) and raw:
                             sqlite_photo_id = raw
+                        photo_key = app_data.get('photo_key')
                 else:
                     from db_operations import get_application_by_id
                     app = get_application_by_id(app_id)
                     if app:
+                        photo_key = app.photo_key  # type: ignore[assignment]
                         try:
                             from datetime import timezone
                             dt = app.created_at
@@ -261,9 +320,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                             "📝 Cavab mətni yazın:"
                         )
                 if app_text:
-                    if sqlite_photo_id:
-                        await msg.reply_photo(photo=sqlite_photo_id, caption=app_text)
-                    else:
+                    if not await _send_app_photo(
+                        context.bot, msg.chat_id, app_text, file_id=sqlite_photo_id, photo_key=photo_key,
+                    ):
                         await msg.reply_text(app_text)
                 # State-i əsas exec_conv_reply izləyir (per_user). Burada dialoqa keçmirik.
                 return ConversationHandler.END
@@ -310,6 +369,23 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except Exception:
                 pass
 
+    # Təkrar müraciət: son müraciətdəki şəxsi məlumatları təklif et
+    if uid and DB_ENABLED and PROFILE_REUSE_ENABLED:
+        profile = profiles.get_profile(uid, use_sqlite=USE_SQLITE, ttl=PROFILE_CACHE_TTL_MIN * 60)
+        if profile:
+            _ud(context)["app"] = ApplicationData()
+            buttons = [
+                [InlineKeyboardButton("✅ Əvvəlki məlumatlarla davam et", callback_data="profile_reuse")],
+                [InlineKeyboardButton("✏️ Yeni məlumat daxil et", callback_data="profile_new")],
+            ]
+            await msg.reply_text(
+                MESSAGES["profile_prompt"].format(
+                    fullname=profile["fullname"], phone=profile["phone"], fin=profile["fin"],
+                ),
+                reply_markup=InlineKeyboardMarkup(buttons),
+            )
+            return States.PROFILE
+
     await msg.reply_text(
         MESSAGES["welcome"],
         reply_markup=ReplyKeyboardRemove(),
@@ -317,6 +393,29 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _ud(context).setdefault("app", ApplicationData())
     return States.FULLNAME
 
+async def choose_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Əvvəlki məlumatlarla davam et və ya anketi sıfırdan doldur"""
+    query = update.callback_query
+    user = update.effective_user
+    if not query or not user:
+        return ConversationHandler.END
+    await query.answer()
+    app_data = _ud(context).setdefault("app", ApplicationData())
+    profile = profiles.get_profile(user.id, use_sqlite=USE_SQLITE, ttl=PROFILE_CACHE_TTL_MIN * 60)
+    if query.data != "profile_reuse" or not profile:
+        await query.edit_message_text(MESSAGES["welcome"])
+        return States.FULLNAME
+    app_data.fullname = profile["fullname"]
+    app_data.phone = profile["phone"]
+    app_data.fin = profile["fin"]
+    if not profile.get("id_photo_file_id"):
+        # Şəkil saxlanılmayıb (PostgreSQL) - yalnız onu soruşuruq
+        await query.edit_message_text(MESSAGES["id_photo_prompt"])
+        return States.ID_PHOTO
+    app_data.id_photo_file_id = profile["id_photo_file_id"]
+    await query.edit_message_text(MESSAGES["form_type_prompt"], reply_markup=_form_type_keyboard())
+    return States.FORM_TYPE
+
 async def collect_fullname(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.effective_message
     if not msg or not msg.text or not msg.text.strip():
@@ -330,19 +429,13 @@ async def collect_fullname(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await msg.reply_text(MESSAGES["phone_prompt"])
     return States.PHONE
 
-def validate_az_phone(number: str) -> bool:
-    try:
-        parsed = phonenumbers.parse(number, None)
-        return phonenumbers.is_valid_number(parsed) and number.startswith("+994")
-    except Exception:
-        return False
-
 async def collect_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.effective_message
     if not msg or not msg.text:
         return States.PHONE
-    phone = msg.text.strip()
-    if not validate_az_phone(phone):
+    # Saxlamadan əvvəl E.164 formasına salınır (+994XXXXXXXXX) ki, axtarış dəqiq olsun
+    phone = normalize_phone(msg.text)
+    if not phone:
         await msg.reply_text(MESSAGES["phone_error"])
         return States.PHONE
     _ud(context).setdefault("app", ApplicationData()).phone = phone
@@ -370,18 +463,20 @@ async def collect_id_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return States.ID_PHOTO
     file_id = photo_list[-1].file_id
     _ud(context).setdefault("app", ApplicationData()).id_photo_file_id = file_id
-    buttons = [
-        [InlineKeyboardButton(FormType.COMPLAINT.value, callback_data="type_complaint")],
-        [InlineKeyboardButton(FormType.SUGGESTION.value, callback_data="type_suggestion")],
-        [InlineKeyboardButton(FormType.APPLICATION.value, callback_data="type_application")],
-    ]
     if msg:
         await msg.reply_text(
             MESSAGES["form_type_prompt"],
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=_form_type_keyboard(),
         )
     return States.FORM_TYPE
 
+def _form_type_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(FormType.COMPLAINT.value, callback_data="type_complaint")],
+        [InlineKeyboardButton(FormType.SUGGESTION.value, callback_data="type_suggestion")],
+        [InlineKeyboardButton(FormType.APPLICATION.value, callback_data="type_application")],
+    ])
+
 async def choose_form_type(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     if not query:
@@ -398,18 +493,6 @@ async def choose_form_type(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.edit_message_text(MESSAGES["body_prompt"])
     return States.BODY
 
-async def collect_subject(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    msg = update.effective_message
-    if not msg or not msg.text:
-        return States.SUBJECT
-    subject = msg.text.strip()
-    if len(subject) < MIN_SUBJECT_LENGTH or len(subject) > MAX_SUBJECT_LENGTH:
-        await msg.reply_text(MESSAGES["subject_error"])
-        return States.SUBJECT
-    _ud(context).setdefault("app", ApplicationData()).subject = subject
-    await msg.reply_text(MESSAGES["body_prompt"])
-    return States.BODY
-
 async def collect_body(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.effective_message
     if not msg or not msg.text:
@@ -420,11 +503,6 @@ async def collect_body(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return States.BODY
     app_data = _ud(context).setdefault("app", ApplicationData())
     app_data.body = body
-    # Mövzu tələb olunmur; DB üçün avtomatik qısa başlıq çıxarırıq (ilk 150 simvol)
-    try:
-        app_data.subject = body[:150]
-    except Exception:
-        app_data.subject = body
     app_data.timestamp = datetime.now(BAKU_TZ)
     app: ApplicationData = app_data
     buttons = [
@@ -436,6 +514,9 @@ async def collect_body(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await msg.reply_text(app.summary_text(), reply_markup=InlineKeyboardMarkup(buttons))
     return States.CONFIRM
 
+def _form_label(app: ApplicationData) -> str:
+    return app.form_type.value if app.form_type is not None else "unknown"
+
 async def confirm_or_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     if not query:
@@ -454,6 +535,23 @@ async def confirm_or_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("Zəhmət olmasa müraciət mətnini yenidən yazın:")
         return States.BODY
     # confirm
+    # Təkrar basılmış/təkrarlanan təsdiq və eyni mətnli açıq müraciət yenidən yazılmır
+    submit_key = dedupe.submit_key(query.from_user.id, query.message.message_id if query.message else None)
+    body_digest, body_simhash = dedupe.fingerprint(app.body or "")
+    if DB_ENABLED and app.fin:
+        try:
+            existing_id = dedupe.find_by_submit_key(submit_key, use_sqlite=USE_SQLITE) or dedupe.find_exact(
+                app.fin, body_digest, use_sqlite=USE_SQLITE, window_hours=DEDUPE_WINDOW_HOURS,
+            )
+        except Exception as e:
+            logger.warning("Təkrar yoxlaması alınmadı: %s", e)
+            existing_id = None
+        if existing_id:
+            logger.info("♻️ Təkrar müraciət yazılmadı: user=%s, mövcud ID=%s", query.from_user.id, existing_id)
+            _submissions.inc(form_type=_form_label(app), result="duplicate")
+            await query.edit_message_text(MESSAGES["duplicate_submission"].format(id=existing_id))
+            _ud(context).pop("app", None)
+            return ConversationHandler.END
     await query.edit_message_text(MESSAGES["confirm_sent"])
 
     # Database-ə yaz (PostgreSQL və ya SQLite)
@@ -466,7 +564,6 @@ async def confirm_or_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 app.fin,
                 app.id_photo_file_id,
                 app.form_type,
-                app.subject,
                 app.body,
                 app.timestamp,
             ]), "Boş sahə var"
@@ -480,11 +577,15 @@ async def confirm_or_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     fin=app.fin,  # type: ignore[arg-type]
                     id_photo_file_id=app.id_photo_file_id,  # type: ignore[arg-type]
                     form_type=app.form_type,  # type: ignore[arg-type]
-                    subject=app.subject,  # type: ignore[arg-type]
+                    # Mövzu tələb olunmur; SQLite sxemi üçün mətnin ilk 150 simvolu
+                    subject=app.body[:MAX_SUBJECT_LENGTH],  # type: ignore[index]
                     body=app.body,  # type: ignore[arg-type]
                     created_at=app.timestamp,  # type: ignore[arg-type]
+                    body_hash=body_digest,
+                    simhash=body_simhash,
+                    submit_key=submit_key,
                 )
-                logger.info(f"✅ SQLite-a yazıldı: ID={db_app['id']}")
+                logger.info("✅ SQLite-a yazıldı: ID=%s", db_app['id'])
                 caption_prefix = f"🆔 SQLite ID: {db_app['id']}\n"
                 db_id = db_app["id"]
             else:
@@ -498,17 +599,40 @@ async def confirm_or_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     form_type=app.form_type,  # type: ignore[arg-type]
                     body=app.body,  # type: ignore[arg-type]
                     created_at=app.timestamp,  # type: ignore[arg-type]
+                    body_hash=body_digest,
+                    simhash=body_simhash,
+                    submit_key=submit_key,
                 )
-                logger.info(f"✅ PostgreSQL-ə yazıldı: ID={db_app.id}")
+                logger.info("✅ PostgreSQL-ə yazıldı: ID=%s", db_app.id)
                 caption_prefix = f"🆔 DB ID: {db_app.id}\n"
                 db_id = db_app.id  # type: ignore[assignment]
         except Exception as e:
-            logger.error(f"❌ DB error: {e}")
+            # submit_key unikal index-i: eyni təsdiq paralel/təkrar yazılıbsa ikinci dəfə göndərmirik
+            try:
+                duplicate_id = dedupe.find_by_submit_key(submit_key, use_sqlite=USE_SQLITE)
+            except Exception:
+                duplicate_id = None
+            if duplicate_id:
+                logger.info("♻️ Təkrar təsdiq callback-i: mövcud ID=%s", duplicate_id)
+                _submissions.inc(form_type=_form_label(app), result="duplicate")
+                _ud(context).pop("app", None)
+                return ConversationHandler.END
+            logger.error("❌ DB error: %s", e)
             caption_prefix = "⚠️ DB xətası\n"
             db_id = None
     else:
         caption_prefix = ""
         db_id = None
+    _submissions.inc(form_type=_form_label(app), result="saved" if db_id is not None else ("db_error" if DB_ENABLED else "no_db"))
+    similar_line = ""
+    if db_id is not None:
+        similar = dedupe.find_similar(
+            app.fin, query.from_user.id, body_simhash, use_sqlite=USE_SQLITE,  # type: ignore[arg-type]
+            exclude_id=db_id, window_days=DEDUPE_SIMILAR_DAYS, max_distance=SIMHASH_MAX_DISTANCE,
+        )
+        if similar:
+            similar_line = "⚠️ Ehtimal olunan təkrar: " + ", ".join(f"№{i}" for i in similar[:5]) + "\n"
+        profiles.remember(query.from_user.id, app.fullname, app.phone, app.fin, app.id_photo_file_id)  # type: ignore[arg-type]
 
     # Status göstəricisi - yaradılma tarixinə görə
     # 10+ gün əvvəl yaradılıbsa, "Vaxtı keçir"
@@ -529,10 +653,12 @@ async def confirm_or_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"🆔: {query.from_user.id}\n"
         f"⏰Müraciət tarixi:  {app.timestamp.strftime('%d.%m.%Y  (%H:%M:%S)') if app.timestamp else ''}\n\n"
         f"{status_line.strip()}\n"
+        f"{similar_line}"
     )
 
     # İcraçı qrupuna mesaj + foto (yalnız EXECUTOR_CHAT_ID düzgün olduqda)
     global EXECUTOR_CHAT_ID_RT
+    exec_msg = None
     if EXECUTOR_CHAT_ID_RT:
         # İcraçıların cavab verməsi üçün inline düymələr
         kb = None
@@ -545,48 +671,73 @@ async def confirm_or_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ]
             kb = InlineKeyboardMarkup(buttons)
         try:
-            logger.info(f"İcraçılara göndərilir: chat_id={EXECUTOR_CHAT_ID_RT}, photo_present={bool(app.id_photo_file_id)}")
+            logger.info("İcraçılara göndərilir: chat_id=%s, photo_present=%s", EXECUTOR_CHAT_ID_RT, bool(app.id_photo_file_id))
             # Foto varsa foto ilə göndər, yoxdursa mətn
             if app.id_photo_file_id:
                 # Şəkil əvvəlki kimi, sadəcə caption yeni formatda
-                await context.bot.send_photo(
+                exec_msg = await context.bot.send_photo(
                     chat_id=EXECUTOR_CHAT_ID_RT,
                     photo=app.id_photo_file_id,
                     caption=caption,
                     reply_markup=kb,
                 )
             else:
-                await context.bot.send_message(chat_id=EXECUTOR_CHAT_ID_RT, text=caption, reply_markup=kb)
+                exec_msg = await context.bot.send_message(chat_id=EXECUTOR_CHAT_ID_RT, text=caption, reply_markup=kb)
             logger.info("✅ İcraçı qrupuna göndərildi")
         except Exception as send_err:
             msg = str(send_err)
-            logger.error(f"❌ İcraçı qrupuna göndərmə xətası: {msg}")
+            logger.error("❌ İcraçı qrupuna göndərmə xətası: %s", msg)
             # Qrup superqrupa miqrasiya edəndə yeni chat id qaytarılır
-            if isinstance(send_err, BadRequest) and "migrated" in msg.lower():
+            # (Bot API: parameters.migrate_to_chat_id -> PTB ChatMigrated)
+            new_id = None
+            if isinstance(send_err, ChatMigrated):
+                new_id = int(send_err.new_chat_id)
+            elif isinstance(send_err, BadRequest) and "migrated" in msg.lower():
                 m = re.search(r"-100\d+", msg)
                 if m:
                     new_id = int(m.group(0))
-                    logger.warning(f"➡️ Yeni supergroup ID aşkarlandı: {new_id} — runtime yenilənir. .env-də EXECUTOR_CHAT_ID dəyərini də buna dəyişin.")
-                    EXECUTOR_CHAT_ID_RT = new_id
-                    try:
-                        if app.id_photo_file_id:
-                            await context.bot.send_photo(
-                                chat_id=EXECUTOR_CHAT_ID_RT,
-                                photo=app.id_photo_file_id,
-                                caption=caption,
-                                reply_markup=kb,
-                            )
-                        else:
-                            await context.bot.send_message(chat_id=EXECUTOR_CHAT_ID_RT, text=caption, reply_markup=kb)
-                        logger.info("✅ Yeni ID ilə icraçı qrupuna göndərildi")
-                    except Exception as retry_err:
-                        logger.error(f"❌ Yeni ID ilə göndərmə də alınmadı: {retry_err}")
+            if new_id is not None:
+                logger.warning("➡️ Yeni supergroup ID aşkarlandı: %s — runtime yenilənir. .env-də EXECUTOR_CHAT_ID dəyərini də buna dəyişin.", new_id)
+                EXECUTOR_CHAT_ID_RT = new_id
+                try:
+                    if app.id_photo_file_id:
+                        exec_msg = await context.bot.send_photo(
+                            chat_id=EXECUTOR_CHAT_ID_RT,
+                            photo=app.id_photo_file_id,
+                            caption=caption,
+                            reply_markup=kb,
+                        )
+                    else:
+                        exec_msg = await context.bot.send_message(chat_id=EXECUTOR_CHAT_ID_RT, text=caption, reply_markup=kb)
+                    logger.info("✅ Yeni ID ilə icraçı qrupuna göndərildi")
+                except Exception as retry_err:
+                    logger.error("❌ Yeni ID ilə göndərmə də alınmadı: %s", retry_err)
     else:
         logger.warning("EXECUTOR_CHAT_ID təyin edilməyib; icraçılara göndərilmədi")
 
+    # Vəsiqə şəkli fonda heşlənir və lokal anbara yazılır; başqa hesabdan təkrardırsa icraçı mesajına cavab yazılır
+    if (PHOTO_HASH_ENABLED or media_store.enabled()) and db_id is not None and app.id_photo_file_id:
+        on_match = None
+        if PHOTO_HASH_ENABLED and exec_msg is not None:
+            bot, flag_chat_id, flag_msg_id = context.bot, exec_msg.chat_id, exec_msg.message_id
+
+            async def on_match(app_ids):
+                await bot.send_message(
+                    chat_id=flag_chat_id,
+                    text=MESSAGES["photo_reused"].format(ids=", ".join(f"№{i}" for i in app_ids[:10])),
+                    reply_to_message_id=flag_msg_id,
+                    allow_sending_without_reply=True,
+                )
+        photo_hash.schedule(
+            context.bot, app_id=db_id, user_id=query.from_user.id, file_id=app.id_photo_file_id,
+            use_sqlite=USE_SQLITE, max_distance=PHOTO_HASH_MAX_DISTANCE, on_match=on_match,
+        )
+
     # Vatandaşa təsdiq DM
     if query.message and query.message.chat:
         await context.bot.send_message(chat_id=query.message.chat.id, text=MESSAGES["success"])
+    # Göndərilmiş anket yaddaşda saxlanılmır
+    _ud(context).pop("app", None)
     return ConversationHandler.END
 
 # ================== İcraçı qrup cavab axını ==================
@@ -634,11 +785,13 @@ async def exec_reply_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             app_text_var: Optional[str] = None
             app_data = None
+            photo_key: Optional[str] = None
             
             if USE_SQLITE:
                 from db_sqlite import get_application_by_id_sqlite
                 app_data = get_application_by_id_sqlite(app_id)
                 if app_data:
+                    photo_key = app_data.get('photo_key')
                     time_str = str(app_data.get('created_at', ''))
                     app_text_var = (
                         "📋 Müraciət xülasəsi:\n"
@@ -654,6 +807,7 @@ async def exec_reply_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 from db_operations import get_application_by_id
                 app = get_application_by_id(app_id)
                 if app:
+                    photo_key = app.photo_key  # type: ignore[assignment]
                     # Bakı vaxtına çevir
                     try:
                         from config import BAKU_TZ
@@ -676,22 +830,18 @@ async def exec_reply_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     )
             
             if app_text_var:
-                # Foto varsa DM-də foto ilə göndər, yoxdursa mətn
+                # Foto varsa DM-də foto ilə göndər (qrup mesajı, SQLite file_id, lokal anbar), yoxdursa mətn
                 photo_id = user_store.get("exec_photo_file_id")
-                if isinstance(photo_id, str) and photo_id:
-                    await context.bot.send_photo(chat_id=user.id, photo=photo_id, caption=app_text_var)
-                else:
-                    sqlite_photo_id = None
+                if not (isinstance(photo_id, str) and photo_id):
+                    photo_id = None
                     if USE_SQLITE and isinstance(app_data, dict):
                         raw = app_data.get('id_photo_file_id')
                         if isinstance(raw, str) and raw:
-                            sqlite_photo_id = raw
-                    if sqlite_photo_id:
-                        await context.bot.send_photo(chat_id=user.id, photo=sqlite_photo_id, caption=app_text_var)
-                    else:
-                        await context.bot.send_message(chat_id=user.id, text=app_text_var)
+                            photo_id = raw
+                if not await _send_app_photo(context.bot, user.id, app_text_var, file_id=photo_id, photo_key=photo_key):
+                    await context.bot.send_message(chat_id=user.id, text=app_text_var)
         except Exception as e:
-            logger.warning(f"DM-ə müraciət göndərərkən xəta: {e}")
+            logger.warning("DM-ə müraciət göndərərkən xəta: %s", e)
             if user:
                 await context.bot.send_message(
                     chat_id=user.id,
@@ -743,10 +893,12 @@ async def exec_reject_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             app_text: Optional[str] = None
             sqlite_photo_id: Optional[str] = None
+            photo_key: Optional[str] = None
             if USE_SQLITE:
                 from db_sqlite import get_application_by_id_sqlite
                 app_data = get_application_by_id_sqlite(app_id)
                 if app_data:
+                    photo_key = app_data.get('photo_key')
                     time_str = str(app_data.get('created_at', ''))
                     app_text = (
                         "📋 Müraciət xülasəsi:\n"
@@ -765,6 +917,7 @@ async def exec_reject_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 from db_operations import get_application_by_id
                 app = get_application_by_id(app_id)
                 if app:
+                    photo_key = app.photo_key  # type: ignore[assignment]
                     # Bakı vaxtı
                     try:
                         from config import BAKU_TZ
@@ -789,14 +942,12 @@ async def exec_reject_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if app_text:
                 # Foto varsa DM-də foto ilə göndər
                 photo_id = user_store.get("exec_photo_file_id")
-                if isinstance(photo_id, str) and photo_id:
-                    await context.bot.send_photo(chat_id=user.id, photo=photo_id, caption=app_text)
-                elif sqlite_photo_id:
-                    await context.bot.send_photo(chat_id=user.id, photo=sqlite_photo_id, caption=app_text)
-                else:
+                if not (isinstance(photo_id, str) and photo_id):
+                    photo_id = sqlite_photo_id
+                if not await _send_app_photo(context.bot, user.id, app_text, file_id=photo_id, photo_key=photo_key):
                     await context.bot.send_message(chat_id=user.id, text=app_text)
         except Exception as e:
-            logger.warning(f"DM-ə müraciət göndərərkən xəta: {e}")
+            logger.warning("DM-ə müraciət göndərərkən xəta: %s", e)
             if user:
                 await context.bot.send_message(
                     chat_id=user.id,
@@ -821,7 +972,7 @@ async def exec_collect_reply_text(update: Update, context: ContextTypes.DEFAULT_
             if not app:
                 await msg.reply_text("❌ Müraciət tapılmadı")
                 return ConversationHandler.END
-            await context.bot.send_message(chat_id=app["user_telegram_id"], text=f"✅ Müraciətinizə cavab:\n\n{text}")
+            delivery = await send_to_citizen(context.bot, app["user_telegram_id"], f"✅ Müraciətinizə cavab:\n\n{text}", use_sqlite=True)
             update_application_status_sqlite(app_id, "completed", notes=f"Replied by @{from_user.username or from_user.id}")
         else:
             from db_operations import get_application_by_id, update_application_status, ApplicationStatus
@@ -829,7 +980,7 @@ async def exec_collect_reply_text(update: Update, context: ContextTypes.DEFAULT_
             if not app:
                 await msg.reply_text("❌ Müraciət tapılmadı")
                 return ConversationHandler.END
-            await context.bot.send_message(chat_id=app.user_telegram_id, text=f"✅ Müraciətinizə cavab:\n\n{text}")  # type: ignore[arg-type]
+            delivery = await send_to_citizen(context.bot, app.user_telegram_id, f"✅ Müraciətinizə cavab:\n\n{text}", use_sqlite=False)  # type: ignore[arg-type]
             update_application_status(app_id, ApplicationStatus.COMPLETED, notes=f"Replied by @{from_user.username or from_user.id}", reply_text=text)
         
         # Qrup mesajında statusu yenilə və cavabı görünən et
@@ -848,6 +999,8 @@ async def exec_collect_reply_text(update: Update, context: ContextTypes.DEFAULT_
                 reply_excerpt = text if len(text) <= 300 else (text[:300] + "…")
                 exec_info = f"Cavablandıran Əməkdaş -(@{from_user.username if from_user.username else from_user.id})\n"
                 reply_block = f"\n{exec_info}✉️ Cavab: {reply_excerpt}"
+                if notice_for(delivery):
+                    reply_block += f"\n{notice_for(delivery)}"
                 # Əvvəlki cavab varsa, onu sil və yeni formatda əlavə et
                 if "✉️ Cavab:" in new_content:
                     new_content = re.sub(r"Cavablandıran Əməkdaş -\(@.*?\)\n✉️ Cavab:.*", "", new_content, flags=re.S)
@@ -878,11 +1031,14 @@ async def exec_collect_reply_text(update: Update, context: ContextTypes.DEFAULT_
                 # Yadda saxla ki, sonradan edit edəndə bu kontentdən istifadə edək
                 user_data["exec_original_content"] = new_content
             except Exception as edit_err:
-                logger.warning(f"Qrup mesajı yenilənmədi: {edit_err}")
+                logger.warning("Qrup mesajı yenilənmədi: %s", edit_err)
         
-        await msg.reply_text("✅ Cavab göndərildi")
+        if delivery == DeliveryResult.SENT:
+            await msg.reply_text("✅ Cavab göndərildi")
+        else:
+            await msg.reply_text(f"✅ Cavab qeydə alındı\n{notice_for(delivery)}")
     except Exception as e:
-        logger.error(f"exec_collect_reply_text error: {e}")
+        logger.error("exec_collect_reply_text error: %s", e)
         await msg.reply_text(f"❌ Xəta: {e}")
     finally:
         user_data.pop("exec_app_id", None)
@@ -940,7 +1096,7 @@ async def exec_edit_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if user:
             await context.bot.send_message(chat_id=user.id, text=preface)
     except Exception as dm_err:
-        logger.warning(f"Edit DM prompt göndərilə bilmədi: {dm_err}")
+        logger.warning("Edit DM prompt göndərilə bilmədi: %s", dm_err)
     return States.EXEC_EDIT_REPLY_TEXT
 
 
@@ -963,7 +1119,7 @@ async def exec_collect_edit_reply_text(update: Update, context: ContextTypes.DEF
                 await msg.reply_text("❌ Müraciət tapılmadı")
                 return ConversationHandler.END
             # Vətəndaşa yenilənmiş cavab göndər
-            await context.bot.send_message(chat_id=app["user_telegram_id"], text=f"♻️ Yenilənmiş cavab:\n\n{new_text}")
+            delivery = await send_to_citizen(context.bot, app["user_telegram_id"], f"♻️ Yenilənmiş cavab:\n\n{new_text}", use_sqlite=True)
             update_application_status_sqlite(app_id, "completed", notes=f"Edited by @{from_user.username or from_user.id}")
         else:
             from db_operations import get_application_by_id, update_application_status, ApplicationStatus
@@ -971,7 +1127,7 @@ async def exec_collect_edit_reply_text(update: Update, context: ContextTypes.DEF
             if not app:
                 await msg.reply_text("❌ Müraciət tapılmadı")
                 return ConversationHandler.END
-            await context.bot.send_message(chat_id=app.user_telegram_id, text=f"♻️ Yenilənmiş cavab:\n\n{new_text}")  # type: ignore[arg-type]
+            delivery = await send_to_citizen(context.bot, app.user_telegram_id, f"♻️ Yenilənmiş cavab:\n\n{new_text}", use_sqlite=False)  # type: ignore[arg-type]
             update_application_status(app_id, ApplicationStatus.COMPLETED, notes=f"Edited by @{from_user.username or from_user.id}", reply_text=new_text)
 
         # Qrup mesajında cavab mətni hissəsini yenilə
@@ -982,6 +1138,8 @@ async def exec_collect_edit_reply_text(update: Update, context: ContextTypes.DEF
                 CAP_LIMIT = 1000
                 reply_excerpt = new_text if len(new_text) <= 300 else (new_text[:300] + "…")
                 reply_block = "\n\n✉️ Cavab: " + reply_excerpt
+                if notice_for(delivery):
+                    reply_block += f"\n{notice_for(delivery)}"
                 if "✉️ Cavab:" in orig_content:
                     base = re.sub(r"✉️ Cavab:.*", "", orig_content, flags=re.S)
                     new_content = base + reply_block
@@ -1001,11 +1159,14 @@ async def exec_collect_edit_reply_text(update: Update, context: ContextTypes.DEF
                 # Yeni məzmunu gələcək düzəlişlər üçün yadda saxla
                 user_data["exec_original_content"] = new_content
             except Exception as e2:
-                logger.warning(f"Qrup mesajı yenilənmədi (edit): {e2}")
+                logger.warning("Qrup mesajı yenilənmədi (edit): %s", e2)
 
-        await msg.reply_text("✅ Cavab yeniləndi")
+        if delivery == DeliveryResult.SENT:
+            await msg.reply_text("✅ Cavab yeniləndi")
+        else:
+            await msg.reply_text(f"✅ Cavab yeniləndi\n{notice_for(delivery)}")
     except Exception as e:
-        logger.error(f"exec_collect_edit_reply_text error: {e}")
+        logger.error("exec_collect_edit_reply_text error: %s", e)
         await msg.reply_text(f"❌ Xəta: {e}")
     return ConversationHandler.END
 
@@ -1027,7 +1188,7 @@ async def exec_collect_reject_reason(update: Update, context: ContextTypes.DEFAU
             if not app:
                 await msg.reply_text("❌ Müraciət tapılmadı")
                 return ConversationHandler.END
-            await context.bot.send_message(chat_id=app["user_telegram_id"], text=f"❌ Müraciət rədd edildi. Səbəb:\n\n{reason}")
+            delivery = await send_to_citizen(context.bot, app["user_telegram_id"], f"❌ Müraciət rədd edildi. Səbəb:\n\n{reason}", use_sqlite=True)
             update_application_status_sqlite(app_id, "rejected", notes=f"Rejected by @{from_user.username or from_user.id}: {reason}")
         else:
             from db_operations import get_application_by_id, update_application_status, ApplicationStatus
@@ -1035,7 +1196,7 @@ async def exec_collect_reject_reason(update: Update, context: ContextTypes.DEFAU
             if not app:
                 await msg.reply_text("❌ Müraciət tapılmadı")
                 return ConversationHandler.END
-            await context.bot.send_message(chat_id=app.user_telegram_id, text=f"❌ Müraciət rədd edildi. Səbəb:\n\n{reason}")  # type: ignore[arg-type]
+            delivery = await send_to_citizen(context.bot, app.user_telegram_id, f"❌ Müraciət rədd edildi. Səbəb:\n\n{reason}", use_sqlite=False)  # type: ignore[arg-type]
             update_application_status(app_id, ApplicationStatus.REJECTED, notes=f"Rejected by @{from_user.username or from_user.id}: {reason}", reply_text=reason)
         
         # Qrup mesajında statusu yenilə (cavab mesajı göstərmə, sadəcə status dəyiş)
@@ -1049,6 +1210,8 @@ async def exec_collect_reject_reason(update: Update, context: ContextTypes.DEFAU
                     f"⚫ Status: İmtina (@{from_user.username or from_user.id})",
                     orig_content
                 )
+                if notice_for(delivery):
+                    new_content = new_content.rstrip() + f"\n{notice_for(delivery)}"
                 if has_photo:
                     await context.bot.edit_message_caption(
                         chat_id=exec_chat_id,
@@ -1062,7 +1225,7 @@ async def exec_collect_reject_reason(update: Update, context: ContextTypes.DEFAU
                         text=new_content
                     )
             except Exception as edit_err:
-                logger.warning(f"Qrup mesajı yenilənmədi: {edit_err}")
+                logger.warning("Qrup mesajı yenilənmədi: %s", edit_err)
         
         # Auto-blacklist qaydası: eyni istifadəçi çox imtina alıbsa qara siyahıya sal
         try:
@@ -1077,25 +1240,22 @@ async def exec_collect_reject_reason(update: Update, context: ContextTypes.DEFAU
                     rej_count = count_user_rejections_sqlite(target_uid, days=BLACKLIST_WINDOW_DAYS)  # type: ignore[possibly-unbound]
                     if rej_count >= BLACKLIST_REJECTION_THRESHOLD and not is_user_blacklisted_sqlite(target_uid):  # type: ignore[possibly-unbound]
                         add_user_to_blacklist_sqlite(target_uid, reason=f"{rej_count} imtina / {BLACKLIST_WINDOW_DAYS} gün")  # type: ignore[possibly-unbound]
-                        try:
-                            await context.bot.send_message(chat_id=target_uid, text="⚠️ Çox sayda imtina səbəbilə müraciətləriniz müvəqqəti qəbul edilmir.")  # type: ignore[arg-type]
-                        except Exception:
-                            pass
+                        await send_to_citizen(context.bot, target_uid, "⚠️ Çox sayda imtina səbəbilə müraciətləriniz müvəqqəti qəbul edilmir.", use_sqlite=USE_SQLITE)
                 else:
                     from db_operations import count_user_rejections, add_user_to_blacklist, is_user_blacklisted
                     rej_count = count_user_rejections(target_uid, days=BLACKLIST_WINDOW_DAYS)  # type: ignore[possibly-unbound]
                     if rej_count >= BLACKLIST_REJECTION_THRESHOLD and not is_user_blacklisted(target_uid):  # type: ignore[possibly-unbound]
                         add_user_to_blacklist(target_uid, reason=f"{rej_count} imtina / {BLACKLIST_WINDOW_DAYS} gün")  # type: ignore[possibly-unbound]
-                        try:
-                            await context.bot.send_message(chat_id=target_uid, text="⚠️ Çox sayda imtina səbəbilə müraciətləriniz müvəqqəti qəbul edilmir.")  # type: ignore[arg-type]
-                        except Exception:
-                            pass
+                        await send_to_citizen(context.bot, target_uid, "⚠️ Çox sayda imtina səbəbilə müraciətləriniz müvəqqəti qəbul edilmir.", use_sqlite=USE_SQLITE)
         except Exception as bl_e:
-            logger.error(f"Auto-blacklist xətası: {bl_e}")
+            logger.error("Auto-blacklist xətası: %s", bl_e)
 
-        await msg.reply_text("✅ İmtina səbəbi göndərildi")
+        if delivery == DeliveryResult.SENT:
+            await msg.reply_text("✅ İmtina səbəbi göndərildi")
+        else:
+            await msg.reply_text(f"✅ İmtina qeydə alındı\n{notice_for(delivery)}")
     except Exception as e:
-        logger.error(f"exec_collect_reject_reason error: {e}")
+        logger.error("exec_collect_reject_reason error: %s", e)
         await msg.reply_text(f"❌ Xəta: {e}")
     finally:
         user_data.pop("exec_app_id", None)
@@ -1168,6 +1328,193 @@ async def export_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if update.effective_message:
             await update.effective_message.reply_text(f"❌ Export xətası: {e}")
 
+async def conversation_timeout_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Vətəndaş anketi conversation_timeout müddətində tamamlanmadı"""
+    had_draft = _ud(context).pop("app", None) is not None
+    user = update.effective_user if isinstance(update, Update) else None
+    if had_draft and DRAFT_EXPIRED_NOTICE and user:
+        await send_to_citizen(
+            context.bot, user.id, MESSAGES["draft_expired"], use_sqlite=USE_SQLITE,
+            rate_limit_args={"priority": Priority.COSMETIC},
+        )
+    logger.info("⌛ Anket vaxtı bitdi: user=%s", user.id if user else '?')
+
+async def citizen_seen(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Şəxsi chat-dan gələn yenilik - çatdırılma blokunu sıfırla"""
+    chat = update.effective_chat
+    if DB_ENABLED and chat and chat.type == "private" and update.effective_user:
+        await mark_reachable(update.effective_user.id, use_sqlite=USE_SQLITE)
+
+async def exec_timeout_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """İcraçı cavab/imtina dialoqu tamamlanmadı - saxlanılan məzmunu burax"""
+    user_data = _ud(context)
+    app_id = user_data.get("exec_app_id")
+    for key in eviction.EXEC_KEYS:
+        user_data.pop(key, None)
+    logger.info("⌛ İcraçı dialoqu vaxtı bitdi: app_id=%s", app_id)
+
+async def memstats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Yaddaş uçotu (admin)"""
+    if not update.effective_user or not update.effective_message:
+        return
+    if not _is_admin(update.effective_user.id):
+        await update.effective_message.reply_text("❌ İcazə yoxdur")
+        return
+    m = eviction.memory_stats(context.application)
+    lines = [
+        "🧠 Yaddaş:",
+        f"user_data: {m['user_data']} (qaralama: {m['drafts']}, icraçı dialoqu: {m['exec_pending']})",
+        f"chat_data: {m['chat_data']} | izlənən: {m['tracked']}",
+        f"user_data təxmini ölçü: {m['user_data_bytes'] / 1024:.1f} KB",
+        "Söhbətlər: " + (", ".join(f"{k}={v}" for k, v in m["conversations"].items()) or "-"),
+    ]
+    if m["rss_bytes"]:
+        lines.append(f"RSS: {m['rss_bytes'] / 1024 / 1024:.1f} MB")
+    lines.append(f"TTL: {USER_DATA_TTL_HOURS:g} saat | anket timeout: {CONVERSATION_TIMEOUT_MIN:g} dəq")
+    await update.effective_message.reply_text("\n".join(lines))
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms" if seconds >= 0.01 else f"{seconds * 1000:.1f}ms"
+
+async def perf_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Loop gecikməsi, handler, DB və Bot API persentilləri (admin)"""
+    if not update.effective_user or not update.effective_message:
+        return
+    if not _is_admin(update.effective_user.id):
+        await update.effective_message.reply_text("❌ İcazə yoxdur")
+        return
+    p = perf.summary()
+    lag = p["loop_lag"]
+    lines = [
+        "⏱ Performans:",
+        f"Loop lag: p50={_ms(lag['p50'])} p95={_ms(lag['p95'])} p99={_ms(lag['p99'])} | max (1 dəq)={_ms(lag['max_1m'])}",
+    ]
+    if p["updates"]:
+        u = p["updates"]
+        lines.append(f"Yeniliklər: p50={_ms(u[0.5])} p95={_ms(u[0.95])} p99={_ms(u[0.99])}")
+    lines.append("\n🧩 Handler-lər (p95 üzrə):")
+    for r in p["handlers"]:
+        lines.append(f"{r['name']}: n={r['count']} p50={_ms(r['p50'])} p95={_ms(r['p95'])} p99={_ms(r['p99'])}")
+    lines.append("\n🗄 DB (cəmi vaxt üzrə):")
+    for r in p["db"]:
+        lines.append(f"{r['name']}: n={r['count']} cəmi={_ms(r['total'])} p95={_ms(r['p95'])}")
+    if p["db_loop_blocked"]:
+        lines.append("Loop-u bloklayan DB: " + ", ".join(f"{op}={_ms(v)}" for op, v in p["db_loop_blocked"][:5]))
+    heavy = sql_trace.top(5)
+    if heavy:
+        lines.append("\n🧮 SQL (cəmi vaxt üzrə):")
+        for r in heavy:
+            lines.append(f"n={r['count']} cəmi={_ms(r['total'])} maks={_ms(r['max'])}: {r['sql'][:120]}")
+    lines.append("\n📡 Bot API:")
+    for r in p["api"]:
+        lines.append(f"{r['name']}: n={r['count']} p50={_ms(r['p50'])} p95={_ms(r['p95'])} p99={_ms(r['p99'])}")
+    await update.effective_message.reply_text("\n".join(lines))
+
+def _trace_line(t: "tracing.Trace") -> str:
+    root = t.root
+    attrs = root.attrs if root else {}
+    what = attrs.get("command") or attrs.get("data") or attrs.get("type", "-")
+    dur = _ms(root.duration) if root and root.duration is not None else "…"
+    when = datetime.fromtimestamp(root.start, BAKU_TZ).strftime("%H:%M:%S") if root else ""
+    mark = " ❌" if t.error else ""
+    return f"{t.trace_id} {when} user={attrs.get('user_id', '-')} {what} {dur} ({len(t.spans)} span){mark}"
+
+async def trace_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Son yeniliklərin trace-ləri: /trace, /trace slow, /trace <user_id>, /trace <trace_id> (admin)"""
+    if not update.effective_user or not update.effective_message:
+        return
+    if not _is_admin(update.effective_user.id):
+        await update.effective_message.reply_text("❌ İcazə yoxdur")
+        return
+    if not TRACE_ENABLED:
+        await update.effective_message.reply_text("Trace söndürülüb (TRACE=0)")
+        return
+    arg = context.args[0] if context.args else ""
+    found = tracing.find(arg) if len(arg) >= 4 and not arg.isdigit() else None
+    if found is not None:
+        text = f"🧵 Trace {found.trace_id}\n" + tracing.render_tree(found)
+        if found.error:
+            text += f"\n\nXəta: {found.error}"
+        await update.effective_message.reply_text(text[:4000])
+        return
+    if arg.isdigit():
+        traces, title = tracing.recent(15, user_id=int(arg)), f"🧵 İstifadəçi {arg} üzrə son trace-lər:"
+    elif arg == "slow":
+        traces, title = tracing.recent(15, slow=True), "🧵 Ən yavaş trace-lər:"
+    elif arg:
+        await update.effective_message.reply_text("Trace tapılmadı (bufer yalnız son yenilikləri saxlayır)")
+        return
+    else:
+        traces, title = tracing.recent(15), "🧵 Son trace-lər:"
+    if not traces:
+        await update.effective_message.reply_text("Trace yoxdur")
+        return
+    lines = [title] + [_trace_line(t) for t in traces] + ["\nƏtraflı: /trace <trace_id>"]
+    await update.effective_message.reply_text("\n".join(lines)[:4000])
+
+def _profile_summary(result: "profiler.ProfileResult") -> str:
+    lines = [
+        f"🔥 Profil: {result.duration:.0f} san, {result.samples} nümunə ({result.interval * 1000:g} ms)",
+        f"Event loop məşğulluğu: {result.busy_ratio() * 100:.1f}%",
+    ]
+    top = result.top_own(10)
+    if top:
+        lines.append("\nsrc/ funksiyaları (inklüziv nümunə):")
+        lines.extend(f"{count} — {frame[4:]}" for frame, count in top)
+    return "\n".join(lines)
+
+async def _run_profile(bot, chat_id: int, seconds: int, interval: float) -> None:
+    try:
+        result = await profiler.profile(seconds, interval)
+        path = await asyncio.to_thread(profiler.save, result, PROFILE_DIR)
+    except Exception as e:
+        logger.error(f"Profil xətası: {e}", exc_info=True)
+        await bot.send_message(chat_id=chat_id, text=f"❌ Profil xətası: {e}")
+        return
+    logger.info(f"🔥 Profil yazıldı: {path}")
+    import io
+    data = io.BytesIO(result.collapsed().encode("utf-8"))
+    await bot.send_document(
+        chat_id=chat_id,
+        document=data,
+        filename=_os.path.basename(path),
+        caption=_profile_summary(result)[:1024],
+    )
+
+async def profile_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Seçmə profiler: /profile [saniyə] [interval_ms] - collapsed stack faylı göndərir (admin)"""
+    if not update.effective_user or not update.effective_message or not update.effective_chat:
+        return
+    if not _is_admin(update.effective_user.id):
+        await update.effective_message.reply_text("❌ İcazə yoxdur")
+        return
+    if profiler.running():
+        await update.effective_message.reply_text("⏳ Profiler artıq işləyir")
+        return
+    try:
+        seconds = int(context.args[0]) if context.args else 30
+        interval_ms = float(context.args[1]) if context.args and len(context.args) > 1 else PROFILE_INTERVAL_MS
+    except ValueError:
+        await update.effective_message.reply_text("İstifadə: /profile [saniyə] [interval_ms]")
+        return
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+    interval_ms = max(1.0, interval_ms)
+    await update.effective_message.reply_text(
+        f"🔥 Profil başladı: {seconds} san, {interval_ms:g} ms interval. Nəticə fayl kimi göndəriləcək."
+    )
+    # Handler gözlədilmir - adminin sonrakı yenilikləri növbədə qalmasın
+    context.application.create_task(
+        _run_profile(context.bot, update.effective_chat.id, seconds, interval_ms / 1000), update=update
+    )
+
+async def _profile_on_start(seconds: int) -> None:
+    try:
+        result = await profiler.profile(seconds, PROFILE_INTERVAL_MS / 1000)
+        path = await asyncio.to_thread(profiler.save, result, PROFILE_DIR, "startup")
+        logger.info(f"🔥 Başlanğıc profili yazıldı: {path}\n{_profile_summary(result)}")
+    except Exception as e:
+        logger.error(f"Başlanğıc profili alınmadı: {e}")
+
 async def ping_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_message:
         await update.effective_message.reply_text("🏓 Pong")
@@ -1320,6 +1667,150 @@ async def unban_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"/unban xətası: {e}")
         await update.effective_message.reply_text("❌ Xəta baş verdi")
 
+async def queue_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Göndərmə növbəsinin vəziyyəti (admin)"""
+    if not update.effective_user or not update.effective_message:
+        return
+    if not _is_admin(update.effective_user.id):
+        await update.effective_message.reply_text("❌ İcazə yoxdur")
+        return
+    limiter = context.bot.rate_limiter if hasattr(context.bot, "rate_limiter") else None
+    if not isinstance(limiter, SendScheduler):
+        await update.effective_message.reply_text("ℹ️ Send scheduler aktiv deyil")
+        return
+    s = limiter.stats()
+    lines = [
+        "📤 Göndərmə növbəsi:",
+        f"Növbədə: {s['depth']} (icrada: {s['inflight']})",
+        "Prioritet üzrə: " + ", ".join(f"{k}={v}" for k, v in s["by_priority"].items()),
+        f"İzlənən chat-lər: {s['chats_tracked']}",
+        f"RetryAfter: {int(s['retry_after'])} | Birləşdirilmiş redaktə: {int(s['coalesced'])}",
+    ]
+    processor = context.application.update_processor
+    if isinstance(processor, PerUserUpdateProcessor):
+        u = processor.stats()
+        lines.append(
+            f"⚙️ Yeniliklər: işçi {u['active']}/{u['workers']}, gözləyən istifadəçi: {u['keys_waiting']}"
+        )
+    for label, pct in s["wait"].items():
+        lines.append(
+            f"⏱ {label}: p50={pct[0.5] * 1000:.0f}ms p95={pct[0.95] * 1000:.0f}ms p99={pct[0.99] * 1000:.0f}ms"
+        )
+    await update.effective_message.reply_text("\n".join(lines))
+
+_BROADCAST_OPT_RE = re.compile(r"^(since|type)=(\S+)\s*")
+
+async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Keçmiş müraciətçilərə kütləvi elan (admin).
+
+    İstifadə: /broadcast [since=YYYY-MM-DD] [type=complaint|suggestion|application] <mətn>
+              /broadcast stop <id>
+    """
+    msg = update.effective_message
+    if not update.effective_user or not msg:
+        return
+    if not _is_admin(update.effective_user.id):
+        await msg.reply_text("❌ İcazə yoxdur")
+        return
+    if not DB_ENABLED:
+        await msg.reply_text("⚠️ Database deaktiv, elan mümkün deyil.")
+        return
+    parts = (msg.text or "").split(maxsplit=1)
+    rest = parts[1].strip() if len(parts) > 1 else ""
+    stop = re.match(r"^stop\s+(\d+)$", rest)
+    if stop:
+        if broadcast.cancel_broadcast(int(stop.group(1))):
+            await msg.reply_text(f"🛑 Elan #{stop.group(1)} dayandırılır…")
+        else:
+            await msg.reply_text("Bu ID ilə işləyən elan yoxdur")
+        return
+    since = None
+    form_type = None
+    while True:
+        m = _BROADCAST_OPT_RE.match(rest)
+        if not m:
+            break
+        key, value = m.group(1), m.group(2)
+        if key == "since":
+            try:
+                since = datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                await msg.reply_text("Tarix formatı: since=YYYY-MM-DD")
+                return
+        else:
+            if value not in ("complaint", "suggestion", "application"):
+                await msg.reply_text("Növ: type=complaint|suggestion|application")
+                return
+            form_type = value
+        rest = rest[m.end():]
+    text = rest.strip()
+    if not text:
+        await msg.reply_text(
+            "İstifadə: /broadcast [since=YYYY-MM-DD] [type=complaint|suggestion|application] <mətn>\n"
+            "Dayandırmaq: /broadcast stop <id>"
+        )
+        return
+    try:
+        total = broadcast.count_recipients(since, form_type, use_sqlite=USE_SQLITE)
+    except Exception as e:
+        logger.error(f"/broadcast sayma xətası: {e}")
+        await msg.reply_text("❌ Xəta baş verdi")
+        return
+    if total == 0:
+        await msg.reply_text("ℹ️ Filtrə uyğun alıcı yoxdur")
+        return
+    _ud(context)["broadcast_draft"] = {"text": text, "since": since, "form_type": form_type, "total": total}
+    keyboard = InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("✅ Göndər", callback_data="confirm_broadcast"),
+            InlineKeyboardButton("❌ Ləğv et", callback_data="cancel_broadcast"),
+        ]
+    ])
+    filters_text = []
+    if since:
+        filters_text.append(f"{since.strftime('%d.%m.%Y')}-dən sonra")
+    if form_type:
+        filters_text.append(form_type)
+    await msg.reply_text(
+        f"📢 Elan {total} vətəndaşa göndəriləcək"
+        + (f" ({', '.join(filters_text)})" if filters_text else "")
+        + f":\n\n{text}",
+        reply_markup=keyboard,
+    )
+
+async def confirm_broadcast_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if not query:
+        return
+    if not query.from_user or not _is_admin(query.from_user.id):
+        await query.answer("❌ İcazə yoxdur", show_alert=True)
+        return
+    await query.answer()
+    draft = _ud(context).pop("broadcast_draft", None)
+    if not draft:
+        await query.edit_message_text("⚠️ Elan qaralaması tapılmadı, /broadcast ilə yenidən başlayın")
+        return
+    try:
+        report = await query.edit_message_text("📢 Elan növbəyə qoyuldu…")
+        report_msg_id = report.message_id if hasattr(report, "message_id") else None
+        report_chat_id = query.message.chat.id if query.message else None
+        bc = broadcast.create_broadcast(
+            draft["text"], draft["since"], draft["form_type"], draft["total"],
+            query.from_user.id, report_chat_id, report_msg_id, use_sqlite=USE_SQLITE,
+        )
+        broadcast.start_broadcast(context.application, bc, use_sqlite=USE_SQLITE)
+        logger.info(f"📢 Elan #{bc['id']} başladı: {draft['total']} alıcı, admin={query.from_user.id}")
+    except Exception as e:
+        logger.error(f"Elan başlama xətası: {e}")
+        await query.edit_message_text("❌ Elan başladıla bilmədi")
+
+async def cancel_broadcast_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if query:
+        _ud(context).pop("broadcast_draft", None)
+        await query.answer()
+        await query.edit_message_text("❌ Elan ləğv edildi")
+
 async def clearall_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """⚠️ Bütün müraciətləri sil (test məlumatları üçün)"""
     if not update.effective_user or not update.effective_message:
@@ -1361,6 +1852,9 @@ async def confirm_clearall_callback(update: Update, context: ContextTypes.DEFAUL
         else:
             from db_operations import delete_all_applications
             count = delete_all_applications()
+        profiles.clear()
+        photo_hash.clear()
+        await asyncio.to_thread(media_store.remove_all)
         await query.answer()
         await query.edit_message_text(f"✅ {count} müraciət silindi!")
     except Exception as e:
@@ -1374,33 +1868,138 @@ async def cancel_clearall_callback(update: Update, context: ContextTypes.DEFAULT
         await query.answer()
         await query.edit_message_text("❌ Ləğv edildi")
 
-def build_app() -> Application:
+async def _post_init(application: Application) -> None:
+    """Bot işə düşəndən sonra: yarımçıq elanları davam etdir, TTL təmizləməsini başlat"""
+    global _monitor_server
+    eviction.start(application, ttl=USER_DATA_TTL_HOURS * 3600, interval=EVICTION_INTERVAL_MIN * 60)
+    perf.start(interval=LOOP_LAG_INTERVAL_MS / 1000)
+    tracing.configure(enabled=TRACE_ENABLED, buffer_size=TRACE_BUFFER, sample_rate=TRACE_SAMPLE_RATE,
+                      file_path=TRACE_FILE or None)
+    if UPDATE_RECORD_FILE:
+        update_recorder.configure(
+            UPDATE_RECORD_FILE,
+            key=update_recorder.derive_key(UPDATE_RECORD_KEY, BOT_TOKEN),
+            keep_ids=ADMIN_USER_IDS,
+            meta={"executor_chat_id": EXECUTOR_CHAT_ID, "admin_ids": sorted(ADMIN_USER_IDS)},
+            max_mb=UPDATE_RECORD_MAX_MB,
+        )
+    if PROFILE_ON_START > 0:
+        asyncio.create_task(_profile_on_start(min(PROFILE_ON_START, PROFILE_MAX_SECONDS)))
+    if MEDIA_STORE_ENABLED:
+        media_store.configure(MEDIA_DIR, MEDIA_THUMB_PX)
+    if DB_ENABLED and (PHOTO_HASH_ENABLED or MEDIA_STORE_ENABLED):
+        photo_hash.start(use_sqlite=USE_SQLITE, workers=PHOTO_HASH_WORKERS)
+    if DB_ENABLED:
+        resumed = broadcast.resume_unfinished(application, use_sqlite=USE_SQLITE)
+        if resumed:
+            logger.info(f"↩️ {resumed} yarımçıq elan davam etdirilir")
+    if BOT_MODE != "webhook" and HTTP_SERVER_ENABLED:
+        # Webhook rejimində /health və /metrics webhook serverinin özündədir
+        from http_server import start_server
+        _monitor_server = await start_server(
+            application,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            health_path=HEALTH_PATH,
+            metrics_path=METRICS_PATH,
+            metrics_token=METRICS_TOKEN or None,
+            db_ping=_db_ping if DB_ENABLED else None,
+            poll_stale_s=HEALTH_POLL_STALE_S,
+        )
+
+async def _post_stop(application: Application) -> None:
+    global _monitor_server
+    if _monitor_server is not None:
+        from http_server import stop_server
+        await stop_server(_monitor_server)
+        _monitor_server = None
+    await broadcast.stop_all()
+    await eviction.stop()
+    await photo_hash.stop()
+    await perf.stop()
+    tracing.shutdown()
+    update_recorder.shutdown()
+
+def _db_ping() -> None:
+    """/health üçün DB yoxlaması (aktiv backend üzrə)"""
+    if USE_SQLITE:
+        from db_sqlite import ping_sqlite
+        ping_sqlite()
+    else:
+        from db_operations import ping
+        ping()
+
+def build_app(request: Optional[BaseRequest] = None) -> Application:
+    """Application qur; request verilibsə Bot API sorğuları onunla göndərilir
+    (şəbəkəsiz benchmark və testlər üçün, bax bench/conversation_load.py)"""
     if not BOT_TOKEN:
         raise RuntimeError("BOT_TOKEN təyin edilməyib. .env faylını yoxlayın.")
+    persist = PERSISTENCE_ENABLED and DB_ENABLED
     conv = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
+            States.PROFILE: [CallbackQueryHandler(choose_profile, pattern=r"^profile_(reuse|new)$")],
             States.FULLNAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_fullname)],
             States.PHONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_phone)],
             States.FIN: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_fin)],
             States.ID_PHOTO: [MessageHandler(filters.PHOTO, collect_id_photo)],
             States.FORM_TYPE: [CallbackQueryHandler(choose_form_type)],
-            States.SUBJECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_subject)],
             States.BODY: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_body)],
             States.CONFIRM: [CallbackQueryHandler(confirm_or_edit)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timeout_cb)],
         },
         fallbacks=[CommandHandler("help", help_cmd)],
         allow_reentry=True,
+        # Tamamlanmamış anket bu müddətdən sonra bitirilir (JobQueue tələb edir)
+        conversation_timeout=CONVERSATION_TIMEOUT_MIN * 60,
+        name="citizen_form",
+        persistent=persist,
+    )
+    # Bütün çıxan sorğular mərkəzi planlayıcıdan keçir (flood limitləri, prioritetlər)
+    scheduler = SendScheduler(
+        global_per_sec=SEND_GLOBAL_PER_SEC,
+        private_per_sec=SEND_PRIVATE_PER_SEC,
+        group_per_min=SEND_GROUP_PER_MIN,
+        burst=SEND_BURST,
+        max_retries=SEND_MAX_RETRIES,
+        enabled=SEND_RATE_LIMIT_ENABLED,
     )
+    builder = ApplicationBuilder().token(BOT_TOKEN)
+    if persist:
+        # Yarımçıq anketlər və icraçı dialoqları restartdan sonra davam edir
+        builder = builder.persistence(DBPersistence(use_sqlite=USE_SQLITE, update_interval=PERSISTENCE_INTERVAL))
+    if BOT_API_BASE_URL:
+        # Lokal Bot API serveri və ya test emulyatoru
+        base = BOT_API_BASE_URL.rstrip("/")
+        builder = builder.base_url(base).base_file_url(base.rsplit("/", 1)[0] + "/file/bot")
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    else:
+        builder = (
+            builder
+            # Hər Bot API metodunun müddəti ölçülür (/perf); timeout-lar əvvəlki kimi 30 san
+            .request(perf.TimedHTTPXRequest(
+                connection_pool_size=256,
+                connect_timeout=30.0,
+                read_timeout=30.0,
+                write_timeout=30.0,
+                pool_timeout=30.0,
+            ))
+            .get_updates_request(perf.TimedHTTPXRequest())
+        )
     app = (
-        ApplicationBuilder()
-        .token(BOT_TOKEN)
-        .connect_timeout(30.0)
-        .read_timeout(30.0)
-        .write_timeout(30.0)
-        .pool_timeout(30.0)
+        builder
+        .rate_limiter(scheduler)
+        # Fərqli vətəndaşlar paralel, eyni vətəndaşın yenilikləri ardıcıl
+        .concurrent_updates(PerUserUpdateProcessor(UPDATE_WORKERS, UPDATE_MAX_PENDING))
+        .post_init(_post_init)
+        .post_stop(_post_stop)
         .build()
     )
+    # Aktivlik izlənməsi (TTL təmizləməsi üçün) - digər handler-lərə mane olmur
+    app.add_handler(TypeHandler(Update, eviction.touch), group=-1)
+    # Botu blokdan çıxarıb yazan vətəndaşa cavablar yenidən göndərilsin (fonda, yeniliyi gözlətmir)
+    app.add_handler(TypeHandler(Update, citizen_seen, block=False), group=-2)
     app.add_handler(conv)
     # Global error handler
     app.add_error_handler(error_handler)
@@ -1409,31 +2008,43 @@ def build_app() -> Application:
         entry_points=[CallbackQueryHandler(exec_reply_entry, pattern=r"^exec_reply:\d+$")],
         states={
             States.EXEC_REPLY_TEXT: [MessageHandler(filters.TEXT & ~filters.COMMAND, exec_collect_reply_text)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, exec_timeout_cb)],
         },
         fallbacks=[],
         allow_reentry=False,
+        conversation_timeout=EXEC_CONVERSATION_TIMEOUT_MIN * 60,
         per_chat=False,
         per_user=True,
+        name="exec_reply",
+        persistent=persist,
     )
     exec_conv_reject = ConversationHandler(
         entry_points=[CallbackQueryHandler(exec_reject_entry, pattern=r"^exec_reject:\d+$")],
         states={
             States.EXEC_REJECT_REASON: [MessageHandler(filters.TEXT & ~filters.COMMAND, exec_collect_reject_reason)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, exec_timeout_cb)],
         },
         fallbacks=[],
         allow_reentry=False,
+        conversation_timeout=EXEC_CONVERSATION_TIMEOUT_MIN * 60,
         per_chat=False,
         per_user=True,
+        name="exec_reject",
+        persistent=persist,
     )
     exec_conv_edit = ConversationHandler(
         entry_points=[CallbackQueryHandler(exec_edit_entry, pattern=r"^edit_reply:\d+$")],
         states={
             States.EXEC_EDIT_REPLY_TEXT: [MessageHandler(filters.TEXT & ~filters.COMMAND, exec_collect_edit_reply_text)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, exec_timeout_cb)],
         },
         fallbacks=[],
         allow_reentry=False,
+        conversation_timeout=EXEC_CONVERSATION_TIMEOUT_MIN * 60,
         per_chat=False,
         per_user=True,
+        name="exec_edit",
+        persistent=persist,
     )
     app.add_handler(exec_conv_reply)
     app.add_handler(exec_conv_reject)
@@ -1446,6 +2057,14 @@ def build_app() -> Application:
     app.add_handler(CommandHandler("ban", ban_cmd))
     app.add_handler(CommandHandler("unban", unban_cmd))
     app.add_handler(CommandHandler("clearall", clearall_cmd))
+    app.add_handler(CommandHandler("queue", queue_cmd))
+    app.add_handler(CommandHandler("memstats", memstats_cmd))
+    app.add_handler(CommandHandler("perf", perf_cmd))
+    app.add_handler(CommandHandler("trace", trace_cmd))
+    app.add_handler(CommandHandler("profile", profile_cmd))
+    app.add_handler(CommandHandler("broadcast", broadcast_cmd))
+    app.add_handler(CallbackQueryHandler(confirm_broadcast_callback, pattern=r"^confirm_broadcast$"))
+    app.add_handler(CallbackQueryHandler(cancel_broadcast_callback, pattern=r"^cancel_broadcast$"))
     # Clearall callback handlers
     app.add_handler(CallbackQueryHandler(confirm_clearall_callback, pattern=r"^confirm_clearall$"))
     app.add_handler(CallbackQueryHandler(cancel_clearall_callback, pattern=r"^cancel_clearall$"))
@@ -1459,10 +2078,43 @@ def build_app() -> Application:
     # Qrup=1 ilə əlavə edirik ki, əsas command-lardan sonra yoxlanılsın
     app.add_handler(MessageHandler(filters.ALL, on_any_update), group=1)
     app.add_handler(MessageHandler(filters.COMMAND, unknown))
+    # Handler müddətləri (/perf) - bütün handler-lər əlavə olunduqdan sonra
+    perf.instrument_handlers(app)
     return app
 
+def _webhook_secret() -> str:
+    """WEBHOOK_SECRET verilməyibsə tokendən sabit secret törət (bütün replikalarda eyni)"""
+    if WEBHOOK_SECRET:
+        return WEBHOOK_SECRET
+    import hashlib
+    return hashlib.sha256(f"dsmf-webhook:{BOT_TOKEN}".encode()).hexdigest()
+
+def run_webhook_mode(app: Application) -> None:
+    """Webhook rejimi: Telegram yenilikləri push ilə göndərir, polling konflikti olmur"""
+    if not WEBHOOK_URL:
+        raise RuntimeError("BOT_MODE=webhook üçün WEBHOOK_URL təyin edilməlidir")
+    from http_server import run_webhook
+    path = WEBHOOK_PATH if WEBHOOK_PATH.startswith("/") else "/" + WEBHOOK_PATH
+    logger.info(f"🌐 Webhook rejimi: {WEBHOOK_URL}{path} (port {WEBHOOK_PORT})")
+    run_webhook(
+        app,
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=path,
+        webhook_url=f"{WEBHOOK_URL}{path}",
+        secret_token=_webhook_secret(),
+        health_path=HEALTH_PATH,
+        metrics_path=METRICS_PATH,
+        metrics_token=METRICS_TOKEN or None,
+        db_ping=_db_ping if DB_ENABLED else None,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        # Gözləyən yeniliklər atılmır - redeploy zamanı heç bir müraciət itmir
+        drop_pending_updates=False,
+    )
+
 def main():
     global USE_SQLITE, DB_ENABLED  # global-lar başda elan
+    validate_bot_settings()
     # Database-i initialize et (PostgreSQL və ya SQLite)
     if DB_ENABLED:
         try:
@@ -1510,8 +2162,12 @@ def main():
     logger.info(f"⏰ Start time: {datetime.now(BAKU_TZ).strftime('%d.%m.%Y %H:%M:%S')}")
     
     try:
-        # drop_pending_updates=True – əvvəlki instansiyadan qalan uzun polling sorğularını təmizləyir
-        app.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+        if BOT_MODE == "webhook":
+            run_webhook_mode(app)
+        else:
+            # drop_pending_updates=True – əvvəlki instansiyadan qalan uzun polling sorğularını təmizləyir.
+            # Persistence aktivdirsə yeniliklər saxlanılır ki, restart zamanı yazılan mesajlar itməsin.
+            app.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=app.persistence is None)
     except KeyboardInterrupt:
         logger.info("Bot dayandırıldı (KeyboardInterrupt)")
     except Exception as e:
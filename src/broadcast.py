@@ -0,0 +1,212 @@
+"""
+Keçmiş müraciətçilərə kütləvi elan göndərişi
+
+Alıcılar applications cədvəlindən keyset səhifələmə ilə axınla oxunur,
+hər səhifə məhdud paralellik və ayrıca sürət limiti ilə göndərilir, sonra
+broadcasts cədvəlinə checkpoint yazılır. Proses çöksə, növbəti işə salınmada
+son checkpoint-dən davam edir.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from config import BROADCAST_BATCH_SIZE, BROADCAST_CONCURRENCY, BROADCAST_PER_SEC
+from delivery import DeliveryResult, send_to_citizen
+from metrics import REGISTRY
+from send_scheduler import Priority, TokenBucket
+
+logger = logging.getLogger("dsmf-broadcast")
+
+_sent_total = REGISTRY.counter("broadcast_messages_total", "Kütləvi elan göndərişləri (nəticə üzrə)")
+
+# broadcast_id -> işləyən task
+_running: Dict[int, asyncio.Task] = {}
+_cancelled: set = set()
+
+
+# ---------- Backend seçimi ----------
+def count_recipients(since=None, form_type: Optional[str] = None, *, use_sqlite: bool) -> int:
+    if use_sqlite:
+        from db_sqlite import count_applicants_sqlite
+        return count_applicants_sqlite(since, form_type)
+    from db_operations import count_applicants
+    return count_applicants(since, form_type)
+
+
+def _next_page(after_user_id: int, since, form_type, use_sqlite: bool) -> list:
+    if use_sqlite:
+        from db_sqlite import get_applicant_ids_page_sqlite
+        return get_applicant_ids_page_sqlite(after_user_id, BROADCAST_BATCH_SIZE, since, form_type)
+    from db_operations import get_applicant_ids_page
+    return get_applicant_ids_page(after_user_id, BROADCAST_BATCH_SIZE, since, form_type)
+
+
+def _checkpoint(bc_id: int, last_user_id: int, sent: int, failed: int, skipped: int,
+                status: Optional[str], use_sqlite: bool) -> None:
+    if use_sqlite:
+        from db_sqlite import update_broadcast_progress_sqlite
+        update_broadcast_progress_sqlite(bc_id, last_user_id, sent, failed, skipped, status)
+    else:
+        from db_operations import update_broadcast_progress
+        update_broadcast_progress(bc_id, last_user_id, sent, failed, skipped, status)
+
+
+def create_broadcast(text: str, since, form_type: Optional[str], total: int, created_by: Optional[int],
+                     report_chat_id: Optional[int], report_message_id: Optional[int], *, use_sqlite: bool) -> dict:
+    if use_sqlite:
+        from db_sqlite import create_broadcast_sqlite, get_broadcast_sqlite
+        bc_id = create_broadcast_sqlite(text, since, form_type, total, created_by, report_chat_id, report_message_id)
+        return get_broadcast_sqlite(bc_id) or {}
+    from db_operations import create_broadcast as _create, get_broadcast
+    bc_id = _create(text, since, form_type, total, created_by, report_chat_id, report_message_id)
+    return get_broadcast(bc_id) or {}
+
+
+# ---------- Göndəriş ----------
+def _format_report(bc: dict, sent: int, failed: int, skipped: int, elapsed: float, processed: int, final: str = "") -> str:
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    header = final or "📢 Elan göndərilir…"
+    return (
+        f"{header} (#{bc['id']})\n"
+        f"Alıcılar: {bc.get('total') or 0}\n"
+        f"✅ Göndərildi: {sent}\n"
+        f"❌ Uğursuz: {failed}\n"
+        f"⏭ Ötürüldü (əlçatmaz): {skipped}\n"
+        f"⚡ Sürət: {rate:.1f} mesaj/san | ⏱ {elapsed:.0f} san"
+    )
+
+
+async def _report(bot, bc: dict, text: str) -> None:
+    chat_id, message_id = bc.get("report_chat_id"), bc.get("report_message_id")
+    if not chat_id or not message_id:
+        return
+    try:
+        await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text)
+    except Exception as e:
+        # "message is not modified" və s. - hesabat kosmetikdir
+        logger.debug("Elan hesabatı yenilənmədi: %s", e)
+
+
+async def run_broadcast(bot, bc: dict, *, use_sqlite: bool) -> None:
+    """Elanı son checkpoint-dən sona qədər göndər"""
+    bc_id = int(bc["id"])
+    text = bc["text"]
+    since, form_type = bc.get("since"), bc.get("form_type")
+    after = int(bc.get("last_user_id") or 0)
+    sent, failed, skipped = int(bc.get("sent") or 0), int(bc.get("failed") or 0), int(bc.get("skipped") or 0)
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    bucket = TokenBucket(BROADCAST_PER_SEC, max(1.0, BROADCAST_PER_SEC))
+    started = time.monotonic()
+    processed = 0
+    if after:
+        logger.info("↩️ Elan #%s checkpoint-dən davam edir: user_id > %s", bc_id, after)
+
+    async def send_one(uid: int) -> DeliveryResult:
+        async with semaphore:
+            while True:
+                wait = bucket.delay(time.monotonic())
+                if wait <= 0:
+                    bucket.take(time.monotonic())
+                    break
+                await asyncio.sleep(wait)
+            return await send_to_citizen(
+                bot, uid, text, use_sqlite=use_sqlite,
+                rate_limit_args={"priority": Priority.BULK},
+            )
+
+    status = "done"
+    error: Optional[Exception] = None
+    try:
+        while True:
+            if bc_id in _cancelled:
+                status = "cancelled"
+                break
+            page = _next_page(after, since, form_type, use_sqlite)
+            if not page:
+                break
+            results = await asyncio.gather(*(send_one(uid) for uid in page))
+            for res in results:
+                _sent_total.inc(result=res.value)
+                if res == DeliveryResult.SENT:
+                    sent += 1
+                elif res == DeliveryResult.SKIPPED:
+                    skipped += 1
+                else:
+                    failed += 1
+            processed += len(page)
+            after = page[-1]
+            _checkpoint(bc_id, after, sent, failed, skipped, None, use_sqlite)
+            await _report(bot, bc, _format_report(bc, sent, failed, skipped, time.monotonic() - started, processed))
+    except asyncio.CancelledError:
+        # Bot dayandırılır - status running qalır ki, növbəti startda davam etsin
+        logger.info("⏸ Elan #%s dayandırıldı, checkpoint: user_id=%s", bc_id, after)
+        raise
+    except Exception as e:
+        # status failed - növbəti restartda səssizcə davam etməsin, admin xəbərdar olsun
+        logger.error("❌ Elan #%s xətası: %s", bc_id, e, exc_info=True)
+        status, error = "failed", e
+    finally:
+        _running.pop(bc_id, None)
+        _cancelled.discard(bc_id)
+
+    try:
+        _checkpoint(bc_id, after, sent, failed, skipped, status, use_sqlite)
+    except Exception as e:
+        logger.error("❌ Elan #%s yekun statusu yazılmadı: %s", bc_id, e)
+    elapsed = time.monotonic() - started
+    if status == "failed":
+        final = f"❌ Elan xəta ilə dayandı: {str(error)[:200]}"
+    else:
+        final = "✅ Elan tamamlandı" if status == "done" else "🛑 Elan dayandırıldı"
+    await _report(bot, bc, _format_report(bc, sent, failed, skipped, elapsed, processed, final))
+    logger.info(
+        "📢 Elan #%s %s: göndərildi=%s uğursuz=%s ötürüldü=%s (%.1f mesaj/san)",
+        bc_id, status, sent, failed, skipped, processed / elapsed if elapsed > 0 else 0.0,
+    )
+
+
+def start_broadcast(application, bc: dict, *, use_sqlite: bool) -> None:
+    bc_id = int(bc["id"])
+    if bc_id in _running:
+        return
+    # application.create_task deyil: Application.stop() o task-ları sona qədər gözləyir,
+    # elan isə dayandırılıb checkpoint-dən davam etdirilməlidir
+    _running[bc_id] = asyncio.create_task(
+        run_broadcast(application.bot, bc, use_sqlite=use_sqlite),
+        name=f"broadcast-{bc_id}",
+    )
+
+
+def cancel_broadcast(bc_id: int) -> bool:
+    """İşləyən elanı növbəti səhifədən sonra dayandır"""
+    if bc_id not in _running:
+        return False
+    _cancelled.add(bc_id)
+    return True
+
+
+def resume_unfinished(application, *, use_sqlite: bool) -> int:
+    """Restartdan sonra yarımçıq qalan elanları davam etdir"""
+    try:
+        if use_sqlite:
+            from db_sqlite import get_unfinished_broadcasts_sqlite
+            unfinished = get_unfinished_broadcasts_sqlite()
+        else:
+            from db_operations import get_unfinished_broadcasts
+            unfinished = get_unfinished_broadcasts()
+    except Exception as e:
+        logger.warning("Yarımçıq elanlar oxunmadı: %s", e)
+        return 0
+    for bc in unfinished:
+        start_broadcast(application, bc, use_sqlite=use_sqlite)
+    return len(unfinished)
+
+
+async def stop_all() -> None:
+    """Bot dayananda işləyən elanları dayandır (status running qalır)"""
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Admin əmrləri - botu işə salmadan (token yoxlaması, Telegram, scheduler yoxdur)
+
+Hər alt əmr yalnız lazım olan modulu idxal edir: DB modulları və config
+telegram paketini yükləmir, BOT_TOKEN yalnız bot əmri üçün tələb olunur.
+Backend bot-dakı kimi seçilir (FORCE_SQLITE / DB_MODE=sqlite, əks halda
+DATABASE_URL; SQLAlchemy yüklənmirsə SQLite).
+
+İstifadə:
+    python run.py                       # bot (əvvəlki kimi)
+    python run.py migrate               # cədvəllər, indekslər, miqrasiyalar
+    python run.py stats [--json]
+    python run.py search (--fin F | --phone P | --id N) [--json]
+    python run.py export [--out FAYL] [--limit N]
+    python run.py backup [--out FAYL]
+    python run.py seed --rows 100000 [...]          # bax src/seed.py
+    python run.py bench storage [...]               # bench/<ad>.py
+Ümumi seçim: --backend auto|sqlite|sqlalchemy (alt əmrdən əvvəl). DB-yə
+qoşulmaq alınmasa əmr bir sətirlik xəta ilə bitir (bot kimi səssizcə SQLite-a
+keçmir - statistika/export başqa bazadan götürülməsin).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHES = ("storage", "conversation_load", "replay", "bot_api_emulator", "draft_memory")
+
+
+def _use_sqlite() -> bool:
+    """bot.py-dakı seçimlə eyni: məcburi SQLite və ya SQLAlchemy olmadıqda fallback"""
+    if os.getenv("FORCE_SQLITE", "0").lower() in ("1", "true", "yes") or os.getenv("DB_MODE", "").lower() == "sqlite":
+        return True
+    try:
+        import db_operations  # noqa: F401
+        return False
+    except ImportError as e:
+        print(f"⚠️ PostgreSQL yüklənmədi ({e}), SQLite istifadə olunur", file=sys.stderr)
+        return True
+
+
+def _row(app: Any) -> Dict[str, Any]:
+    """SQLite dict-i və ya ORM obyektini JSON üçün dict-ə çevir"""
+    if isinstance(app, dict):
+        return app
+    out = {}
+    for column in app.__table__.columns:
+        value = getattr(app, column.name)
+        out[column.name] = getattr(value, "value", value)
+    return out
+
+
+def _print_json(data: Any) -> None:
+    print(json.dumps(data, ensure_ascii=False, indent=2, default=str))
+
+
+# ---------- Alt əmrlər ----------
+def cmd_bot(args) -> int:
+    from bot import main as bot_main
+    try:
+        from version import __version__
+    except Exception:
+        __version__ = "0.0.0"
+    print(f"DSMF Müraciət Botu işə salınır... v{__version__}")
+    bot_main()
+    return 0
+
+
+def cmd_migrate(args) -> int:
+    if _use_sqlite():
+        from db_sqlite import SQLITE_DB_PATH, init_sqlite_db
+        init_sqlite_db()
+        print(f"✅ SQLite sxemi hazırdır: {SQLITE_DB_PATH}")
+    else:
+        from db_operations import init_db
+        init_db()  # create_all + _run_migrations + backfill-lər
+        print("✅ PostgreSQL sxemi və miqrasiyalar hazırdır")
+    return 0
+
+
+def _statistics(use_sqlite: bool) -> Dict[str, Any]:
+    if use_sqlite:
+        from db_sqlite import get_statistics_sqlite
+        return get_statistics_sqlite()
+    from sqlalchemy import func
+    from database import Application
+    from db_operations import get_db
+    with get_db() as db:
+        by_status = {s.value: n for s, n in db.query(Application.status, func.count()).group_by(Application.status)}
+        by_type = {t.value: n for t, n in db.query(Application.form_type, func.count()).group_by(Application.form_type)}
+    return {"total": sum(by_status.values()), "by_status": by_status, "by_type": by_type}
+
+
+def cmd_stats(args) -> int:
+    stats = _statistics(_use_sqlite())
+    if args.json:
+        _print_json(stats)
+        return 0
+    print(f"📊 Cəmi müraciət: {stats['total']}")
+    print("Status üzrə:")
+    for name, count in sorted(stats["by_status"].items(), key=lambda x: -x[1]):
+        print(f"  {name:<12} {count}")
+    print("Növ üzrə:")
+    for name, count in sorted(stats["by_type"].items(), key=lambda x: -x[1]):
+        print(f"  {name:<12} {count}")
+    return 0
+
+
+def cmd_search(args) -> int:
+    use_sqlite = _use_sqlite()
+    if args.id is not None:
+        if use_sqlite:
+            from db_sqlite import get_application_by_id_sqlite
+            found = get_application_by_id_sqlite(args.id)
+        else:
+            from db_operations import get_application_by_id
+            found = get_application_by_id(args.id)
+        apps = [found] if found else []
+    elif use_sqlite:
+        from db_sqlite import search_applications_sqlite
+        apps = search_applications_sqlite(fin=args.fin, phone=args.phone)
+    else:
+        from db_operations import search_applications
+        apps = search_applications(fin=args.fin, phone=args.phone)
+    rows = [_row(app) for app in apps]
+    if args.json:
+        _print_json(rows)
+        return 0 if rows else 1
+    if not rows:
+        print("🔍 Heç nə tapılmadı")
+        return 1
+    for row in rows:
+        print(f"#{row['id']} | {row.get('created_at')} | {row.get('status')} | {row.get('form_type')} | "
+              f"{row.get('fullname')} | {row.get('phone')} | {row.get('fin')}")
+    print(f"🔍 {len(rows)} nəticə")
+    return 0
+
+
+def cmd_export(args) -> int:
+    if _use_sqlite():
+        from db_sqlite import export_to_json
+        out = export_to_json(args.out or "data/applications_export.json")
+    else:
+        from db_operations import export_to_csv
+        out = args.out or "data/applications_export.csv"
+        directory = os.path.dirname(out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(export_to_csv(limit=args.limit))
+    print(f"✅ Export hazırdır: {out}")
+    return 0
+
+
+def cmd_backup(args) -> int:
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if _use_sqlite():
+        import sqlite3
+        from db_sqlite import SQLITE_DB_PATH
+        if not os.path.exists(SQLITE_DB_PATH):
+            print(f"❌ SQLite faylı yoxdur: {SQLITE_DB_PATH}", file=sys.stderr)
+            return 1
+        out = args.out or os.path.join("data", "backups", f"applications-{stamp}.db")
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        # Onlayn backup API: bot işləyərkən də ardıcıl snapshot
+        src = sqlite3.connect(SQLITE_DB_PATH)
+        dst = sqlite3.connect(out)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    else:
+        import shutil
+        import subprocess
+        from db_operations import DATABASE_URL
+        if not shutil.which("pg_dump"):
+            print("❌ pg_dump tapılmadı (PostgreSQL client alətlərini quraşdırın)", file=sys.stderr)
+            return 1
+        out = args.out or os.path.join("data", "backups", f"applications-{stamp}.dump")
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        result = subprocess.run(["pg_dump", "--format=custom", "--no-owner", "--file", out, DATABASE_URL])
+        if result.returncode != 0:
+            print(f"❌ pg_dump xətası (kod {result.returncode})", file=sys.stderr)
+            return result.returncode
+    print(f"✅ Backup: {out} ({os.path.getsize(out) / 1024 / 1024:.1f} MB)")
+    return 0
+
+
+def cmd_seed(args) -> int:
+    import seed
+    return seed.main(args.rest)
+
+
+def cmd_bench(args) -> int:
+    import runpy
+    path = os.path.join(ROOT, "bench", f"{args.name}.py")
+    saved = sys.argv
+    sys.argv = [path] + args.rest
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        sys.argv = saved
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="run.py", description="DSMF bot və admin əmrləri")
+    parser.add_argument("--backend", choices=("auto", "sqlite", "sqlalchemy"), default="auto")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("bot", help="botu işə sal (default)")
+    p.set_defaults(func=cmd_bot)
+
+    p = sub.add_parser("migrate", help="sxem və miqrasiyalar")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("stats", help="status və növ üzrə saylar")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("search", help="FIN, telefon və ya ID ilə axtarış")
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument("--fin")
+    group.add_argument("--phone")
+    group.add_argument("--id", type=int)
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("export", help="SQLite: JSON, PostgreSQL: CSV")
+    p.add_argument("--out", help="fayl yolu (default: data/applications_export.json|csv)")
+    p.add_argument("--limit", type=int, default=1000, help="CSV üçün sətir limiti (bot /export ilə eyni)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("backup", help="SQLite backup API və ya pg_dump --format=custom")
+    p.add_argument("--out", help="fayl yolu (default: data/backups/applications-<vaxt>.db|dump)")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("seed", help="sintetik məlumat (arqumentlər src/seed.py-a ötürülür)", add_help=False)
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("bench", help="bench/<ad>.py skriptini işə sal", add_help=False)
+    p.add_argument("name", choices=BENCHES)
+    p.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    # seed/bench arqumentləri olduğu kimi skriptə ötürülür
+    args, rest = parser.parse_known_args(argv)
+    if args.command in ("seed", "bench"):
+        args.rest = rest
+    elif rest:
+        parser.error(f"naməlum arqumentlər: {' '.join(rest)}")
+    if args.backend == "sqlite":
+        os.environ["FORCE_SQLITE"] = "1"
+    elif args.backend == "sqlalchemy":
+        os.environ["FORCE_SQLITE"] = "0"
+        os.environ.pop("DB_MODE", None)
+    if args.command is None or args.command == "bot":
+        return cmd_bot(args)  # bot DB xətasında özü SQLite-a keçir
+    # Bot log konveyeri (thread, fayl) qısa əmrlər üçün lazım deyil
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper(), format="%(levelname)s %(message)s")
+    # SQLite əmrləri sqlalchemy-ni yükləmir; boş tuple heç nəyi tutmur
+    db_errors: tuple = ()
+    try:
+        if args.command not in ("seed", "bench") and not _use_sqlite():
+            from sqlalchemy.exc import OperationalError
+            db_errors = (OperationalError,)
+            # Əvvəlcədən yoxla: get_db xətanı çoxsətirli loglayır
+            from db_operations import engine
+            with engine.connect():
+                pass
+        return args.func(args)
+    except db_errors as e:
+        reason = str(getattr(e, "orig", None) or e).strip().splitlines()[0]
+        print(f"❌ Verilənlər bazasına qoşulmaq olmadı ({reason}). "
+              f"DATABASE_URL-i yoxlayın və ya SQLite üçün: python run.py --backend sqlite {args.command} ...",
+              file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
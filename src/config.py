@@ -8,30 +8,38 @@ import pytz
 from dotenv import load_dotenv
 import warnings
 from typing import Optional
-try:
-    # PTB 21.x xüsusi xəbərdarlıq tipi
-    from telegram.warnings import PTBUserWarning  # type: ignore
-except Exception:
-    PTBUserWarning = Warning  # fallback
 
 load_dotenv()
 
 logger = logging.getLogger("dsmf-config")
 
 def setup_logging(level: Optional[str] = None):
-    """Mərkəzi log konfiqurasiyası.
+    """Mərkəzi log konfiqurasiyası (bloklamayan növbə konveyeri, bax log_pipeline).
 
     Ətraf mühit dəyişənləri:
       - LOG_LEVEL: DEBUG|INFO|WARNING|ERROR (default: INFO)
+      - LOG_FORMAT: text|json (konsol formatı) (default: text)
+      - LOG_FILE: fırlanan JSON lines faylı, məs. data/logs/bot.jsonl (default: yoxdur)
+      - LOG_FILE_MAX_MB / LOG_FILE_BACKUPS: fırlatma ölçüsü və nüsxə sayı (default: 10 / 5)
+      - LOG_SAMPLE: səs-küylü loggerlər üçün pay, məs. "apscheduler=0.05,tornado.access=0.1"
+      - LOG_QUEUE_SIZE: növbə tutumu; dolduqda qeydlər atılır (default: 10000)
       - LOG_HTTP: 0/1 (httpx və Telegram HTTP sorğularını göstər) (default: 0)
       - SUPPRESS_PTB_WARN: 0/1 (PTBUserWarning xəbərdarlıqlarını gizlət) (default: 1)
     """
+    from log_pipeline import parse_sample_rules, setup
+    from tracing import TraceLogFilter
+
     lvl = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
-    logging.basicConfig(
-        level=getattr(logging, lvl, logging.INFO),
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        datefmt="%H:%M:%S",
-        force=True,
+    setup(
+        getattr(logging, lvl, logging.INFO),
+        json_format=os.getenv("LOG_FORMAT", "text").lower() == "json",
+        file_path=os.getenv("LOG_FILE") or None,
+        file_max_bytes=int(float(os.getenv("LOG_FILE_MAX_MB", "10")) * 1024 * 1024),
+        file_backups=int(os.getenv("LOG_FILE_BACKUPS", "5")),
+        sample_rules=parse_sample_rules(os.getenv("LOG_SAMPLE", "apscheduler.scheduler=0.05")),
+        queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        # Aktiv yenilik trace-inin ID-si hər sətrə əlavə olunur (/trace <id> ilə axtarış)
+        filters=[TraceLogFilter()],
     )
 
     # Səs-küylü logları susdur
@@ -42,6 +50,8 @@ def setup_logging(level: Optional[str] = None):
     # PTB per_message xəbərdarlıqlarını gizlət (istəyə bağlı)
     if os.getenv("SUPPRESS_PTB_WARN", "1").lower() in ("1", "true", "yes"):
         try:
+            # PTB 21.x xüsusi xəbərdarlıq tipi (admin CLI telegram-ı yükləmir)
+            from telegram.warnings import PTBUserWarning  # type: ignore
             warnings.filterwarnings("ignore", category=PTBUserWarning)  # type: ignore[arg-type]
         except Exception:
             pass
@@ -59,17 +69,35 @@ LANG = os.getenv("LANG", "az")
 admin_ids_str = os.getenv("ADMIN_USER_IDS", "6520873307")
 ADMIN_USER_IDS = {int(uid.strip()) for uid in admin_ids_str.split(",") if uid.strip()}
 
+# İşləmə rejimi: polling (default) və ya webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")   # ictimai ünvan, məs. https://bot.up.railway.app
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8080")))  # Railway PORT verir
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")         # boşdursa tokendən törədilir
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+HEALTH_PATH = os.getenv("HEALTH_PATH", "/health")
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")           # boş deyilsə /metrics Bearer token tələb edir
+# Polling rejimində də /health və /metrics üçün HTTP server (WEBHOOK_PORT-da)
+HTTP_SERVER_ENABLED = os.getenv("HTTP_SERVER", "1").lower() in ("1", "true", "yes")
+HEALTH_POLL_STALE_S = float(os.getenv("HEALTH_POLL_STALE_S", "120"))  # son uğurlu getUpdates-dən bu qədər keçibsə 503
+# Lokal Bot API serveri / test emulyatoru üçün (məs. http://127.0.0.1:8081/bot)
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL", "")
+
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost:5432/dsmf_bot")
 
-# Validasiya
-if not BOT_TOKEN or BOT_TOKEN == "your_bot_token_here":
-    raise ValueError(
-        "BOT_TOKEN təyin edilməyib. .env faylında BotFather-dən aldığınız tokeni yazın."
-    )
 
-if EXECUTOR_CHAT_ID == 0 or EXECUTOR_CHAT_ID == -1001234567890:
-    logger.warning("EXECUTOR_CHAT_ID default dəyərdədir. Real chat ID yazın.")
+def validate_bot_settings() -> None:
+    """Botu işə salmazdan əvvəl token/chat yoxlaması (admin CLI bunu çağırmır)"""
+    if not BOT_TOKEN or BOT_TOKEN == "your_bot_token_here":
+        raise ValueError(
+            "BOT_TOKEN təyin edilməyib. .env faylında BotFather-dən aldığınız tokeni yazın."
+        )
+    if EXECUTOR_CHAT_ID == 0 or EXECUTOR_CHAT_ID == -1001234567890:
+        logger.warning("EXECUTOR_CHAT_ID default dəyərdədir. Real chat ID yazın.")
 
 # Anket məhdudiyyətləri
 MIN_NAME_LENGTH = 2
@@ -85,6 +113,74 @@ PIN_MAX_LENGTH = 6  # DYİ PIN uzunluğu (maksimum)
 MAX_DAILY_SUBMISSIONS = None  # Limitsiz
 MAX_MONTHLY_SUBMISSIONS = None  # Limitsiz
 
+# Telegram göndərmə limitləri (send scheduler)
+# Telegram: ~30 mesaj/san qlobal, şəxsi chat-ə ~1 mesaj/san, qrupa 20 mesaj/dəq
+SEND_RATE_LIMIT_ENABLED = os.getenv("SEND_RATE_LIMIT", "1").lower() in ("1", "true", "yes")
+SEND_GLOBAL_PER_SEC = float(os.getenv("SEND_GLOBAL_PER_SEC", "25"))
+SEND_PRIVATE_PER_SEC = float(os.getenv("SEND_PRIVATE_PER_SEC", "1"))
+SEND_GROUP_PER_MIN = float(os.getenv("SEND_GROUP_PER_MIN", "20"))
+SEND_BURST = int(os.getenv("SEND_BURST", "3"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+
+# Yeniliklərin paralel emalı (eyni istifadəçinin yenilikləri ardıcıl qalır)
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "16"))
+UPDATE_MAX_PENDING = int(os.getenv("UPDATE_MAX_PENDING", "1024"))
+
+# Söhbət vəziyyətinin DB-də saxlanılması (restartdan sonra anket davam edir)
+PERSISTENCE_ENABLED = os.getenv("PERSISTENCE", "1").lower() in ("1", "true", "yes")
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "5"))  # saniyə, yazılar bu intervalda birləşdirilir
+
+# Yarımçıq söhbətlərin bitirilməsi və passiv istifadəçi məlumatlarının silinməsi
+CONVERSATION_TIMEOUT_MIN = float(os.getenv("CONVERSATION_TIMEOUT_MIN", "30"))        # vətəndaş anketi
+EXEC_CONVERSATION_TIMEOUT_MIN = float(os.getenv("EXEC_CONVERSATION_TIMEOUT_MIN", "120"))  # icraçı cavabı
+USER_DATA_TTL_HOURS = float(os.getenv("USER_DATA_TTL_HOURS", "24"))
+EVICTION_INTERVAL_MIN = float(os.getenv("EVICTION_INTERVAL_MIN", "10"))
+DRAFT_EXPIRED_NOTICE = os.getenv("DRAFT_EXPIRED_NOTICE", "1").lower() in ("1", "true", "yes")
+
+# Təkrar müraciət: son müraciətdəki şəxsi məlumatları təklif et
+PROFILE_REUSE_ENABLED = os.getenv("PROFILE_REUSE", "1").lower() in ("1", "true", "yes")
+PROFILE_CACHE_TTL_MIN = float(os.getenv("PROFILE_CACHE_TTL_MIN", "30"))
+
+# Təkrar müraciətlərin aşkarlanması
+DEDUPE_WINDOW_HOURS = float(os.getenv("DEDUPE_WINDOW_HOURS", "72"))    # eyni mətn + FIN bu müddətdə yazılmır
+DEDUPE_SIMILAR_DAYS = float(os.getenv("DEDUPE_SIMILAR_DAYS", "30"))    # oxşar müraciət axtarış pəncərəsi
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", "10"))    # 64 bitdən fərqli bit sayı
+
+# Vəsiqə şəklinin perseptual heşi (başqa hesablardan təkrar istifadə)
+PHOTO_HASH_ENABLED = os.getenv("PHOTO_HASH", "1").lower() in ("1", "true", "yes")
+PHOTO_HASH_WORKERS = int(os.getenv("PHOTO_HASH_WORKERS", "2"))          # 0 = thread pulu
+PHOTO_HASH_MAX_DISTANCE = int(os.getenv("PHOTO_HASH_MAX_DISTANCE", "6"))  # dHash: 64 bitdən fərqli bit sayı
+
+# Vəsiqə şəkillərinin lokal anbarı (Railway-də davamlı volume tələb edir)
+MEDIA_STORE_ENABLED = os.getenv("MEDIA_STORE", "1").lower() in ("1", "true", "yes")
+MEDIA_DIR = os.getenv("MEDIA_DIR", "data/media")
+MEDIA_THUMB_PX = int(os.getenv("MEDIA_THUMB_PX", "320"))
+
+# Performans ölçmələri (/perf)
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "500"))  # loop gecikməsi nümunə intervalı
+SQL_TRACE_ENABLED = os.getenv("SQL_TRACE", "1").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))               # bundan uzun ifadələr planı ilə loglanır
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1").lower() in ("1", "true", "yes")
+SLOW_QUERY_ANALYZE = os.getenv("SLOW_QUERY_ANALYZE", "0").lower() in ("1", "true", "yes")  # yalnız SELECT
+SLOW_QUERY_EXPLAIN_INTERVAL_S = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_S", "600"))  # eyni ifadə üçün
+UPDATE_QUERY_WARN = int(os.getenv("UPDATE_QUERY_WARN", "30"))          # bir yenilikdə bu qədər ifadə - N+1 xəbərdarlığı
+TRACE_ENABLED = os.getenv("TRACE", "1").lower() in ("1", "true", "yes")
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "500"))                  # yaddaşda saxlanılan son trace-lər (/trace)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_FILE = os.getenv("TRACE_FILE", "")                              # məs. data/traces.jsonl (boş - yazılmır)
+UPDATE_RECORD_FILE = os.getenv("UPDATE_RECORD_FILE", "")              # məs. data/updates.jsonl.gz - bench/replay.py üçün
+UPDATE_RECORD_KEY = os.getenv("UPDATE_RECORD_KEY", "")                # qarışdırma açarı (boşdursa tokendən törədilir)
+UPDATE_RECORD_MAX_MB = float(os.getenv("UPDATE_RECORD_MAX_MB", "500"))  # bu həcmdən sonra yazılmır (0 = limitsiz)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))   # seçmə intervalı (10 ms = 100 Hz)
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_ON_START = int(os.getenv("PROFILE_ON_START", "0"))           # >0: başlanğıcda bu qədər saniyə profil yığ
+
+# Kütləvi elan (/broadcast) parametrləri
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "8"))
+BROADCAST_PER_SEC = float(os.getenv("BROADCAST_PER_SEC", "15"))  # interaktiv trafikə yer saxlanılır
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "200"))  # checkpoint intervalı
+
 # Blacklist qaydası - çox sayda imtina olunan müraciətlər
 BLACKLIST_REJECTION_THRESHOLD = 5  # Son pəncərədə bu qədər imtina olarsa
 BLACKLIST_WINDOW_DAYS = 30         # bu qədər gün ərzində
@@ -98,6 +194,13 @@ MESSAGES = {
     "fullname_error": "Xahiş edirik soyad və adı düzgün daxil edin (ata adı əlavə oluna bilər).",
     "phone_prompt": "📱 Mobil nömrənizi daxil edin (məs.: +994501234567)",
     "phone_error": "Nömrə düzgün formatda deyil (məs.: +994501234567)",
+    "profile_prompt": (
+        "Əvvəlki müraciətinizdəki məlumatlar:\n"
+        "👤 {fullname}\n"
+        "📱 {phone}\n"
+        "🆔 FIN: {fin}\n\n"
+        "Bu məlumatlarla davam edək?"
+    ),
     "id_type_prompt": "🆔 Vəsiqə növünü seçin:",
     "fin_prompt": "🆔 Şəxsiyyət vəsiqənizin FIN kodunu daxil edin (7 simvol)",
     "fin_error": "FIN 7 simvoldan ibarət olmalıdır (latın hərf və rəqəm)",
@@ -113,8 +216,14 @@ MESSAGES = {
         "Müraciətinizin cavabı verildikdə siz bununla bağlı bildiriş alacaqsınız."
         " Təkrar müraciət göndərmək üçün /start yazın."
     ),
+    "duplicate_submission": (
+        "ℹ️ Bu müraciət artıq qeydə alınıb (Sıra №: {id}). "
+        "Cavab verildikdə bununla bağlı bildiriş alacaqsınız."
+    ),
+    "photo_reused": "⚠️ Vəsiqə şəkli başqa hesablardan göndərilmiş müraciətlərdə də var: {ids}",
     "success": "",
     "cancelled": "❌ Müraciət ləğv edildi",
+    "draft_expired": "⌛ Müraciət qaralamanızın müddəti bitdi və silindi. Yenidən başlamaq üçün /start yazın.",
     "help": "ℹ️ /start ilə yeni müraciət göndərə bilərsiniz. /chatid ilə bu qrup/kanalın ID-sini görə bilərsiniz.",
     "unknown": "⚠️ Anlaşılmadı. Zəhmət olmasa /start yazın.",
     # Limitsiz rejimdə məhdudiyyət mesajları deaktivdir
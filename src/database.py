@@ -10,6 +10,9 @@ from sqlalchemy import (
     Text,
     DateTime,
     BigInteger,
+    Boolean,
+    LargeBinary,
+    Index,
     Enum as SQLEnum
 )
 from sqlalchemy.ext.declarative import declarative_base
@@ -28,6 +31,64 @@ class BlacklistedUser(Base):
     def __repr__(self):
         return f"<BlacklistedUser(user_telegram_id={self.user_telegram_id})>"
 
+class RecipientDelivery(Base):
+    """Vətəndaşa mesaj çatdırılmasının son vəziyyəti (botu bloklayanlar və s.)"""
+    __tablename__ = "recipient_delivery"
+    user_telegram_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    last_success_at = Column(DateTime, nullable=True)
+    last_failure_at = Column(DateTime, nullable=True)
+    last_failure_reason = Column(String(255), nullable=True)
+    failure_count = Column(Integer, nullable=False, default=0)
+    blocked = Column(Boolean, nullable=False, default=False)
+    next_retry_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<RecipientDelivery(user_telegram_id={self.user_telegram_id}, blocked={self.blocked})>"
+
+    def to_dict(self):
+        return {
+            "user_telegram_id": self.user_telegram_id,
+            "last_success_at": self.last_success_at,
+            "last_failure_at": self.last_failure_at,
+            "last_failure_reason": self.last_failure_reason,
+            "failure_count": self.failure_count or 0,
+            "blocked": bool(self.blocked),
+            "next_retry_at": self.next_retry_at,
+        }
+
+class Broadcast(Base):
+    """Kütləvi elan və onun göndəriş irəliləyişi (checkpoint)"""
+    __tablename__ = "broadcasts"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    text = Column(Text, nullable=False)
+    form_type = Column(String(20), nullable=True)     # filtr: complaint / suggestion / application
+    since = Column(DateTime, nullable=True)           # filtr: bu tarixdən sonra müraciət edənlər
+    status = Column(String(20), nullable=False, default="running", index=True)  # running / done / cancelled / failed
+    last_user_id = Column(BigInteger, nullable=False, default=0)  # son tamamlanmış user_telegram_id
+    total = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    created_by = Column(BigInteger, nullable=True)
+    report_chat_id = Column(BigInteger, nullable=True)
+    report_message_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self):
+        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+class BotState(Base):
+    """Bot söhbət vəziyyəti (user_data, chat_data, ConversationHandler) - restartlar arası"""
+    __tablename__ = "bot_state"
+    kind = Column(String(64), primary_key=True)    # user / chat / conv:<ad>
+    key = Column(String(255), primary_key=True)    # user_id, chat_id və ya söhbət açarı (JSON)
+    value = Column(LargeBinary, nullable=False)    # pickle
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<BotState(kind={self.kind}, key={self.key})>"
+
 class ApplicationStatus(str, enum.Enum):
     PENDING = "waiting"        # 🟡 Gözləyir
     PROCESSING = "processing"  # (istifadə edilmir)
@@ -51,11 +112,19 @@ class Application(Base):
     
     # Anket məlumatları
     fullname = Column(String(255), nullable=False)
-    phone = Column(String(20), nullable=False)
+    phone = Column(String(20), nullable=False, index=True)  # E.164: +994XXXXXXXXX
     fin = Column(String(7), nullable=False, index=True)
     # Müraciət məlumatları
     form_type = Column(SQLEnum(FormTypeDB), nullable=False)
     body = Column(Text, nullable=False)
+    # Təkrar aşkarlanması: normallaşdırılmış mətnin heşi, SimHash, təsdiq idempotentlik açarı
+    body_hash = Column(String(32), nullable=True)
+    simhash = Column(BigInteger, nullable=True)
+    submit_key = Column(String(64), nullable=True, unique=True)
+    # Vəsiqə şəklinin perseptual heşi (dHash) - eyni sənədin başqa hesablardan təkrarı
+    photo_hash = Column(BigInteger, nullable=True, index=True)
+    # Lokal media anbarında şəklin açarı (məzmun heşi)
+    photo_key = Column(String(32), nullable=True)
     
     # Status və qeydlər
     status = Column(SQLEnum(ApplicationStatus), default=ApplicationStatus.PENDING, nullable=False, index=True)
@@ -66,6 +135,10 @@ class Application(Base):
     created_at = Column(DateTime, nullable=False, index=True)
     updated_at = Column(DateTime, nullable=False, onupdate=datetime.now)
     
+    __table_args__ = (
+        Index("ix_applications_fin_body_hash", "fin", "body_hash"),
+    )
+
     def __repr__(self):
         return f"<Application(id={self.id}, fin={self.fin}, status={self.status})>"
     
@@ -8,9 +8,15 @@ import os
 from datetime import datetime
 from contextlib import contextmanager
 from config import logger, BAKU_TZ
+from perf import instrument_module
+from log_pipeline import mask
+from sql_trace import sqlite_factory
+from metrics import REGISTRY
 
 SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "data/applications.db")
 
+_status_transitions = REGISTRY.counter("application_status_transitions_total", "Müraciət statusu dəyişiklikləri")
+
 def init_sqlite_db():
     """SQLite database və cədvəllər yarat"""
     os.makedirs(os.path.dirname(SQLITE_DB_PATH), exist_ok=True)
@@ -32,6 +38,11 @@ def init_sqlite_db():
                 status TEXT DEFAULT 'pending',
                 notes TEXT,
                 reply_text TEXT,
+                body_hash TEXT,
+                simhash INTEGER,
+                submit_key TEXT,
+                photo_hash INTEGER,
+                photo_key TEXT,
                 created_at TEXT NOT NULL,
                 updated_at TEXT NOT NULL
             )
@@ -47,12 +58,61 @@ def init_sqlite_db():
             )
             """
         )
+        # Vətəndaşa çatdırılma vəziyyəti
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS recipient_delivery (
+                user_telegram_id INTEGER PRIMARY KEY,
+                last_success_at TEXT,
+                last_failure_at TEXT,
+                last_failure_reason TEXT,
+                failure_count INTEGER NOT NULL DEFAULT 0,
+                blocked INTEGER NOT NULL DEFAULT 0,
+                next_retry_at TEXT
+            )
+            """
+        )
+        # Kütləvi elanlar (checkpoint ilə)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL,
+                form_type TEXT,
+                since TEXT,
+                status TEXT NOT NULL DEFAULT 'running',
+                last_user_id INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                sent INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                skipped INTEGER NOT NULL DEFAULT 0,
+                created_by INTEGER,
+                report_chat_id INTEGER,
+                report_message_id INTEGER,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        # Bot söhbət vəziyyəti (persistence)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bot_state (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+            """
+        )
         
         # Index-lər
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_fin ON applications(fin)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_status ON applications(status)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_user ON applications(user_telegram_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_created ON applications(created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_phone ON applications(phone)")
         
         # Migration: Add reply_text column if it doesn't exist (for existing SQLite dbs)
         cursor.execute("PRAGMA table_info(applications)")
@@ -64,25 +124,73 @@ def init_sqlite_db():
                 logger.info("✅ reply_text column added to SQLite")
             except Exception as e:
                 logger.warning(f"⚠️ Could not add reply_text column: {e}")
+        # Migration: təkrar aşkarlanması və vəsiqə şəkli sütunları
+        for column, ddl in (
+            ("body_hash", "TEXT"), ("simhash", "INTEGER"), ("submit_key", "TEXT"),
+            ("photo_hash", "INTEGER"), ("photo_key", "TEXT"),
+        ):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE applications ADD COLUMN {column} {ddl}")
+                logger.info(f"✅ {column} column added to SQLite")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_fin_body_hash ON applications(fin, body_hash)")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_submit_key ON applications(submit_key)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_photo_hash ON applications(photo_hash)")
+        _backfill_dedupe_keys_sqlite(conn)
+        
+        # Migration: köhnə telefon nömrələrini E.164 formasına sal
+        _backfill_phone_e164_sqlite(conn)
         
         conn.commit()
         logger.info(f"✅ SQLite database hazırdır: {SQLITE_DB_PATH}")
 
+def _backfill_dedupe_keys_sqlite(conn) -> None:
+    """Köhnə müraciətlər üçün body_hash/simhash hesabla"""
+    from dedupe import fingerprint
+    rows = conn.execute("SELECT id, body FROM applications WHERE body_hash IS NULL").fetchall()
+    if not rows:
+        return
+    params = []
+    for row in rows:
+        digest, sh = fingerprint(row["body"] or "")
+        params.append((digest, sh, row["id"]))
+    conn.executemany("UPDATE applications SET body_hash=?, simhash=? WHERE id=?", params)
+    logger.info(f"✅ {len(params)} müraciət üçün təkrar açarları hesablandı")
+
+def _backfill_phone_e164_sqlite(conn) -> None:
+    """Kanonik olmayan telefon nömrələrini normallaşdır (yalnız dəyişənlər yazılır)"""
+    from phone import normalize_phone
+    rows = conn.execute(
+        "SELECT id, phone FROM applications WHERE NOT (phone LIKE '+994%' AND length(phone) = 13)"
+    ).fetchall()
+    updates = []
+    for row in rows:
+        normalized = normalize_phone(row["phone"])
+        if normalized and normalized != row["phone"]:
+            updates.append((normalized, row["id"]))
+    if updates:
+        conn.executemany("UPDATE applications SET phone=? WHERE id=?", updates)
+        logger.info(f"✅ {len(updates)} telefon nömrəsi E.164 formasına salındı")
+
 @contextmanager
 def get_sqlite_connection():
     """SQLite connection context manager"""
-    conn = sqlite3.connect(SQLITE_DB_PATH)
+    conn = sqlite3.connect(SQLITE_DB_PATH, factory=sqlite_factory())
     conn.row_factory = sqlite3.Row  # Dict kimi əlçatan olsun
     try:
         yield conn
         conn.commit()
     except Exception as e:
         conn.rollback()
-        logger.error(f"SQLite error: {e}")
+        logger.error("SQLite error: %s", e)
         raise
     finally:
         conn.close()
 
+def ping_sqlite() -> None:
+    """Sağlamlıq yoxlaması: SQLite faylı oxunur (xəta olarsa istisna)"""
+    with get_sqlite_connection() as conn:
+        conn.execute("SELECT 1")
+
 def save_application_sqlite(
     user_telegram_id: int,
     user_username: str,
@@ -94,6 +202,9 @@ def save_application_sqlite(
     subject: str,
     body: str,
     created_at: datetime,
+    body_hash: Optional[str] = None,
+    simhash: Optional[int] = None,
+    submit_key: Optional[str] = None,
 ) -> dict:
     """Müraciəti SQLite-a yaz"""
     with get_sqlite_connection() as conn:
@@ -105,16 +216,18 @@ def save_application_sqlite(
             INSERT INTO applications (
                 user_telegram_id, user_username, fullname, phone, fin,
                 id_photo_file_id, form_type, subject, body, status,
+                body_hash, simhash, submit_key,
                 created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             user_telegram_id, user_username, fullname, phone, fin,
             id_photo_file_id, form_type, subject, body, 'pending',
+            body_hash, simhash, submit_key,
             created_str, created_str
         ))
         
         app_id = cursor.lastrowid
-        logger.info(f"✅ SQLite-a yazıldı: ID={app_id}, FIN={fin}")
+        logger.info("✅ SQLite-a yazıldı: ID=%s, FIN=%s", app_id, mask(fin))
         
         return {
             "id": app_id,
@@ -146,6 +259,53 @@ def get_application_by_id_sqlite(app_id: int) -> dict | None:
         row = cursor.fetchone()
         return dict(row) if row else None
 
+def get_latest_application_by_user_sqlite(user_telegram_id: int) -> dict | None:
+    """İstifadəçinin ən son müraciəti"""
+    with get_sqlite_connection() as conn:
+        row = conn.execute(
+            "SELECT fullname, phone, fin, id_photo_file_id FROM applications "
+            "WHERE user_telegram_id=? ORDER BY created_at DESC, id DESC LIMIT 1",
+            (user_telegram_id,),
+        ).fetchone()
+        return dict(row) if row else None
+
+def get_application_id_by_submit_key_sqlite(submit_key: str) -> Optional[int]:
+    with get_sqlite_connection() as conn:
+        row = conn.execute("SELECT id FROM applications WHERE submit_key=?", (submit_key,)).fetchone()
+        return row["id"] if row else None
+
+def find_pending_duplicate_sqlite(fin: str, body_hash: str, since: datetime) -> Optional[int]:
+    """Eyni FIN və mətn heşi ilə gözləyən müraciət"""
+    with get_sqlite_connection() as conn:
+        row = conn.execute(
+            "SELECT id FROM applications WHERE fin=? AND body_hash=? AND status='pending' AND created_at >= ? "
+            "ORDER BY id DESC LIMIT 1",
+            (fin, body_hash, since.strftime('%Y-%m-%d %H:%M:%S')),
+        ).fetchone()
+        return row["id"] if row else None
+
+def get_recent_simhashes_sqlite(fin: str, user_telegram_id: int, since: datetime, limit: int = 50) -> list:
+    """Eyni FIN və ya istifadəçinin son müraciətlərinin (id, simhash) cütləri"""
+    with get_sqlite_connection() as conn:
+        rows = conn.execute(
+            "SELECT id, simhash FROM applications WHERE (fin=? OR user_telegram_id=?) "
+            "AND simhash IS NOT NULL AND created_at >= ? ORDER BY id DESC LIMIT ?",
+            (fin, user_telegram_id, since.strftime('%Y-%m-%d %H:%M:%S'), limit),
+        ).fetchall()
+        return [(r["id"], r["simhash"]) for r in rows]
+
+def set_photo_meta_sqlite(app_id: int, photo_hash: int, photo_key: Optional[str] = None) -> None:
+    with get_sqlite_connection() as conn:
+        conn.execute("UPDATE applications SET photo_hash=?, photo_key=? WHERE id=?", (photo_hash, photo_key, app_id))
+
+def get_photo_hashes_sqlite() -> list:
+    """Şəkil heşi indeksi üçün (id, user_telegram_id, photo_hash) üçlükləri"""
+    with get_sqlite_connection() as conn:
+        rows = conn.execute(
+            "SELECT id, user_telegram_id, photo_hash FROM applications WHERE photo_hash IS NOT NULL"
+        ).fetchall()
+        return [(r["id"], r["user_telegram_id"], r["photo_hash"]) for r in rows]
+
 def export_to_json(output_file: str = "data/applications_export.json"):
     """SQLite database-i JSON-a export et"""
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
@@ -181,7 +341,9 @@ def update_application_status_sqlite(app_id: int, status: str, notes: Optional[s
                 (status, updated_at, app_id)
             )
         
-        logger.info(f"✅ SQLite status yeniləndi: ID={app_id}, status={status}")
+        if cursor.rowcount:
+            _status_transitions.inc(status=status)
+        logger.info("✅ SQLite status yeniləndi: ID=%s, status=%s", app_id, status)
 
 def count_user_rejections_sqlite(user_telegram_id: int, days: int = 30) -> int:
     from datetime import datetime, timedelta
@@ -214,7 +376,7 @@ def add_user_to_blacklist_sqlite(user_telegram_id: int, reason: Optional[str] =
                 (user_telegram_id, reason or "Çoxlu imtina", created)
             )
         except Exception as e:
-            logger.error(f"Blacklist insert xətası: {e}")
+            logger.error("Blacklist insert xətası: %s", e)
 
 def remove_user_from_blacklist_sqlite(user_telegram_id: int) -> None:
     with get_sqlite_connection() as conn:
@@ -229,6 +391,156 @@ def list_blacklisted_users_sqlite(limit: int = 100) -> list:
         rows = cursor.fetchall()
         return [dict(r) for r in rows]
 
+def _parse_sqlite_dt(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+
+def get_delivery_state_sqlite(user_telegram_id: int) -> Optional[dict]:
+    """Vətəndaşa çatdırılma vəziyyəti (yoxdursa None)"""
+    with get_sqlite_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM recipient_delivery WHERE user_telegram_id=?", (user_telegram_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        state = dict(row)
+        state["blocked"] = bool(state["blocked"])
+        for key in ("last_success_at", "last_failure_at", "next_retry_at"):
+            state[key] = _parse_sqlite_dt(state[key])
+        return state
+
+def record_delivery_success_sqlite(user_telegram_id: int) -> None:
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with get_sqlite_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO recipient_delivery (user_telegram_id, last_success_at, failure_count, blocked, next_retry_at)
+            VALUES (?, ?, 0, 0, NULL)
+            ON CONFLICT(user_telegram_id) DO UPDATE SET
+                last_success_at=excluded.last_success_at, failure_count=0, blocked=0, next_retry_at=NULL
+            """,
+            (user_telegram_id, now),
+        )
+
+def record_delivery_failure_sqlite(user_telegram_id: int, reason: str, blocked: bool, next_retry_at) -> None:
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    retry_str = next_retry_at.strftime('%Y-%m-%d %H:%M:%S') if next_retry_at else None
+    with get_sqlite_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO recipient_delivery
+                (user_telegram_id, last_failure_at, last_failure_reason, failure_count, blocked, next_retry_at)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT(user_telegram_id) DO UPDATE SET
+                last_failure_at=excluded.last_failure_at,
+                last_failure_reason=excluded.last_failure_reason,
+                failure_count=recipient_delivery.failure_count + 1,
+                blocked=excluded.blocked,
+                next_retry_at=excluded.next_retry_at
+            """,
+            (user_telegram_id, now, (reason or "")[:255], int(blocked), retry_str),
+        )
+
+# SQLite-da form_type FormType dəyəri ilə saxlanılır (Şikayət / Təklif / Ərizə)
+_FORM_TYPE_FILTERS_SQLITE = {
+    "complaint": "Şikayət",
+    "suggestion": "Təklif",
+    "application": "Ərizə",
+}
+
+def _applicant_where(since=None, form_type: Optional[str] = None) -> tuple[str, list]:
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since.strftime('%Y-%m-%d %H:%M:%S'))
+    if form_type:
+        clauses.append("form_type = ?")
+        params.append(_FORM_TYPE_FILTERS_SQLITE[form_type])
+    return (" AND ".join(clauses) if clauses else "1=1"), params
+
+def count_applicants_sqlite(since=None, form_type: Optional[str] = None) -> int:
+    where, params = _applicant_where(since, form_type)
+    with get_sqlite_connection() as conn:
+        row = conn.execute(f"SELECT COUNT(DISTINCT user_telegram_id) AS c FROM applications WHERE {where}", params).fetchone()
+        return row["c"] if row else 0
+
+def get_applicant_ids_page_sqlite(after_user_id: int = 0, limit: int = 500, since=None, form_type: Optional[str] = None) -> list:
+    """Unikal user_telegram_id-lər, keyset səhifələmə ilə"""
+    where, params = _applicant_where(since, form_type)
+    with get_sqlite_connection() as conn:
+        cursor = conn.execute(
+            f"SELECT DISTINCT user_telegram_id FROM applications WHERE {where} AND user_telegram_id > ? "
+            "ORDER BY user_telegram_id LIMIT ?",
+            params + [after_user_id, limit],
+        )
+        return [int(r[0]) for r in cursor.fetchall()]
+
+def create_broadcast_sqlite(text: str, since=None, form_type: Optional[str] = None, total: int = 0,
+                            created_by: Optional[int] = None, report_chat_id: Optional[int] = None,
+                            report_message_id: Optional[int] = None) -> int:
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    since_str = since.strftime('%Y-%m-%d %H:%M:%S') if since else None
+    with get_sqlite_connection() as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO broadcasts (text, form_type, since, status, total, created_by,
+                                    report_chat_id, report_message_id, created_at, updated_at)
+            VALUES (?, ?, ?, 'running', ?, ?, ?, ?, ?, ?)
+            """,
+            (text, form_type, since_str, total, created_by, report_chat_id, report_message_id, now, now),
+        )
+        return int(cursor.lastrowid or 0)
+
+def update_broadcast_progress_sqlite(broadcast_id: int, last_user_id: int, sent: int, failed: int, skipped: int,
+                                     status: Optional[str] = None) -> None:
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with get_sqlite_connection() as conn:
+        conn.execute(
+            "UPDATE broadcasts SET last_user_id=?, sent=?, failed=?, skipped=?, status=COALESCE(?, status), updated_at=? WHERE id=?",
+            (last_user_id, sent, failed, skipped, status, now, broadcast_id),
+        )
+
+def _broadcast_row(row) -> dict:
+    bc = dict(row)
+    bc["since"] = _parse_sqlite_dt(bc.get("since"))
+    return bc
+
+def get_broadcast_sqlite(broadcast_id: int) -> Optional[dict]:
+    with get_sqlite_connection() as conn:
+        row = conn.execute("SELECT * FROM broadcasts WHERE id=?", (broadcast_id,)).fetchone()
+        return _broadcast_row(row) if row else None
+
+def get_unfinished_broadcasts_sqlite() -> list:
+    with get_sqlite_connection() as conn:
+        rows = conn.execute("SELECT * FROM broadcasts WHERE status='running' ORDER BY id").fetchall()
+        return [_broadcast_row(r) for r in rows]
+
+def load_bot_state_sqlite(kind: str) -> list:
+    with get_sqlite_connection() as conn:
+        rows = conn.execute("SELECT key, value FROM bot_state WHERE kind=?", (kind,)).fetchall()
+        return [(r["key"], bytes(r["value"])) for r in rows]
+
+def save_bot_state_sqlite(rows: list) -> None:
+    """(kind, key, value) sətirləri; value=None - sil"""
+    now = datetime.now().isoformat()
+    upserts = [(k, key, v, now) for k, key, v in rows if v is not None]
+    deletes = [(k, key) for k, key, v in rows if v is None]
+    with get_sqlite_connection() as conn:
+        if upserts:
+            conn.executemany(
+                """
+                INSERT INTO bot_state (kind, key, value, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(kind, key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at
+                """,
+                upserts,
+            )
+        if deletes:
+            conn.executemany("DELETE FROM bot_state WHERE kind=? AND key=?", deletes)
+
 def search_applications_sqlite(fin: Optional[str] = None, phone: Optional[str] = None) -> list:
     """FIN və ya telefon ilə axtarış"""
     with get_sqlite_connection() as conn:
@@ -237,6 +549,8 @@ def search_applications_sqlite(fin: Optional[str] = None, phone: Optional[str] =
         if fin:
             cursor.execute("SELECT * FROM applications WHERE fin=? ORDER BY created_at DESC", (fin.upper(),))
         elif phone:
+            from phone import normalize_phone
+            phone = normalize_phone(phone) or phone
             cursor.execute("SELECT * FROM applications WHERE phone=? ORDER BY created_at DESC", (phone,))
         else:
             return []
@@ -301,3 +615,7 @@ def delete_all_applications_sqlite() -> int:
         deleted = cursor.rowcount
         logger.info(f"✅ {deleted} müraciət silindi və ID sıfırlandı")
         return deleted
+
+
+# Hər DB funksiyasının müddəti ölçülür (/perf)
+instrument_module(globals())
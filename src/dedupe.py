@@ -0,0 +1,111 @@
+"""
+Təkrar müraciətlərin aşkarlanması
+
+- Dəqiq təkrar: normallaşdırılmış mətnin heşi + FIN (fin, body_hash index-i ilə
+  O(1) yoxlama). Açıq (gözləyən) eyni müraciət varsa yenisi yazılmır.
+- Oxşar təkrar: 64-bitlik SimHash; eyni FIN və ya istifadəçinin son
+  müraciətləri ilə Hamming məsafəsi kiçikdirsə icraçılara xəbərdarlıq edilir.
+- İdempotentlik: hər təsdiq düyməsinə (xülasə mesajına) unikal submit_key;
+  təkrarlanan callback ikinci sətir yarada bilmir.
+"""
+import hashlib
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from config import BAKU_TZ
+
+logger = logging.getLogger("dsmf-dedupe")
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_MASK64 = (1 << 64) - 1
+# SimHash qısa mətnlərdə etibarsızdır
+MIN_SIMHASH_CHARS = 20
+_SHINGLE = 4  # simvol 4-qramları: şəkilçili sözlərdə söz əsaslı xüsusiyyətlərdən dayanıqlıdır
+
+
+def normalize_body(text: str) -> str:
+    """Hərf registri, durğu işarələri və boşluqlardan asılı olmayan forma"""
+    return " ".join(_WORD_RE.findall((text or "").casefold()))
+
+
+def body_hash(text: str) -> str:
+    return hashlib.blake2b(normalize_body(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _h64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bitlik SimHash (simvol 4-qramları üzrə); BIGINT üçün işarəli qaytarılır"""
+    norm = normalize_body(text)
+    if len(norm) < MIN_SIMHASH_CHARS:
+        return None
+    weights = [0] * 64
+    for i in range(len(norm) - _SHINGLE + 1):
+        h = _h64(norm[i:i + _SHINGLE])
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    value = 0
+    for bit, w in enumerate(weights):
+        if w > 0:
+            value |= 1 << bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK64).bit_count()
+
+
+def fingerprint(text: str) -> Tuple[str, Optional[int]]:
+    return body_hash(text), simhash(text)
+
+
+def submit_key(user_id: int, message_id: Optional[int]) -> Optional[str]:
+    """Təsdiq callback-i üçün idempotentlik açarı (xülasə mesajı üzrə)"""
+    if message_id is None:
+        return None
+    return f"{user_id}:{message_id}"
+
+
+# ---------- Backend seçimi ----------
+def find_by_submit_key(key: Optional[str], *, use_sqlite: bool) -> Optional[int]:
+    if not key:
+        return None
+    if use_sqlite:
+        from db_sqlite import get_application_id_by_submit_key_sqlite
+        return get_application_id_by_submit_key_sqlite(key)
+    from db_operations import get_application_id_by_submit_key
+    return get_application_id_by_submit_key(key)
+
+
+def find_exact(fin: str, digest: str, *, use_sqlite: bool, window_hours: float) -> Optional[int]:
+    """Eyni FIN və mətnlə gözləyən müraciətin ID-si"""
+    since = datetime.now(BAKU_TZ) - timedelta(hours=window_hours)
+    if use_sqlite:
+        from db_sqlite import find_pending_duplicate_sqlite
+        return find_pending_duplicate_sqlite(fin, digest, since)
+    from db_operations import find_pending_duplicate
+    return find_pending_duplicate(fin, digest, since)
+
+
+def find_similar(fin: str, user_id: int, sh: Optional[int], *, use_sqlite: bool, exclude_id: Optional[int],
+                 window_days: float, max_distance: int) -> List[int]:
+    """Eyni FIN/istifadəçinin oxşar mətnli son müraciətləri"""
+    if sh is None:
+        return []
+    since = datetime.now(BAKU_TZ) - timedelta(days=window_days)
+    try:
+        if use_sqlite:
+            from db_sqlite import get_recent_simhashes_sqlite
+            rows = get_recent_simhashes_sqlite(fin, user_id, since)
+        else:
+            from db_operations import get_recent_simhashes
+            rows = get_recent_simhashes(fin, user_id, since)
+    except Exception as e:
+        logger.warning("Oxşar müraciət axtarışı alınmadı: %s", e)
+        return []
+    return [app_id for app_id, other in rows
+            if other is not None and app_id != exclude_id and hamming(sh, other) <= max_distance]
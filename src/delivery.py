@@ -0,0 +1,184 @@
+"""
+Vətəndaşa mesaj çatdırılmasının izlənməsi
+
+Botu bloklamış və ya hesabı silinmiş vətəndaşlara hər dəfə yenidən sorğu
+göndərməmək üçün son çatdırılma vəziyyəti DB-də saxlanılır. Əlçatmaz
+vətəndaşa növbəti cəhd yalnız geri çəkilmə (backoff) cədvəli üzrə edilir.
+Vətəndaş bota özü yazdıqda (blokdan çıxarıb) vəziyyət sıfırlanır.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Optional
+
+from telegram.error import BadRequest, Forbidden, TelegramError
+
+from metrics import REGISTRY
+
+logger = logging.getLogger("dsmf-delivery")
+
+# Əlçatmaz vətəndaşa təkrar cəhdlər arası fasilə (uğursuz cəhd sayına görə)
+BACKOFF_SCHEDULE = (
+    timedelta(hours=1),
+    timedelta(hours=6),
+    timedelta(days=1),
+    timedelta(days=3),
+    timedelta(days=7),
+)
+# Uğurlu çatdırılma bu müddətdən tez-tez DB-yə yazılmır
+SUCCESS_WRITE_INTERVAL = timedelta(hours=1)
+_CACHE_SIZE = 10_000
+
+_deliveries = REGISTRY.counter("citizen_deliveries_total", "Vətəndaşa göndəriş nəticələri")
+
+
+class DeliveryResult(str, Enum):
+    SENT = "sent"
+    BLOCKED = "blocked"   # Vətəndaş botu bloklayıb / chat tapılmadı
+    SKIPPED = "skipped"   # Əvvəlcədən məlum əlçatmaz, backoff müddəti bitməyib
+    FAILED = "failed"     # Müvəqqəti xəta (şəbəkə və s.)
+
+
+_NOTICES = {
+    DeliveryResult.BLOCKED: "⚠️ Vətəndaş botu bloklayıb – bildiriş çatdırılmadı",
+    DeliveryResult.SKIPPED: "⚠️ Vətəndaş botu bloklayıb – bildiriş çatdırılmadı",
+    DeliveryResult.FAILED: "⚠️ Bildiriş vətəndaşa çatdırılmadı (müvəqqəti xəta)",
+}
+
+# user_telegram_id -> son məlum vəziyyət (DB-yə təkrar sorğunun qarşısını alır)
+_cache: "OrderedDict[int, Optional[dict]]" = OrderedDict()
+
+
+def notice_for(result: DeliveryResult) -> str:
+    """İcraçı qrup mesajı üçün xəbərdarlıq sətri (uğurlu çatdırılmada boş)"""
+    return _NOTICES.get(result, "")
+
+
+def _remember(user_id: int, state: Optional[dict]) -> None:
+    _cache[user_id] = state
+    _cache.move_to_end(user_id)
+    while len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _load_state(user_id: int, use_sqlite: bool) -> Optional[dict]:
+    if user_id in _cache:
+        _cache.move_to_end(user_id)
+        return _cache[user_id]
+    try:
+        if use_sqlite:
+            from db_sqlite import get_delivery_state_sqlite
+            state = get_delivery_state_sqlite(user_id)
+        else:
+            from db_operations import get_delivery_state
+            state = get_delivery_state(user_id)
+    except Exception as e:
+        logger.warning("Çatdırılma vəziyyəti oxunmadı: %s", e)
+        return None
+    _remember(user_id, state)
+    return state
+
+
+def _store_success(user_id: int, state: Optional[dict], use_sqlite: bool) -> None:
+    now = datetime.now()
+    if state and not state.get("failure_count") and state.get("last_success_at") and \
+            now - state["last_success_at"] < SUCCESS_WRITE_INTERVAL:
+        return
+    try:
+        if use_sqlite:
+            from db_sqlite import record_delivery_success_sqlite
+            record_delivery_success_sqlite(user_id)
+        else:
+            from db_operations import record_delivery_success
+            record_delivery_success(user_id)
+    except Exception as e:
+        logger.warning("Çatdırılma uğuru yazılmadı: %s", e)
+    _remember(user_id, {
+        "user_telegram_id": user_id,
+        "last_success_at": now,
+        "failure_count": 0,
+        "blocked": False,
+        "next_retry_at": None,
+    })
+
+
+def _store_failure(user_id: int, state: Optional[dict], reason: str, blocked: bool, use_sqlite: bool) -> None:
+    failures = (state or {}).get("failure_count") or 0
+    next_retry_at = None
+    if blocked:
+        delay = BACKOFF_SCHEDULE[min(failures, len(BACKOFF_SCHEDULE) - 1)]
+        next_retry_at = datetime.now() + delay
+    try:
+        if use_sqlite:
+            from db_sqlite import record_delivery_failure_sqlite
+            record_delivery_failure_sqlite(user_id, reason, blocked, next_retry_at)
+        else:
+            from db_operations import record_delivery_failure
+            record_delivery_failure(user_id, reason, blocked, next_retry_at)
+    except Exception as e:
+        logger.warning("Çatdırılma xətası yazılmadı: %s", e)
+    new_state = dict(state or {"user_telegram_id": user_id, "last_success_at": None})
+    new_state.update({
+        "last_failure_at": datetime.now(),
+        "last_failure_reason": reason,
+        "failure_count": failures + 1,
+        "blocked": blocked,
+        "next_retry_at": next_retry_at,
+    })
+    _remember(user_id, new_state)
+
+
+def is_unreachable(user_id: int, use_sqlite: bool) -> bool:
+    """Vətəndaş hazırda əlçatmaz sayılırmı (bloklayıb və backoff bitməyib)"""
+    state = _load_state(user_id, use_sqlite)
+    if not state or not state.get("blocked"):
+        return False
+    retry_at = state.get("next_retry_at")
+    return retry_at is None or datetime.now() < retry_at
+
+
+async def mark_reachable(user_id: int, *, use_sqlite: bool) -> None:
+    """Vətəndaşdan şəxsi yenilik gəldi - blok bayrağını və backoff-u sıfırla"""
+    user_id = int(user_id)
+    if user_id in _cache:
+        state = _cache[user_id]
+    else:
+        state = await asyncio.to_thread(_load_state, user_id, use_sqlite)
+    if not state or not (state.get("blocked") or state.get("failure_count")):
+        return
+    await asyncio.to_thread(_store_success, user_id, state, use_sqlite)
+    logger.info("🔓 Vətəndaş yenidən əlçatandır: user=%s", user_id)
+
+
+async def send_to_citizen(bot, user_id: int, text: str, *, use_sqlite: bool, **kwargs) -> DeliveryResult:
+    """Vətəndaşa mesaj göndər və nəticəni çatdırılma cədvəlinə yaz.
+
+    Heç vaxt istisna atmır - nəticə DeliveryResult ilə qaytarılır.
+    """
+    user_id = int(user_id)
+    if is_unreachable(user_id, use_sqlite):
+        _deliveries.inc(result=DeliveryResult.SKIPPED.value)
+        logger.info("⏭ Vətəndaş əlçatmazdır, göndəriş ötürüldü: user=%s", user_id)
+        return DeliveryResult.SKIPPED
+    state = _cache.get(user_id)
+    try:
+        await bot.send_message(chat_id=user_id, text=text, **kwargs)
+    except Forbidden as e:
+        result, blocked, reason = DeliveryResult.BLOCKED, True, str(e)
+    except BadRequest as e:
+        # "Chat not found" - vətəndaş heç vaxt botu açmayıb və ya hesab silinib
+        unreachable = "chat not found" in str(e).lower() or "user is deactivated" in str(e).lower()
+        result = DeliveryResult.BLOCKED if unreachable else DeliveryResult.FAILED
+        blocked, reason = unreachable, str(e)
+    except TelegramError as e:
+        result, blocked, reason = DeliveryResult.FAILED, False, str(e)
+    else:
+        _store_success(user_id, state, use_sqlite)
+        _deliveries.inc(result=DeliveryResult.SENT.value)
+        return DeliveryResult.SENT
+    logger.warning("Vətəndaşa mesaj çatmadı: user=%s səbəb=%s", user_id, reason)
+    _store_failure(user_id, state, reason, blocked, use_sqlite)
+    _deliveries.inc(result=result.value)
+    return result
@@ -0,0 +1,91 @@
+"""
+Vətəndaş müraciət qaralaması (anket doldurulan müddətdə user_data["app"])
+
+Minlərlə eyni vaxtlı qaralama yaddaşda saxlanıldığı üçün obyekt yığcamdır:
+__slots__ (per-instance __dict__ yoxdur), müraciət növü enum üzvünə istinad,
+mövzu sahəsi yoxdur (DB-yə yazılarkən body-dən törədilir). Persistence
+üçün pickle forması düz tuple-dır: növ kodu və Unix vaxtı ilə.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Optional, Tuple
+
+from config import BAKU_TZ
+
+
+class FormType(str, Enum):
+    COMPLAINT = "Şikayət"
+    SUGGESTION = "Təklif"
+    APPLICATION = "Ərizə"
+
+
+# Serializasiya üçün sabit kodlar (sıra dəyişməməlidir)
+_FORM_CODES = (FormType.COMPLAINT, FormType.SUGGESTION, FormType.APPLICATION)
+_CODE_OF = {ft: i for i, ft in enumerate(_FORM_CODES)}
+
+
+@dataclass(slots=True)
+class ApplicationData:
+    fullname: Optional[str] = None
+    phone: Optional[str] = None
+    fin: Optional[str] = None
+    id_photo_file_id: Optional[str] = None
+    form_type: Optional[FormType] = None
+    body: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+    def summary_text(self) -> str:
+        # Tarix qısa formatda və sonunda
+        time_str = ""
+        if self.timestamp:
+            time_str = f"⏰ {self.timestamp.strftime('%d.%m.%y %H:%M:%S')}\n"
+        return (
+            "📋 Müraciət xülasəsi:\n"
+            # Ad xətti sadələşdirildi (uzun başlıq silindi)
+            f"👤 {self.fullname}\n"
+            f"📱 Mobil nömrə: {self.phone}\n"
+            f"🆔 FIN: {self.fin}\n"
+            # Form növü gizlədilib (istifadəçi və qrup mesajlarında göstərilmir)
+            f"✍️ Müraciət mətni: {self.body}\n\n"
+            f"{time_str}"
+        )
+
+    def to_tuple(self) -> Tuple:
+        """Yığcam forma: (fullname, phone, fin, file_id, növ kodu, body, unix vaxtı)"""
+        return (
+            self.fullname,
+            self.phone,
+            self.fin,
+            self.id_photo_file_id,
+            _CODE_OF.get(self.form_type) if self.form_type is not None else None,  # type: ignore[arg-type]
+            self.body,
+            self.timestamp.timestamp() if self.timestamp else None,
+        )
+
+    @classmethod
+    def from_tuple(cls, data: Tuple) -> "ApplicationData":
+        fullname, phone, fin, file_id, code, body, ts = data
+        return cls(
+            fullname,
+            phone,
+            fin,
+            file_id,
+            _FORM_CODES[code] if code is not None else None,
+            body,
+            datetime.fromtimestamp(ts, BAKU_TZ) if ts is not None else None,
+        )
+
+    def __reduce__(self):
+        return (_restore, (self.to_tuple(),))
+
+    def __setstate__(self, state) -> None:
+        # Köhnə formatda (dataclass __dict__) saxlanılmış qaralamalar
+        if isinstance(state, tuple) and len(state) == 2:
+            state = {**(state[0] or {}), **(state[1] or {})}
+        for name in ApplicationData.__slots__:
+            setattr(self, name, state.get(name))
+
+
+def _restore(data: Tuple) -> ApplicationData:
+    return ApplicationData.from_tuple(data)
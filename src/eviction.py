@@ -0,0 +1,146 @@
+"""
+Köhnəlmiş istifadəçi məlumatlarının təmizlənməsi və yaddaş uçotu
+
+Hər istifadəçinin son aktivlik vaxtı yaddaşda izlənir; USER_DATA_TTL-dən
+çox passiv qalanların user_data-sı (yarımçıq anket, exec_* açarları və s.)
+və söhbət vəziyyətləri periodik olaraq silinir. Yarımçıq söhbətlər adətən
+ConversationHandler-in conversation_timeout-u ilə bitirilir, lakin persist
+olunan vəziyyətlərin timeout job-ları restartda itir - belə qeydlər burada
+user_data ilə birlikdə silinir (əks halda vəziyyət qalır, "app" isə yox olur).
+"""
+import asyncio
+import logging
+import os
+import pickle
+import time
+from typing import Dict, Optional
+
+from telegram import Update
+from telegram.ext import ConversationHandler
+
+from metrics import REGISTRY
+
+logger = logging.getLogger("dsmf-eviction")
+
+_evicted = REGISTRY.counter("user_data_evicted_total", "TTL ilə silinən user_data qeydləri")
+
+# user_id -> son aktivlik (time.monotonic)
+_last_seen: Dict[int, float] = {}
+_task: Optional[asyncio.Task] = None
+
+EXEC_KEYS = ("exec_app_id", "exec_msg_id", "exec_chat_id", "exec_original_content", "exec_has_photo",
+             "exec_photo_file_id")
+
+
+async def touch(update: object, context) -> None:
+    """Hər yenilikdə istifadəçinin aktivlik vaxtını yenilə (handler qrupu -1)"""
+    if isinstance(update, Update) and update.effective_user:
+        _last_seen[update.effective_user.id] = time.monotonic()
+
+
+def _conversation_tables(application) -> Dict[str, dict]:
+    # PTB söhbət cədvəlinə ictimai giriş vermir; persist olunanlarda bu TrackingDict-dir
+    # və silinən açar növbəti update_persistence-də DB-dən də silinir
+    tables = {}
+    for handlers in application.handlers.values():
+        for h in handlers:
+            if isinstance(h, ConversationHandler):
+                tables[h.name or repr(h)] = getattr(h, "_conversations", {})
+    return tables
+
+
+def _conversation_users(application) -> set:
+    # Açarın son elementi user_id-dir (per_user=True: (chat_id, user_id) və ya (user_id,))
+    return {key[-1] for table in _conversation_tables(application).values() for key in table}
+
+
+def drop_conversations(application, user_id: int) -> int:
+    """İstifadəçinin bütün söhbət vəziyyətlərini sil"""
+    dropped = 0
+    for table in _conversation_tables(application).values():
+        for key in [k for k in table if k[-1] == user_id]:
+            table.pop(key, None)
+            dropped += 1
+    return dropped
+
+
+def seed(application) -> None:
+    """Persistence-dən yüklənən istifadəçilərin TTL-i restart anından sayılır"""
+    now = time.monotonic()
+    for user_id in set(application.user_data) | _conversation_users(application):
+        _last_seen.setdefault(user_id, now)
+
+
+def sweep(application, ttl: float) -> int:
+    """TTL-i keçmiş istifadəçilərin user_data-sını və söhbət vəziyyətlərini sil"""
+    cutoff = time.monotonic() - ttl
+    stale = [uid for uid, seen in _last_seen.items() if seen < cutoff]
+    for user_id in stale:
+        _last_seen.pop(user_id, None)
+        if user_id in application.user_data:
+            application.drop_user_data(user_id)
+        drop_conversations(application, user_id)
+    # İzlənməyən (aktivliyi heç qeydə alınmamış) qeydlər də sonsuza qədər qalmasın
+    for user_id in (set(application.user_data) | _conversation_users(application)) - set(_last_seen):
+        _last_seen[user_id] = time.monotonic()
+    if stale:
+        _evicted.inc(len(stale))
+        logger.info("🧹 %s passiv istifadəçinin məlumatı silindi", len(stale))
+    return len(stale)
+
+
+async def _loop(application, ttl: float, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            sweep(application, ttl)
+        except Exception as e:
+            logger.error("user_data təmizlənməsi xətası: %s", e)
+
+
+def start(application, *, ttl: float, interval: float) -> None:
+    global _task
+    seed(application)
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_loop(application, ttl, interval), name="user-data-eviction")
+
+
+async def stop() -> None:
+    global _task
+    if _task:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_stats(application) -> dict:
+    """user_data/chat_data/söhbət sayları və təxmini ölçü (pickle baytları)"""
+    drafts = execs = approx = 0
+    for data in list(application.user_data.values()):
+        if "app" in data:
+            drafts += 1
+        if "exec_app_id" in data:
+            execs += 1
+        try:
+            approx += len(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            pass
+    conversations = {name: len(table) for name, table in _conversation_tables(application).items()}
+    return {
+        "user_data": len(application.user_data),
+        "drafts": drafts,
+        "exec_pending": execs,
+        "chat_data": len(application.chat_data),
+        "user_data_bytes": approx,
+        "tracked": len(_last_seen),
+        "conversations": conversations,
+        "rss_bytes": _rss_bytes(),
+    }
@@ -0,0 +1,293 @@
+"""
+Daxili HTTP server: Telegram webhook qəbulu, /health və /metrics endpoint-ləri
+
+Webhook rejimində Telegram yenilikləri POST ilə WEBHOOK_PATH-ə göndərir,
+X-Telegram-Bot-Api-Secret-Token başlığı yoxlanılır və Update birbaşa
+PTB-nin update_queue-suna qoyulur. Eyni port üzərində /health (DB ping,
+son uğurlu getUpdates, job queue) və Prometheus formatında /metrics cavab
+verir. Polling rejimində eyni server start_server() ilə bot-un event
+loop-unda ayrıca işə salınır.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import signal
+import time
+from http import HTTPStatus
+from typing import Callable, Optional
+
+import tornado.web
+from tornado.httpserver import HTTPServer
+from telegram import Update
+from telegram.ext import Application
+
+import perf
+from metrics import REGISTRY, render_prometheus
+
+logger = logging.getLogger("dsmf-http")
+
+_STARTED_AT = time.time()
+_webhook_updates = REGISTRY.counter("webhook_updates_total", "Webhook ilə qəbul edilən yeniliklər")
+_webhook_rejected = REGISTRY.counter("webhook_rejected_total", "Rədd edilən webhook sorğuları (səbəb üzrə)")
+_last_update_at: Optional[float] = None
+
+
+class WebhookHandler(tornado.web.RequestHandler):
+    """Telegram-dan gələn yenilikləri qəbul edir"""
+
+    SUPPORTED_METHODS = ("POST",)  # type: ignore[assignment]
+
+    def initialize(self, ptb_app: Application, secret_token: Optional[str]) -> None:
+        self.ptb_app = ptb_app
+        self.secret_token = secret_token
+
+    def check_xsrf_cookie(self) -> None:
+        return None
+
+    async def post(self) -> None:
+        global _last_update_at
+        if self.secret_token:
+            token = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+                _webhook_rejected.inc(reason="secret")
+                logger.warning("⛔ Webhook: yanlış secret token, IP=%s", self.request.remote_ip)
+                raise tornado.web.HTTPError(HTTPStatus.FORBIDDEN)
+        try:
+            data = json.loads(self.request.body)
+            update = Update.de_json(data, self.ptb_app.bot)
+        except Exception as e:
+            _webhook_rejected.inc(reason="payload")
+            logger.error("Webhook: yenilik oxunmadı: %s", e)
+            raise tornado.web.HTTPError(HTTPStatus.BAD_REQUEST)
+        if update:
+            self.ptb_app.bot.insert_callback_data(update)
+            await self.ptb_app.update_queue.put(update)
+            _webhook_updates.inc()
+            _last_update_at = time.time()
+        self.set_status(HTTPStatus.OK)
+
+    def log_exception(self, typ, value, tb) -> None:
+        if isinstance(value, tornado.web.HTTPError):
+            return
+        super().log_exception(typ, value, tb)
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    """Sağlamlıq yoxlaması: hər hansı kritik yoxlama uğursuzdursa 503"""
+
+    def initialize(self, ptb_app: Application, mode: str, db_ping: Optional[Callable[[], None]] = None,
+                   poll_stale_s: float = 120.0, db_timeout_s: float = 5.0) -> None:
+        self.ptb_app = ptb_app
+        self.mode = mode
+        self.db_ping = db_ping
+        self.poll_stale_s = poll_stale_s
+        self.db_timeout_s = db_timeout_s
+
+    async def _check_db(self) -> dict:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self.db_ping), self.db_timeout_s)  # type: ignore[arg-type]
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"[:200]}
+        return {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    def _check_updates(self) -> dict:
+        if self.mode == "webhook":
+            # Webhook-da sakit dövr normaldır - yalnız məlumat üçün
+            age = round(time.time() - _last_update_at, 1) if _last_update_at else None
+            return {"ok": True, "last_update_age_s": age}
+        last = perf.last_success("getUpdates")
+        age = time.time() - (last or _STARTED_AT)
+        return {
+            "ok": age <= self.poll_stale_s,
+            "last_get_updates_age_s": round(time.time() - last, 1) if last else None,
+        }
+
+    def _check_job_queue(self) -> Optional[dict]:
+        job_queue = self.ptb_app.job_queue
+        if job_queue is None:
+            return None
+        scheduler = getattr(job_queue, "scheduler", None)
+        return {"ok": bool(scheduler is not None and scheduler.running), "jobs": len(job_queue.jobs())}
+
+    async def get(self) -> None:
+        running = bool(self.ptb_app.running)
+        checks: dict = {}
+        if running:
+            checks["updates"] = self._check_updates()
+            job_queue = self._check_job_queue()
+            if job_queue is not None:
+                checks["job_queue"] = job_queue
+        if self.db_ping is not None:
+            checks["db"] = await self._check_db()
+        healthy = running and all(c["ok"] for c in checks.values())
+        processed = REGISTRY.get("updates_processed_total")
+        body = {
+            "status": "ok" if healthy else ("degraded" if running else "starting"),
+            "mode": self.mode,
+            "uptime_s": round(time.time() - _STARTED_AT, 1),
+            "updates_received": int(_webhook_updates.value()),
+            "updates_processed": int(processed.value()) if processed is not None else None,  # type: ignore[attr-defined]
+            "last_update_age_s": round(time.time() - _last_update_at, 1) if _last_update_at else None,
+            "checks": checks,
+        }
+        self.set_status(HTTPStatus.OK if healthy else HTTPStatus.SERVICE_UNAVAILABLE)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.set_header("Cache-Control", "no-store")
+        self.finish(json.dumps(body))
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """Prometheus scrape endpoint-i (text exposition format 0.0.4)"""
+
+    def initialize(self, token: Optional[str] = None) -> None:
+        self.token = token
+
+    def get(self) -> None:
+        if self.token:
+            auth = self.request.headers.get("Authorization", "")
+            if not hmac.compare_digest(auth.encode(), f"Bearer {self.token}".encode()):
+                raise tornado.web.HTTPError(HTTPStatus.UNAUTHORIZED)
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.set_header("Cache-Control", "no-store")
+        self.finish(render_prometheus())
+
+    def log_exception(self, typ, value, tb) -> None:
+        if isinstance(value, tornado.web.HTTPError):
+            return
+        super().log_exception(typ, value, tb)
+
+
+def build_web_app(
+    application: Application,
+    mode: str,
+    webhook_path: Optional[str] = None,
+    secret_token: Optional[str] = None,
+    health_path: str = "/health",
+    metrics_path: Optional[str] = "/metrics",
+    metrics_token: Optional[str] = None,
+    db_ping: Optional[Callable[[], None]] = None,
+    poll_stale_s: float = 120.0,
+) -> tornado.web.Application:
+    handlers: list = [
+        (health_path, HealthHandler,
+         {"ptb_app": application, "mode": mode, "db_ping": db_ping, "poll_stale_s": poll_stale_s}),
+    ]
+    if metrics_path:
+        handlers.append((metrics_path, MetricsHandler, {"token": metrics_token}))
+    if webhook_path:
+        if not webhook_path.startswith("/"):
+            webhook_path = "/" + webhook_path
+        handlers.append(
+            (rf"{webhook_path}/?", WebhookHandler, {"ptb_app": application, "secret_token": secret_token})
+        )
+    return tornado.web.Application(handlers, log_function=lambda handler: None)
+
+
+async def _set_webhook(application: Application, url: str, secret_token: Optional[str],
+                       max_connections: int, drop_pending_updates: bool, retries: int = 3) -> None:
+    for attempt in range(1, retries + 1):
+        try:
+            await application.bot.set_webhook(
+                url=url,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=drop_pending_updates,
+                max_connections=max_connections,
+            )
+            logger.info("✅ Webhook quruldu: %s", url)
+            return
+        except Exception as e:
+            if attempt == retries:
+                raise
+            logger.warning("setWebhook alınmadı (%s/%s): %s", attempt, retries, e)
+            await asyncio.sleep(2 * attempt)
+
+
+async def serve_webhook(
+    application: Application,
+    *,
+    listen: str,
+    port: int,
+    url_path: str,
+    webhook_url: str,
+    secret_token: Optional[str],
+    health_path: str = "/health",
+    metrics_path: Optional[str] = "/metrics",
+    metrics_token: Optional[str] = None,
+    db_ping: Optional[Callable[[], None]] = None,
+    max_connections: int = 40,
+    drop_pending_updates: bool = False,
+    stop_event: Optional[asyncio.Event] = None,
+) -> None:
+    """Application-u webhook rejimində işə sal və stop_event/siqnal gələnə qədər işlət"""
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows / əsas olmayan thread
+
+    web_app = build_web_app(application, "webhook", url_path, secret_token, health_path,
+                            metrics_path=metrics_path, metrics_token=metrics_token, db_ping=db_ping)
+    server = HTTPServer(web_app, xheaders=True)
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        server.listen(port, address=listen)
+        logger.info("🌐 HTTP server dinləyir: %s:%s (webhook=%s, health=%s, metrics=%s)",
+                    listen, port, url_path, health_path, metrics_path)
+        await _set_webhook(application, webhook_url, secret_token, max_connections, drop_pending_updates)
+        await application.start()
+        await stop_event.wait()
+    finally:
+        server.stop()
+        await server.close_all_connections()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        # Webhook silinmir: redeploy zamanı Telegram yenilikləri saxlayır və yeni instansiyaya çatdırır
+        logger.info("Webhook server dayandırıldı")
+
+
+async def start_server(
+    application: Application,
+    *,
+    listen: str,
+    port: int,
+    health_path: str = "/health",
+    metrics_path: Optional[str] = "/metrics",
+    metrics_token: Optional[str] = None,
+    db_ping: Optional[Callable[[], None]] = None,
+    poll_stale_s: float = 120.0,
+) -> Optional[HTTPServer]:
+    """Polling rejimi: /health və /metrics üçün server (bot-un event loop-unda); port məşğuldursa None"""
+    web_app = build_web_app(application, "polling", None, None, health_path, metrics_path=metrics_path,
+                            metrics_token=metrics_token, db_ping=db_ping, poll_stale_s=poll_stale_s)
+    server = HTTPServer(web_app, xheaders=True)
+    try:
+        server.listen(port, address=listen)
+    except OSError as e:
+        logger.warning("HTTP monitorinq serveri başlamadı (%s:%s): %s", listen, port, e)
+        return None
+    logger.info("🌐 Monitorinq serveri: %s:%s (health=%s, metrics=%s)", listen, port, health_path, metrics_path)
+    return server
+
+
+async def stop_server(server: Optional[HTTPServer]) -> None:
+    if server is None:
+        return
+    server.stop()
+    await server.close_all_connections()
+
+
+def run_webhook(application: Application, **kwargs) -> None:
+    """Bloklayan giriş nöqtəsi (run_polling analoqu)"""
+    asyncio.run(serve_webhook(application, **kwargs))
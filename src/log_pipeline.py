@@ -0,0 +1,222 @@
+"""
+Bloklamayan log konveyeri
+
+Handler-lər yalnız QueueHandler-ə yazır: qeyd növbəyə qoyulur, format və
+I/O (konsol, fırlanan fayl) QueueListener thread-ində icra olunur - event
+loop log yazarkən gözləmir. Növbə doludursa qeyd atılır və sayılır.
+
+- Mətn və ya JSON lines formatı (LOG_FORMAT=json)
+- Fırlanan fayl (LOG_FILE, LOG_FILE_MAX_MB, LOG_FILE_BACKUPS)
+- Səs-küylü loggerlər üçün seçmə (LOG_SAMPLE="apscheduler=0.1,..."):
+  WARNING-dən aşağı qeydlərin hər şablon üzrə yalnız müəyyən payı saxlanılır
+- Trace ID və seçmə qərarı çağıran thread-də (contextvar-lar orada
+  əlçatandır), format isə listener-də tətbiq olunur
+
+Bu modul config-dən asılı deyil (config.setup_logging onu çağırır).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+_TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s:%(trace)s %(message)s"
+# LogRecord-un standart atributları - JSON-da "extra" sahələri ayırmaq üçün
+_STANDARD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "trace", "trace_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_dropped = 0
+_sampled_out = 0
+_lock = threading.Lock()
+
+REGISTRY.gauge("log_dropped_records", "Növbə dolu olduğu üçün atılan log qeydləri").set_function(lambda: _dropped)
+REGISTRY.gauge("log_sampled_out_records", "Seçmə ilə yazılmayan log qeydləri").set_function(lambda: _sampled_out)
+
+
+def mask(value: Optional[str], keep: int = 2) -> str:
+    """Şəxsi məlumatı (FIN, telefon) loglar üçün gizlət: AB12CD3 -> AB***3"""
+    if not value:
+        return "-"
+    value = str(value)
+    if len(value) <= keep + 1:
+        return "***"
+    return f"{value[:keep]}***{value[-1]}"
+
+
+# ---------- Formatlar ----------
+class JsonFormatter(logging.Formatter):
+    """Bir qeyd - bir JSON sətri (ts, level, logger, msg, trace_id, exc, extra)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", "")
+        if trace_id:
+            data["trace_id"] = trace_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+# ---------- Seçmə ----------
+def parse_sample_rules(spec: str) -> Dict[str, float]:
+    """"apscheduler=0.1,tornado.access=0.05" -> {logger: pay}"""
+    rules: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        name, sep, rate = part.strip().partition("=")
+        if not sep or not name:
+            continue
+        try:
+            rules[name.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rules
+
+
+class SamplingFilter(logging.Filter):
+    """Səs-küylü loggerlərin WARNING-dən aşağı qeydlərindən hər şablon üzrə 1/N-ni saxla.
+
+    Qərar deterministikdir (sayğac): eyni mesaj şablonunun ilk qeydi həmişə
+    yazılır, sonra hər N-ci. Logger adı prefiks üzrə uyğunlaşdırılır.
+    """
+
+    def __init__(self, rules: Dict[str, float]):
+        super().__init__()
+        # Ən uzun prefiks birinci yoxlanılır
+        self.rules: List[Tuple[str, float]] = sorted(rules.items(), key=lambda r: len(r[0]), reverse=True)
+        self._every: Dict[str, int] = {}
+        self._counts: Dict[Tuple[str, object], int] = {}
+
+    def _rate_for(self, name: str) -> Optional[float]:
+        for prefix, rate in self.rules:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        global _sampled_out
+        if record.levelno >= logging.WARNING or not self.rules:
+            return True
+        rate = self._rate_for(record.name)
+        if rate is None or rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            keep = False
+        else:
+            every = max(1, round(1 / rate))
+            key = (record.name, record.msg)  # lazy %-format: şablon sabitdir
+            n = self._counts.get(key, 0)
+            if len(self._counts) > 10_000:
+                self._counts.clear()
+            self._counts[key] = n + 1
+            keep = n % every == 0
+        if not keep:
+            with _lock:
+                _sampled_out += 1
+        return keep
+
+
+# ---------- Növbə ----------
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Növbə doludursa gözləmir - qeydi atır"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _lock:
+                _dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Mesaj çağıran thread-də birləşdirilir (arqumentlər sonradan dəyişə bilər),
+        # traceback mətnə çevrilir; qalan format listener-dədir
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def stats() -> Dict[str, int]:
+    return {"dropped": _dropped, "sampled_out": _sampled_out}
+
+
+def stop() -> None:
+    """Növbədəki qeydləri yaz və listener-i dayandır"""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+        _listener = None
+
+
+def setup(
+    level: int = logging.INFO,
+    *,
+    json_format: bool = False,
+    file_path: Optional[str] = None,
+    file_max_bytes: int = 10 * 1024 * 1024,
+    file_backups: int = 5,
+    sample_rules: Optional[Dict[str, float]] = None,
+    queue_size: int = 10_000,
+    filters: Optional[List[logging.Filter]] = None,
+) -> None:
+    """Root logger-i QueueHandler -> QueueListener -> (konsol, fayl) konveyerinə keçir"""
+    global _listener
+    stop()
+    formatter: logging.Formatter = JsonFormatter() if json_format else logging.Formatter(_TEXT_FORMAT, "%H:%M:%S")
+    sinks: List[logging.Handler] = []
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(formatter)
+    sinks.append(console)
+    if file_path:
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        rotating = logging.handlers.RotatingFileHandler(
+            file_path, maxBytes=file_max_bytes, backupCount=file_backups, encoding="utf-8"
+        )
+        # Fayl həmişə JSON lines - sorğulamaq üçün
+        rotating.setFormatter(JsonFormatter())
+        sinks.append(rotating)
+
+    q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    queue_handler = _DroppingQueueHandler(q)
+    for f in filters or ():
+        queue_handler.addFilter(f)
+    if sample_rules:
+        queue_handler.addFilter(SamplingFilter(sample_rules))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(q, *sinks, respect_handler_level=True)
+    _listener.start()
+
+
+atexit.register(stop)
@@ -0,0 +1,122 @@
+"""
+Vəsiqə şəkillərinin lokal anbarı (məzmun ünvanlı)
+
+Şəkil Telegram-dan bir dəfə yüklənir və orijinal baytların heşi ilə
+(<kök>/<ilk 2 simvol>/<heş>.jpg) diskə yazılır: eyni şəkil ikinci dəfə
+yazılmır. Saxlamadan əvvəl EXIF/metadata silinir (orientasiya piksellərə
+tətbiq olunur), yanında kiçildilmiş nüsxə (<heş>_t.jpg) yaradılır.
+Emal proses pulunda aparılır; PostgreSQL-də file_id saxlanılmasa və ya
+file_id köhnəlsə belə müraciətin şəkli DM və exportlarda göstərilə bilir.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger("dsmf-media")
+
+_root: Optional[str] = None
+_thumb_px = 320
+
+
+def configure(root: Optional[str], thumb_px: int = 320) -> None:
+    """Anbarı aktivləşdir (root=None - deaktiv)"""
+    global _root, _thumb_px
+    _root = root
+    _thumb_px = thumb_px
+    if root:
+        os.makedirs(root, exist_ok=True)
+
+
+def enabled() -> bool:
+    return _root is not None
+
+
+def root() -> Optional[str]:
+    return _root
+
+
+def thumb_px() -> int:
+    return _thumb_px
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def relative_path(key: str, thumb: bool = False) -> str:
+    return os.path.join(key[:2], f"{key}_t.jpg" if thumb else f"{key}.jpg")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# ---------- Emal (proses pulunda işləyir: yalnız Pillow, config import edilmir) ----------
+def store_bytes(data: bytes, media_root: str, thumb_size: int) -> str:
+    """Şəkli təmizlə, kiçik nüsxəsini yarat və anbara yaz; açarı qaytar"""
+    from PIL import Image, ImageOps
+
+    key = content_key(data)
+    path = os.path.join(media_root, relative_path(key))
+    thumb_path = os.path.join(media_root, relative_path(key, thumb=True))
+    if os.path.exists(path) and os.path.exists(thumb_path):
+        return key  # təkrar şəkil - artıq saxlanılıb
+    with Image.open(io.BytesIO(data)) as img:
+        # exif_transpose fırlatma lazım olmasa da nüsxə qaytarır - orientasiya ayrıca yoxlanılır
+        orientation = img.getexif().get(0x0112, 1)
+        clean = io.BytesIO()
+        if orientation == 1 and img.format == "JPEG":
+            # Kvantlaşdırma cədvəlləri saxlanılır - təkrar sıxılma itkisi yoxdur; exif ötürülmür
+            img.save(clean, "JPEG", quality="keep", optimize=True)
+            upright = img
+        else:
+            upright = ImageOps.exif_transpose(img)
+            upright.convert("RGB").save(clean, "JPEG", quality=90, optimize=True)
+        small = upright.convert("RGB")
+        small.thumbnail((thumb_size, thumb_size), Image.Resampling.LANCZOS)
+        thumb = io.BytesIO()
+        small.save(thumb, "JPEG", quality=80, optimize=True)
+    _write_atomic(path, clean.getvalue())
+    _write_atomic(thumb_path, thumb.getvalue())
+    return key
+
+
+# ---------- Oxuma ----------
+def _read(key: str, thumb: bool) -> Optional[bytes]:
+    if not _root or not key:
+        return None
+    try:
+        with open(os.path.join(_root, relative_path(key, thumb)), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+async def read(key: Optional[str], thumb: bool = False) -> Optional[bytes]:
+    """Saxlanılmış şəklin baytları (yoxdursa None)"""
+    if not key:
+        return None
+    return await asyncio.to_thread(_read, key, thumb)
+
+
+def remove_all() -> int:
+    """Bütün müraciətlər silindikdə (/clearall) anbarı boşalt"""
+    if not _root:
+        return 0
+    removed = 0
+    for dirpath, _, filenames in os.walk(_root):
+        for name in filenames:
+            if name.endswith(".jpg"):
+                try:
+                    os.remove(os.path.join(dirpath, name))
+                    removed += 1
+                except OSError as e:
+                    logger.warning("Media faylı silinmədi: %s: %s", name, e)
+    return removed
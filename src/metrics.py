@@ -0,0 +1,246 @@
+"""
+Daxili metriklər - sayğaclar, göstəricilər və gecikmə histoqramları
+
+Bütün modullar metrikləri buradakı qlobal REGISTRY-də qeydə alır.
+Admin komandaları və HTTP endpoint-ləri eyni reyestrdən oxuyur;
+render_prometheus() reyestri Prometheus mətn formatına çevirir (/metrics).
+"""
+import math
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Prometheus üslubunda default bucket-lər (saniyə)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    """Yalnız artan sayğac"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> Iterable[Tuple[LabelKey, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge:
+    """Ani dəyər göstəricisi; istəyə bağlı olaraq callback ilə hesablanır"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._callbacks: Dict[LabelKey, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels) -> None:
+        """Dəyər hər oxunuşda fn() ilə hesablanır"""
+        with self._lock:
+            self._callbacks[_label_key(labels)] = fn
+
+    def value(self, **labels) -> float:
+        key = _label_key(labels)
+        fn = self._callbacks.get(key)
+        if fn is not None:
+            try:
+                return float(fn())
+            except Exception:
+                return math.nan
+        return self._values.get(key, 0.0)
+
+    def samples(self) -> Iterable[Tuple[LabelKey, float]]:
+        with self._lock:
+            out = dict(self._values)
+            callbacks = dict(self._callbacks)
+        for key, fn in callbacks.items():
+            try:
+                out[key] = float(fn())
+            except Exception:
+                out[key] = math.nan
+        return list(out.items())
+
+
+class _HistogramSeries:
+    __slots__ = ("bucket_counts", "count", "total", "recent")
+
+    def __init__(self, n_buckets: int, reservoir: int):
+        self.bucket_counts = [0] * n_buckets
+        self.count = 0
+        self.total = 0.0
+        # Persentil hesablamaq üçün son müşahidələr
+        self.recent: deque = deque(maxlen=reservoir)
+
+
+class Histogram:
+    """Bucket-li histoqram + son N müşahidə üzrə persentillər"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str = "",
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        reservoir: int = 2048,
+    ):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._reservoir = reservoir
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = _HistogramSeries(len(self.buckets), self._reservoir)
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series.bucket_counts[i] += 1
+                    break
+            series.count += 1
+            series.total += value
+            series.recent.append(value)
+
+    def percentiles(self, qs: Iterable[float] = (0.5, 0.95, 0.99), **labels) -> Dict[float, float]:
+        """Son müşahidələr üzrə persentillər (boşdursa 0)"""
+        series = self._series.get(_label_key(labels))
+        qs = tuple(qs)
+        if series is None or not series.recent:
+            return {q: 0.0 for q in qs}
+        with self._lock:
+            data = sorted(series.recent)
+        n = len(data)
+        return {q: data[min(n - 1, max(0, math.ceil(q * n) - 1))] for q in qs}
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(labels))
+        return series.count if series else 0
+
+    def label_sets(self) -> list:
+        with self._lock:
+            return list(self._series.keys())
+
+    def series(self) -> Iterable[Tuple[LabelKey, _HistogramSeries]]:
+        with self._lock:
+            return list(self._series.items())
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_text, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metrik '{name}' artıq başqa tiplə qeydə alınıb")
+            return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str = "", **kwargs) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, **kwargs)
+
+    def get(self, name: str) -> Optional[object]:
+        return self._metrics.get(name)
+
+    def all(self) -> list:
+        with self._lock:
+            return list(self._metrics.values())
+
+
+REGISTRY = Registry()
+
+
+# ---------- Prometheus mətn formatı ----------
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = tuple(key) + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+def render_prometheus(registry: "Registry" = REGISTRY, prefix: str = "") -> str:
+    """Reyestrdəki bütün metriklər Prometheus exposition formatında (text/plain; version=0.0.4)"""
+    lines = []
+    for metric in sorted(registry.all(), key=lambda m: m.name):  # type: ignore[attr-defined]
+        name = prefix + metric.name  # type: ignore[attr-defined]
+        help_text = (metric.help or name).replace("\\", "\\\\").replace("\n", "\\n")  # type: ignore[attr-defined]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric.kind}")  # type: ignore[attr-defined]
+        if isinstance(metric, Histogram):
+            for key, series in sorted(metric.series()):
+                with metric._lock:
+                    counts = list(series.bucket_counts)
+                    count, total = series.count, series.total
+                cumulative = 0
+                for bound, n in zip(metric.buckets, counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        else:
+            for key, value in sorted(metric.samples()):  # type: ignore[attr-defined]
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
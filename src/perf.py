@@ -0,0 +1,224 @@
+"""
+Performans ölçmələri: event loop gecikməsi, handler, DB və Bot API müddətləri
+
+- Loop lag: fon tapşırığı müəyyən intervalla yatır; oyanmanın gecikməsi
+  loop-un nə qədər bloklandığını göstərir.
+- Handler-lər: build_app-dan sonra bütün callback-lər (söhbət mərhələləri
+  daxil) ölçən sarğı ilə əvəzlənir.
+- DB: db_operations və db_sqlite modullarının ictimai funksiyaları idxal
+  zamanı sarılır; event loop thread-indən çağırılanlar ayrıca sayılır.
+- Bot API: HTTPXRequest alt sinfi hər metodun HTTP müddətini ölçür.
+
+Nəticələr metrics.REGISTRY-də saxlanılır və /perf ilə göstərilir.
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import tracing
+from metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from telegram.ext import BaseHandler
+
+logger = logging.getLogger("dsmf-perf")
+
+_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_loop_lag = REGISTRY.histogram("event_loop_lag_seconds", "Event loop oyanma gecikməsi", buckets=_LAG_BUCKETS)
+_loop_lag_max = REGISTRY.gauge("event_loop_lag_max_seconds", "Son dəqiqədə maksimum loop gecikməsi")
+_handler_seconds = REGISTRY.histogram("handler_seconds", "Handler callback-lərinin müddəti")
+_handler_errors = REGISTRY.counter("handler_errors_total", "İstisna ilə bitən handler çağırışları")
+_db_seconds = REGISTRY.histogram("db_op_seconds", "DB funksiyalarının müddəti")
+_db_loop_blocked = REGISTRY.counter("db_loop_blocked_seconds_total", "Event loop thread-ində icra olunan DB vaxtı")
+_api_seconds = REGISTRY.histogram("bot_api_seconds", "Bot API HTTP sorğularının müddəti")
+
+_loop_thread: Optional[int] = None
+# Bot API metodu -> son uğurlu cavabın vaxtı (time.time); /health getUpdates-i yoxlayır
+_last_ok: Dict[str, float] = {}
+_task: Optional[asyncio.Task] = None
+
+
+# ---------- Loop lag ----------
+async def _sample_lag(interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    recent: deque = deque(maxlen=max(1, int(60 / interval)))
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        _loop_lag.observe(lag)
+        recent.append(lag)
+        _loop_lag_max.set(max(recent))
+
+
+def start(*, interval: float) -> None:
+    global _task, _loop_thread
+    _loop_thread = threading.get_ident()
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_sample_lag(interval), name="loop-lag-monitor")
+
+
+async def stop() -> None:
+    global _task
+    if _task:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+# ---------- Handler-lər ----------
+def _timed_callback(callback, name: str):
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            with tracing.span(name, "handler"):
+                return await callback(update, context)
+        except Exception:
+            _handler_errors.inc(handler=name)
+            raise
+        finally:
+            _handler_seconds.observe(time.perf_counter() - started, handler=name)
+
+    wrapper._perf_wrapped = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+def _instrument_handler(handler: "BaseHandler", seen: set) -> int:
+    from telegram.ext import ConversationHandler
+
+    if id(handler) in seen:
+        return 0
+    seen.add(id(handler))
+    if isinstance(handler, ConversationHandler):
+        count = 0
+        children = list(handler.entry_points) + list(handler.fallbacks)
+        for state_handlers in handler.states.values():
+            children.extend(state_handlers)
+        for child in children:
+            count += _instrument_handler(child, seen)
+        return count
+    callback = handler.callback
+    if getattr(callback, "_perf_wrapped", False) or not inspect.iscoroutinefunction(callback):
+        return 0
+    handler.callback = _timed_callback(callback, getattr(callback, "__name__", repr(callback)))
+    return 1
+
+
+def instrument_handlers(application) -> int:
+    """Tətbiqdəki bütün handler callback-lərini ölçən sarğı ilə əvəzlə"""
+    seen: set = set()
+    count = 0
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            count += _instrument_handler(handler, seen)
+    return count
+
+
+# ---------- DB ----------
+def _timed_db(fn, op: str):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            with tracing.span(op, "db"):
+                return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            _db_seconds.observe(elapsed, op=op)
+            if _loop_thread is not None and threading.get_ident() == _loop_thread:
+                _db_loop_blocked.inc(elapsed, op=op)
+
+    return wrapper
+
+
+def instrument_module(namespace: dict) -> None:
+    """Modulun ictimai funksiyalarını ölçən sarğı ilə əvəzlə (modulun sonunda çağırılır)"""
+    module = namespace["__name__"]
+    for name, fn in list(namespace.items()):
+        if name.startswith("_") or not inspect.isfunction(fn) or fn.__module__ != module:
+            continue
+        # Generator və context manager-lər (get_db, iter_*) ölçülmür
+        if inspect.isgeneratorfunction(inspect.unwrap(fn)):
+            continue
+        namespace[name] = _timed_db(fn, name)
+
+
+# ---------- Bot API ----------
+def _timed_request_class():
+    from telegram.request import HTTPXRequest
+
+    class TimedHTTPXRequest(HTTPXRequest):
+        """Hər Bot API metodunun HTTP müddətini ölçən sorğu obyekti"""
+
+        async def do_request(self, url, method, *args, **kwargs):
+            # Fayl yükləmələrində URL fayl yoludur - etiketlər sonsuz artmasın
+            endpoint = "file_download" if "/file/bot" in url else url.rsplit("/", 1)[-1]
+            started = time.perf_counter()
+            try:
+                with tracing.span(endpoint, "api") as sp:
+                    result = await super().do_request(url, method, *args, **kwargs)
+                    if sp is not None:
+                        sp.set(status=result[0])
+            finally:
+                _api_seconds.observe(time.perf_counter() - started, method=endpoint)
+            if 200 <= result[0] < 300:
+                _last_ok[endpoint] = time.time()
+            return result
+
+    return TimedHTTPXRequest
+
+
+def __getattr__(name: str):
+    # telegram yalnız bot sorğu obyektini qurduqda yüklənir (DB modulları və admin CLI üçün lazım deyil)
+    if name == "TimedHTTPXRequest":
+        cls = globals()[name] = _timed_request_class()
+        return cls
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def last_success(method: str) -> Optional[float]:
+    """Bot API metodunun son uğurlu cavab vaxtı (heç olmayıbsa None)"""
+    return _last_ok.get(method)
+
+
+# ---------- Hesabat ----------
+def _rows(histogram, label: str, top: int, sort_by: str = "p95") -> List[Dict]:
+    rows = []
+    for key, series in histogram.series():
+        labels = dict(key)
+        pct = histogram.percentiles(**labels)
+        rows.append({
+            "name": labels.get(label, "-"),
+            "count": series.count,
+            "total": series.total,
+            "p50": pct[0.5],
+            "p95": pct[0.95],
+            "p99": pct[0.99],
+        })
+    rows.sort(key=lambda r: r[sort_by], reverse=True)
+    return rows[:top]
+
+
+def summary(top: int = 8) -> Dict:
+    """/perf üçün: loop lag, ən yavaş handler-lər, DB və Bot API əməliyyatları"""
+    lag = _loop_lag.percentiles()
+    updates = REGISTRY.get("update_handle_seconds")
+    blocked = sorted(
+        ((dict(k).get("op", "-"), v) for k, v in _db_loop_blocked.samples()), key=lambda x: x[1], reverse=True
+    )
+    return {
+        "loop_lag": {"p50": lag[0.5], "p95": lag[0.95], "p99": lag[0.99], "max_1m": _loop_lag_max.value(),
+                     "samples": _loop_lag.count()},
+        "handlers": _rows(_handler_seconds, "handler", top),
+        "db": _rows(_db_seconds, "op", top, sort_by="total"),
+        "db_loop_blocked": blocked[:top],
+        "api": _rows(_api_seconds, "method", top),
+        "updates": updates.percentiles() if updates is not None else None,  # type: ignore[attr-defined]
+    }
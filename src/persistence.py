@@ -0,0 +1,187 @@
+"""
+Söhbət vəziyyətinin DB-də saxlanılması (PTB BasePersistence)
+
+user_data (yarımçıq anket, exec_* açarları), chat_data və ConversationHandler
+vəziyyətləri bot_state cədvəlinə yazılır ki, redeploy/çöküşdən sonra vətəndaş
+anketi qaldığı yerdən davam etdirsin.
+
+Yazılar qənaətlidir: hər qeyd pickle edilir və heşi son yazılanla eynidirsə
+DB-yə getmir; bir update_persistence dövrəsində dəyişən bütün qeydlər tək
+tranzaksiyada yazılır.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import pickle
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from metrics import REGISTRY
+
+logger = logging.getLogger("dsmf-persistence")
+
+_writes = REGISTRY.counter("persistence_writes_total", "bot_state cədvəlinə yazılan qeydlər")
+_skipped = REGISTRY.counter("persistence_unchanged_total", "Dəyişmədiyi üçün yazılmayan qeydlər")
+
+_USER, _CHAT, _CONV = "user", "chat", "conv:"
+
+
+def _digest(blob: bytes) -> bytes:
+    return hashlib.blake2b(blob, digest_size=16).digest()
+
+
+class DBPersistence(BasePersistence):
+    """bot_state cədvəli üzərində persistence (PostgreSQL və ya SQLite)"""
+
+    def __init__(self, *, use_sqlite: bool, update_interval: float = 5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.use_sqlite = use_sqlite
+        # (kind, key) -> son yazılmış dəyərin heşi
+        self._hashes: Dict[Tuple[str, str], bytes] = {}
+        # (kind, key) -> yazılacaq pickle (None - silinəcək)
+        self._dirty: Dict[Tuple[str, str], Optional[bytes]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # ---------- DB ----------
+    def _load(self, kind: str) -> list:
+        if self.use_sqlite:
+            from db_sqlite import load_bot_state_sqlite
+            return load_bot_state_sqlite(kind)
+        from db_operations import load_bot_state
+        return load_bot_state(kind)
+
+    def _save(self, rows: list) -> None:
+        if self.use_sqlite:
+            from db_sqlite import save_bot_state_sqlite
+            save_bot_state_sqlite(rows)
+        else:
+            from db_operations import save_bot_state
+            save_bot_state(rows)
+
+    def _load_objects(self, kind: str) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        try:
+            rows = self._load(kind)
+        except Exception as e:
+            logger.error("bot_state oxunmadı (%s): %s", kind, e)
+            return result
+        for key, blob in rows:
+            try:
+                result[key] = pickle.loads(blob)
+            except Exception as e:
+                # Köhnə versiyanın obyekti yüklənmədi - həmin qeyd sadəcə itirilir
+                logger.warning("bot_state qeydi oxunmadı (%s/%s): %s", kind, key, e)
+                continue
+            self._hashes[(kind, key)] = _digest(blob)
+        return result
+
+    # ---------- Yazı növbəsi ----------
+    def _stage(self, kind: str, key: str, obj: Any) -> None:
+        ident = (kind, key)
+        if obj is None:
+            if ident not in self._hashes and ident not in self._dirty:
+                return
+            self._dirty[ident] = None
+        else:
+            blob = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+            digest = _digest(blob)
+            if self._hashes.get(ident) == digest:
+                self._dirty.pop(ident, None)
+                _skipped.inc()
+                return
+            self._dirty[ident] = blob
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # flush() çağırılanda yazılacaq
+        # update_persistence bütün update_* çağırışlarını gather ilə işlədir;
+        # bu task onlardan sonra icra olunur və hamısını bir dəfəyə yazır
+        self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(0)
+        self._write_dirty()
+
+    def _write_dirty(self) -> None:
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        try:
+            self._save([(kind, key, blob) for (kind, key), blob in batch.items()])
+        except Exception as e:
+            logger.error("bot_state yazılmadı (%s qeyd): %s", len(batch), e)
+            # Növbəti dövrədə yenidən cəhd et (yeni dəyişikliklər üstünlük təşkil edir)
+            for ident, blob in batch.items():
+                self._dirty.setdefault(ident, blob)
+            return
+        for ident, blob in batch.items():
+            if blob is None:
+                self._hashes.pop(ident, None)
+            else:
+                self._hashes[ident] = _digest(blob)
+        _writes.inc(len(batch))
+
+    # ---------- BasePersistence ----------
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        data = self._load_objects(_USER)
+        return {int(k): v for k, v in data.items()}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        data = self._load_objects(_CHAT)
+        return {int(k): v for k, v in data.items()}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[tuple, object]:
+        data = self._load_objects(_CONV + name)
+        return {tuple(json.loads(k)): v for k, v in data.items()}
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        self._stage(_CONV + name, json.dumps(list(key)), new_state)
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        self._stage(_USER, str(user_id), data or None)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        self._stage(_CHAT, str(chat_id), data or None)
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        return None
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage(_USER, str(user_id), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage(_CHAT, str(chat_id), None)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        return None
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        return None
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        return None
+
+    async def flush(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            await self._flush_task
+        self._write_dirty()
+        logger.info("💾 Söhbət vəziyyəti yadda saxlanıldı (%s qeyd)", len(self._hashes))
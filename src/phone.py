@@ -0,0 +1,42 @@
+"""
+Azərbaycan mobil nömrələrinin yoxlanması və E.164 normallaşdırılması
+
+Tipik daxiletmələr ("0501234567", "+994 50 123 45 67", "994501234567")
+əvvəlcədən kompilyasiya olunmuş ifadə ilə, phonenumbers kitabxanası
+yüklənmədən yoxlanılır. Qalan hallar üçün phonenumbers yalnız lazım olanda
+import edilir və nəticə LRU keşdə saxlanılır.
+"""
+import re
+from functools import lru_cache
+from typing import Optional
+
+# Mobil operator kodları: Azercell (10, 50, 51), Bakcell (55, 99), Nar (70, 77), Naxtel (60)
+AZ_MOBILE_CODES = ("10", "50", "51", "55", "60", "70", "77", "99")
+
+_SEPARATORS_RE = re.compile(r"[\s\-().]")
+_AZ_MOBILE_RE = re.compile(r"^(?:\+994|00994|994|0)?(" + "|".join(AZ_MOBILE_CODES) + r")(\d{7})$")
+
+
+@lru_cache(maxsize=4096)
+def _parse_with_library(cleaned: str) -> Optional[str]:
+    import phonenumbers  # ağır modul - yalnız sürətli yol uğursuz olanda
+    try:
+        parsed = phonenumbers.parse(cleaned, "AZ")
+    except phonenumbers.NumberParseException:
+        return None
+    if parsed.country_code != 994 or not phonenumbers.is_valid_number(parsed):
+        return None
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
+
+def normalize_phone(raw: Optional[str]) -> Optional[str]:
+    """Azərbaycan nömrəsini +994XXXXXXXXX formasına sal; etibarsızdırsa None"""
+    if not raw:
+        return None
+    cleaned = _SEPARATORS_RE.sub("", raw.strip())
+    m = _AZ_MOBILE_RE.match(cleaned)
+    if m:
+        return f"+994{m.group(1)}{m.group(2)}"
+    if not cleaned or len(cleaned) > 20:
+        return None
+    return _parse_with_library(cleaned)
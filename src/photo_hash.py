@@ -0,0 +1,283 @@
+"""
+Vəsiqə şəkillərinin perseptual heşi və təkrar istifadənin aşkarlanması
+
+Hər göndərilmiş müraciətin vəsiqə şəkli fonda bir dəfə yüklənir, dHash
+(64 bit) proses pulunda hesablanır və DB-yə yazılır. Heşlər yaddaşdakı
+multi-index hashing cədvəllərində saxlanılır: Hamming məsafəsi üzrə
+axtarış bütün heşləri gəzmədən kiçik namizəd dəstinə baxır. Eyni şəkil
+başqa Telegram hesabından göndərilibsə icraçı mesajına xəbərdarlıq
+cavabı yazılır. Yüklənmiş baytlar eyni pulda lokal media anbarına da
+yazılır (media_store).
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import media_store
+from metrics import REGISTRY
+
+logger = logging.getLogger("dsmf-photo-hash")
+
+_hash_seconds = REGISTRY.histogram("photo_hash_seconds", "Şəklin yüklənməsi və heşlənməsi (san)")
+_hashed = REGISTRY.counter("photo_hash_total", "Heşlənən vəsiqə şəkilləri")
+_flagged = REGISTRY.counter("photo_reuse_flagged_total", "Başqa hesabdan təkrar göndərilmiş şəkillər")
+
+_HASH_SIZE = 8
+_MASK64 = (1 << 64) - 1
+_FILE_CACHE_SIZE = 10_000
+
+
+# ---------- Heş (proses pulunda işləyir: yalnız Pillow, config import edilmir) ----------
+def dhash_bytes(data: bytes) -> int:
+    """Şəklin 64-bitlik fərq heşi (dHash); BIGINT üçün işarəli qaytarılır"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEG-i kiçildilmiş miqyasda dekodla - tam ölçülü dekod lazım deyil
+        img.draft("L", (_HASH_SIZE * 4, _HASH_SIZE * 4))
+        small = img.convert("L").resize((_HASH_SIZE + 1, _HASH_SIZE), Image.Resampling.LANCZOS)
+        px = small.tobytes()
+    value = 0
+    bit = 0
+    for row in range(_HASH_SIZE):
+        base = row * (_HASH_SIZE + 1)
+        for col in range(_HASH_SIZE):
+            if px[base + col] > px[base + col + 1]:
+                value |= 1 << bit
+            bit += 1
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK64).bit_count()
+
+
+# ---------- Multi-index hashing ----------
+_CHUNKS = 4
+_CHUNK_BITS = 64 // _CHUNKS
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+
+
+def _flips(chunk: int, radius: int) -> List[int]:
+    """chunk-dan ən çox radius bit fərqlənən bütün dəyərlər"""
+    out = [chunk]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(_CHUNK_BITS), r):
+            v = chunk
+            for b in bits:
+                v ^= 1 << b
+            out.append(v)
+    return out
+
+
+class HammingIndex:
+    """
+    64-bitlik heşlər üçün multi-index hashing: heş 4 hissəyə (16 bit) bölünür,
+    hər hissə üçün ayrıca cədvəl. Məsafə <= r olan heşin ən azı bir hissəsi
+    r // 4 bitdən çox fərqlənmir (göyərçin yuvası prinsipi), ona görə yalnız
+    həmin qonşu açarlar yoxlanılır. BK-tree 64-bitlik təsadüfi heşlərdə
+    ağacın böyük hissəsini gəzir; bu üsulda namizədlər N / 65536 qaydasındadır.
+    """
+
+    def __init__(self):
+        self._items: Dict[int, list] = {}
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in range(_CHUNKS)]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        for key, items in self._items.items():
+            value = key - (1 << 64) if key >= (1 << 63) else key
+            for item in items:
+                yield value, item
+
+    def add(self, value: int, item) -> None:
+        key = value & _MASK64
+        self._size += 1
+        bucket = self._items.get(key)
+        if bucket is not None:
+            bucket.append(item)
+            return
+        self._items[key] = [item]
+        for i, table in enumerate(self._tables):
+            table.setdefault((key >> (i * _CHUNK_BITS)) & _CHUNK_MASK, set()).add(key)
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, object]]:
+        """(məsafə, element) siyahısı, məsafəyə görə sıralı"""
+        key = value & _MASK64
+        radius = max_distance // _CHUNKS
+        seen: Set[int] = set()
+        found: List[Tuple[int, object]] = []
+        for i, table in enumerate(self._tables):
+            for probe in _flips((key >> (i * _CHUNK_BITS)) & _CHUNK_MASK, radius):
+                for cand in table.get(probe, ()):
+                    if cand in seen:
+                        continue
+                    seen.add(cand)
+                    d = (cand ^ key).bit_count()
+                    if d <= max_distance:
+                        found.extend((d, item) for item in self._items[cand])
+        found.sort(key=lambda x: x[0])
+        return found
+
+
+# ---------- Fon konveyeri ----------
+_index = HammingIndex()
+# file_unique_id -> (heş, media açarı): eyni şəkil profil təkrarında yenidən yüklənmir
+_file_cache: "OrderedDict[str, Tuple[int, Optional[str]]]" = OrderedDict()
+_pool: Optional[ProcessPoolExecutor] = None
+_workers = 0
+_tasks: Set[asyncio.Task] = set()
+
+
+def _load_rows(use_sqlite: bool) -> list:
+    if use_sqlite:
+        from db_sqlite import get_photo_hashes_sqlite
+        return get_photo_hashes_sqlite()
+    from db_operations import get_photo_hashes
+    return get_photo_hashes()
+
+
+def _store(app_id: int, value: int, photo_key: Optional[str], use_sqlite: bool) -> None:
+    if use_sqlite:
+        from db_sqlite import set_photo_meta_sqlite
+        set_photo_meta_sqlite(app_id, value, photo_key)
+    else:
+        from db_operations import set_photo_meta
+        set_photo_meta(app_id, value, photo_key)
+
+
+async def load_index(use_sqlite: bool) -> int:
+    """Mövcud heşlərdən indeksi qur (başlanğıcda)"""
+    global _index
+    rows = await asyncio.to_thread(_load_rows, use_sqlite)
+    tree = HammingIndex()
+    for app_id, user_id, value in rows:
+        tree.add(value, (app_id, user_id))
+    # Yükləmə zamanı heşlənmiş yeni müraciətlər itməsin
+    loaded = {r[0] for r in rows}
+    for value, item in _index:
+        if item[0] not in loaded:
+            tree.add(value, item)
+    _index = tree
+    logger.info("🖼 Şəkil heşi indeksi yükləndi: %s qeyd", len(tree))
+    return len(tree)
+
+
+def _new_pool() -> Optional[ProcessPoolExecutor]:
+    if _workers <= 0:
+        return None
+    # fork işləyən event loop-un thread-lərini kopyalayır; spawn təhlükəsizdir
+    return ProcessPoolExecutor(max_workers=_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def start(*, use_sqlite: bool, workers: int) -> None:
+    global _pool, _workers
+    _workers = workers
+    if _pool is None:
+        _pool = _new_pool()
+    _spawn(load_index(use_sqlite), "photo-hash-index")
+
+
+def _spawn(coro, name: str) -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+async def _run_in_pool(fn, *args):
+    global _pool
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_pool, fn, *args)
+    except BrokenProcessPool:
+        # İşçi proses qəfil öldü (OOM və s.) - pulu yenidən qur və bir dəfə təkrarla
+        logger.warning("Şəkil emalı proses pulu sıradan çıxdı; yenidən qurulur")
+        old, _pool = _pool, _new_pool()
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+        return await loop.run_in_executor(_pool, fn, *args)
+
+
+async def _fetch(bot, file_id: str) -> Tuple[int, Optional[str]]:
+    """Şəkli bir dəfə yüklə; heşi və (anbar aktivdirsə) media açarını qaytar"""
+    tg_file = await bot.get_file(file_id)
+    unique_id = tg_file.file_unique_id
+    cached = _file_cache.get(unique_id)
+    if cached is not None and (cached[1] or not media_store.enabled()):
+        _file_cache.move_to_end(unique_id)
+        return cached
+    data = bytes(await tg_file.download_as_bytearray())
+    jobs = [_run_in_pool(dhash_bytes, data)]
+    if media_store.enabled():
+        jobs.append(_run_in_pool(media_store.store_bytes, data, media_store.root(), media_store.thumb_px()))
+    results = await asyncio.gather(*jobs)
+    result = (results[0], results[1] if len(results) > 1 else None)
+    _file_cache[unique_id] = result
+    while len(_file_cache) > _FILE_CACHE_SIZE:
+        _file_cache.popitem(last=False)
+    return result
+
+
+async def _process(bot, app_id: int, user_id: int, file_id: str, use_sqlite: bool, max_distance: int,
+                   on_match: Optional[Callable[[List[int]], Awaitable[None]]]) -> None:
+    started = time.perf_counter()
+    try:
+        value, photo_key = await _fetch(bot, file_id)
+        await asyncio.to_thread(_store, app_id, value, photo_key, use_sqlite)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        _hashed.inc(result="error")
+        logger.warning("Şəkil emal olunmadı: app=%s: %s", app_id, e)
+        return
+    _hash_seconds.observe(time.perf_counter() - started)
+    _hashed.inc(result="ok")
+    # Eyni istifadəçinin öz şəklini təkrar göndərməsi normaldır
+    matches = [item[0] for _, item in _index.search(value, max_distance) if item[1] != user_id]
+    _index.add(value, (app_id, user_id))
+    if matches and on_match:
+        _flagged.inc()
+        logger.info("⚠️ Vəsiqə şəkli təkrarı: app=%s, oxşar=%s", app_id, matches[:5])
+        try:
+            await on_match(matches)
+        except Exception as e:
+            logger.warning("Şəkil təkrarı bildirişi göndərilmədi: %s", e)
+
+
+def schedule(bot, *, app_id: int, user_id: int, file_id: str, use_sqlite: bool, max_distance: int,
+             on_match: Optional[Callable[[List[int]], Awaitable[None]]] = None) -> None:
+    """Müraciət yazıldıqdan sonra şəkli fonda emal et (handler-i gözlətmir)"""
+    _spawn(_process(bot, app_id, user_id, file_id, use_sqlite, max_distance, on_match), f"photo-hash-{app_id}")
+
+
+def clear() -> None:
+    """Bütün müraciətlər silindikdə (/clearall)"""
+    global _index
+    _index = HammingIndex()
+    _file_cache.clear()
+
+
+def index_size() -> int:
+    return len(_index)
+
+
+async def stop() -> None:
+    global _pool
+    for task in list(_tasks):
+        task.cancel()
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
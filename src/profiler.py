@@ -0,0 +1,163 @@
+"""
+İşləyən bot üçün seçmə (sampling) profiler
+
+Ayrıca thread müəyyən intervalla sys._current_frames() ilə bütün
+thread-lərin (event loop və asyncio.to_thread-də işləyən DB funksiyaları)
+stekini oxuyur. Kod dəyişdirilmir, tracing hook-ları qoyulmur - yük
+seçmə tezliyi ilə məhdudlaşır. Nəticə collapsed-stack formatındadır
+(flamegraph.pl, speedscope.app, inferno ilə açılır). Boş dayanan event
+loop (selector gözləməsi) "[idle]" kimi birləşdirilir.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# Bu funksiyalar stekin başındadırsa thread boşdur (I/O və ya iş gözləyir)
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+class ProfileResult:
+    def __init__(self, stacks: Counter, samples: int, duration: float, interval: float):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.interval = interval
+
+    def collapsed(self) -> str:
+        """flamegraph.pl formatı: "thread;frame;frame say" """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_own(self, n: int = 10) -> List[Tuple[str, int]]:
+        """src/ modullarının funksiyaları üzrə inklüziv nümunə sayı (idle xaric)"""
+        inclusive: Counter = Counter()
+        for stack, count in self.stacks.items():
+            if stack.endswith("[idle]"):
+                continue
+            seen = set()
+            for frame in stack.split(";")[1:]:
+                if frame.startswith("src/") and frame not in seen:
+                    seen.add(frame)
+                    inclusive[frame] += count
+        return inclusive.most_common(n)
+
+    def busy_ratio(self, thread_prefix: str = "MainThread") -> float:
+        total = busy = 0
+        for stack, count in self.stacks.items():
+            if stack.startswith(thread_prefix):
+                total += count
+                if not stack.endswith("[idle]"):
+                    busy += count
+        return busy / total if total else 0.0
+
+
+class SamplingProfiler:
+    """sys._current_frames() əsaslı profiler; start()/stop() istənilən thread-dən"""
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._stacks: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+        self._samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = os.path.abspath(code.co_filename)
+            if path.startswith(_SRC_DIR + os.sep):
+                where = "src/" + os.path.relpath(path, _SRC_DIR)
+            else:
+                where = "/".join(path.split(os.sep)[-2:])
+            name = getattr(code, "co_qualname", code.co_name)
+            label = f"{where}:{name}"
+            self._labels[code] = label
+        return label
+
+    def _sample(self, own_ident: int) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            top = frame.f_code
+            idle = (os.path.basename(top.co_filename), top.co_name) in _IDLE_FRAMES
+            thread = names.get(ident, f"thread-{ident}")
+            if idle:
+                self._stacks[f"{thread};[idle]"] += 1
+                continue
+            frames: List[str] = []
+            f = frame
+            while f is not None and len(frames) < self.max_depth:
+                frames.append(self._label(f.f_code))
+                f = f.f_back
+            frames.append(thread)
+            self._stacks[";".join(reversed(frames))] += 1
+        self._samples += 1
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        next_at = time.perf_counter()
+        while not self._stop.is_set():
+            self._sample(own)
+            next_at += self.interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_at = time.perf_counter()  # geri qalmışıq - nümunələri yığma
+
+    def start(self) -> None:
+        if self._thread is not None:
+            raise RuntimeError("Profiler artıq işləyir")
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> ProfileResult:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return ProfileResult(Counter(self._stacks), self._samples, time.perf_counter() - self._started, self.interval)
+
+
+_active: Optional[SamplingProfiler] = None
+
+
+def running() -> bool:
+    return _active is not None
+
+
+async def profile(seconds: float, interval: float = 0.01) -> ProfileResult:
+    """seconds müddətində profil yığ (eyni anda yalnız biri)"""
+    global _active
+    if _active is not None:
+        raise RuntimeError("Profiler artıq işləyir")
+    _active = SamplingProfiler(interval)
+    try:
+        _active.start()
+        await asyncio.sleep(seconds)
+    finally:
+        result = _active.stop()
+        _active = None
+    return result
+
+
+def save(result: ProfileResult, directory: str, prefix: str = "profile") -> str:
+    """Collapsed stack faylını diskə yaz; yolu qaytar"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(result.collapsed())
+    return path
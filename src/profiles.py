@@ -0,0 +1,72 @@
+"""
+Təkrar müraciət edən vətəndaşın şəxsi məlumatları (keşlənmiş)
+
+/start zamanı vətəndaşın son müraciətindəki ad, telefon, FIN və vəsiqə
+şəkli təklif olunur ki, bu sahələr yenidən doldurulmasın. Axtarış
+user_telegram_id üzrə qısa ömürlü LRU keşdən keçir; yeni müraciət
+göndərildikdə keş dərhal yenilənir.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger("dsmf-profiles")
+
+_CACHE_SIZE = 5_000
+# user_id -> (keşə yazılma vaxtı, profil və ya None)
+_cache: "OrderedDict[int, tuple[float, Optional[dict]]]" = OrderedDict()
+
+
+def _put(user_id: int, profile: Optional[dict]) -> None:
+    _cache[user_id] = (time.monotonic(), profile)
+    _cache.move_to_end(user_id)
+    while len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _load(user_id: int, use_sqlite: bool) -> Optional[dict]:
+    if use_sqlite:
+        from db_sqlite import get_latest_application_by_user_sqlite
+        row = get_latest_application_by_user_sqlite(user_id)
+        if not row:
+            return None
+        return {
+            "fullname": row.get("fullname"),
+            "phone": row.get("phone"),
+            "fin": row.get("fin"),
+            "id_photo_file_id": row.get("id_photo_file_id") or None,
+        }
+    from db_operations import get_latest_application_by_user
+    app = get_latest_application_by_user(user_id)
+    if not app:
+        return None
+    # PostgreSQL sxemində vəsiqə şəkli saxlanılmır
+    return {"fullname": app.fullname, "phone": app.phone, "fin": app.fin, "id_photo_file_id": None}
+
+
+def get_profile(user_id: int, *, use_sqlite: bool, ttl: float) -> Optional[dict]:
+    """Son müraciətdən profil (tam deyilsə None)"""
+    hit = _cache.get(user_id)
+    if hit and time.monotonic() - hit[0] < ttl:
+        _cache.move_to_end(user_id)
+        return hit[1]
+    try:
+        profile = _load(user_id, use_sqlite)
+    except Exception as e:
+        logger.warning("Profil oxunmadı: user=%s: %s", user_id, e)
+        return None
+    if profile and not all(profile.get(k) for k in ("fullname", "phone", "fin")):
+        profile = None
+    _put(user_id, profile)
+    return profile
+
+
+def remember(user_id: int, fullname: str, phone: str, fin: str, id_photo_file_id: Optional[str]) -> None:
+    """Yeni göndərilmiş müraciətlə keşi yenilə (DB-yə təkrar sorğu lazım olmur)"""
+    _put(user_id, {"fullname": fullname, "phone": phone, "fin": fin, "id_photo_file_id": id_photo_file_id})
+
+
+def clear() -> None:
+    """Bütün müraciətlər silindikdə (/clearall)"""
+    _cache.clear()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Miqyas testləri üçün sintetik məlumat (export, axtarış, SLA işləri)
+
+applications cədvəli real formatlı sətirlərlə toplu doldurulur:
+    - FIN (I/O hərfsiz), +994 mobil nömrələr, Azərbaycan dilində ad və mətn
+    - istifadəçilər üzrə əyri paylanma: az sayda istifadəçi çox müraciət edir
+    - üç müraciət növü (şikayət / ərizə / təklif)
+    - created_at: --days gün ərzində həftə içi iş saatlarına yığılan, artan
+      trend və elan günlərində partlayışlarla; ID-lər xronoloji sıradadır
+    - status yaşa görə: yeni müraciətlər əsasən gözləyir, köhnələr
+      cavablandırılıb və ya imtina edilib (cavab mətni, qeyd, updated_at ilə)
+    - "sui-istifadəçilər": son BLACKLIST_WINDOW_DAYS gündə həddən çox imtina
+      alan istifadəçilər və onların blacklisted_users sətirləri (bot bunu
+      imtina zamanı edir)
+
+Backend bot-dakı kimi seçilir (FORCE_SQLITE / DB_MODE=sqlite, əks halda
+DATABASE_URL). SQLite: bir tranzaksiyada executemany partiyaları;
+PostgreSQL: COPY FROM STDIN (psycopg2); digər SQLAlchemy URL-ləri üçün
+Core insert executemany.
+
+İstifadə (və ya python run.py seed ...):
+    python src/seed.py --rows 1000000 [--backend auto|sqlite|sqlalchemy]
+        [--days 365] [--users N] [--abusers 0.002] [--seed 1] [--batch 20000]
+        [--append]
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+USER_BASE = 100_000_000
+
+_FIRST = ["Əli", "Vüsal", "Rəşad", "Elvin", "Orxan", "Tural", "Kamran", "Fərid", "Ülvi", "Şahin",
+          "Nigar", "Aysel", "Günay", "Leyla", "Səbinə", "Nərmin", "Könül", "Türkan", "Xədicə", "Zəhra"]
+_LAST = ["Məmmədov", "Əliyev", "Həsənov", "Hüseynov", "Quliyev", "İsmayılov", "Cəfərov", "Abbasov",
+         "Rzayev", "Babayev", "Süleymanov", "Qasımov", "Nəsirov", "Şükürov", "Vəliyev"]
+_OPERATORS = ["50", "51", "55", "70", "77", "99", "10"]
+_FIN_ALPHABET = "0123456789ABCDEFGHJKLMNPQRSTUVWXYZ"  # FIN-də I və O yoxdur
+_PHRASES = [
+    "Pensiya təyinatı ilə bağlı müraciətim hələ də cavablandırılmayıb.",
+    "Əlilliyə görə müavinətin məbləği yanlış hesablanıb.",
+    "Ünvanlı sosial yardım ərizəmə baxılmasını xahiş edirəm.",
+    "İş stajım elektron sistemdə düzgün əks olunmayıb.",
+    "Sığorta haqqı ödənişləri şəxsi hesabımda görünmür.",
+    "Xahiş edirəm vəziyyəti araşdırıb mənə məlumat verəsiniz.",
+    "Sənədləri iki dəfə təqdim etmişəm, lakin nəticə yoxdur.",
+    "Ailə başçısını itirməyə görə pensiya haqqında məlumat almaq istəyirəm.",
+    "Qəbul günü və saatı barədə məlumat verməyinizi xahiş edirəm.",
+    "Təklifim xidmətlərin onlayn göstərilməsinin sadələşdirilməsidir.",
+]
+_REPLIES = [
+    "Müraciətiniz araşdırıldı, pensiyanız yenidən hesablanaraq növbəti ay ödəniləcək.",
+    "Məlumatlarınız yoxlanıldı, iş stajınız elektron sistemə əlavə edildi.",
+    "Ərizəniz qəbul olunub, nəticə barədə SMS ilə məlumatlandırılacaqsınız.",
+    "Zəhmət olmasa şəxsiyyət vəsiqəsi ilə ərazi şöbəsinə yaxınlaşın.",
+    "Təklifiniz üçün təşəkkür edirik, aidiyyəti şöbəyə yönləndirildi.",
+]
+_REJECT_REASONS = [
+    "Müraciət DSMF-in səlahiyyətinə aid deyil",
+    "Təkrar müraciət",
+    "Məlumatlar natamamdır",
+    "Təhqiramiz ifadələr",
+    "Spam",
+]
+# (sqlite etiketi, FormTypeDB dəyəri, pay)
+_FORM_TYPES = (("Şikayət", "complaint", 0.55), ("Ərizə", "application", 0.30), ("Təklif", "suggestion", 0.15))
+_FORM_WEIGHTS = [t[2] for t in _FORM_TYPES]
+_WEEKDAY_WEIGHT = (1.0, 1.0, 1.0, 1.0, 0.9, 0.5, 0.35)
+_HOUR_WEIGHT = (0.05, 0.03, 0.02, 0.02, 0.03, 0.05, 0.15, 0.4, 0.7, 1.0, 1.0, 1.0,
+                0.8, 0.7, 1.0, 1.0, 0.9, 0.8, 0.6, 0.5, 0.5, 0.4, 0.3, 0.15)
+_BODY_POOL = 512  # fərqli mətnlər (SimHash hesablanması bahalıdır, nəticə keşlənir)
+
+
+def _user_profile(u: int) -> Tuple[str, str, str]:
+    """İstifadəçi üçün sabit ad, telefon və FIN"""
+    rnd = random.Random(u)
+    male = rnd.random() < 0.5
+    first = rnd.choice(_FIRST[:10] if male else _FIRST[10:])
+    last = rnd.choice(_LAST) + ("" if male else "a")
+    father = rnd.choice(_FIRST[:10])
+    fullname = f"{last} {first} {father} {'oğlu' if male else 'qızı'}"
+    phone = f"+994{rnd.choice(_OPERATORS)}{rnd.randrange(10_000_000):07d}"
+    fin = "".join(rnd.choice(_FIN_ALPHABET) for _ in range(7))
+    return fullname, phone, fin
+
+
+class SyntheticData:
+    """Deterministik sintetik müraciətlər: eyni parametrlər eyni sətirləri verir.
+
+    rows() bir dəfə tam oxunduqdan sonra blacklist() imtina həddini keçən
+    istifadəçiləri qaytarır.
+    """
+
+    def __init__(self, rows: int, seed: int = 1, *, users: Optional[int] = None, days: int = 365,
+                 abuser_share: float = 0.002, key_prefix: str = "seed", now: Optional[datetime] = None):
+        from config import BAKU_TZ, BLACKLIST_REJECTION_THRESHOLD, BLACKLIST_WINDOW_DAYS
+
+        self.total = rows
+        self.seed = seed
+        self.users = max(users or rows // 3, 1)
+        self.days = max(days, 1)
+        self.abuser_share = abuser_share
+        self.key_prefix = key_prefix
+        self.now = now or datetime.now(BAKU_TZ).replace(tzinfo=None, microsecond=0)
+        self.threshold = BLACKLIST_REJECTION_THRESHOLD
+        self.window_days = BLACKLIST_WINDOW_DAYS
+        self.rejections: Counter = Counter()
+        self._fingerprints: Dict[str, Tuple[str, Optional[int]]] = {}
+        self._profiles: Dict[int, Tuple[str, str, str]] = {}
+
+    # ---------- Köməkçilər ----------
+    def _fingerprint(self, body: str) -> Tuple[str, Optional[int]]:
+        fp = self._fingerprints.get(body)
+        if fp is None:
+            from dedupe import fingerprint
+            fp = self._fingerprints[body] = fingerprint(body)
+        return fp
+
+    def _day_counts(self, rnd: random.Random, rows: int) -> List[int]:
+        """Gün çəkiləri: həftə günü, illik artım, təsadüfi elan günləri (x3)"""
+        start = (self.now - timedelta(days=self.days)).date()
+        weights = []
+        for d in range(self.days + 1):
+            w = _WEEKDAY_WEIGHT[(start + timedelta(days=d)).weekday()] * (1 + 0.5 * d / self.days)
+            if rnd.random() < 0.02:
+                w *= 3
+            weights.append(w)
+        total = sum(weights)
+        counts, acc, assigned = [], 0.0, 0
+        for w in weights:
+            acc += w
+            target = round(rows * acc / total)
+            counts.append(target - assigned)
+            assigned = target
+        return counts
+
+    def _abuse_bursts(self, rnd: random.Random) -> List[Tuple[datetime, int]]:
+        """Son pəncərədə həddən çox imtina alan istifadəçilərin müraciətləri"""
+        n = int(self.users * self.abuser_share)
+        bursts = []
+        for u in rnd.sample(range(self.users), min(n, self.users)):
+            for _ in range(self.threshold + rnd.randrange(3)):
+                seconds = rnd.uniform(60, self.window_days * 86400 * 0.9)
+                bursts.append((self.now - timedelta(seconds=seconds), u))
+        bursts.sort()
+        return bursts
+
+    def _status(self, rnd: random.Random, created: datetime) -> str:
+        age_days = (self.now - created).total_seconds() / 86400
+        r = rnd.random()
+        if age_days < 3:
+            return "pending" if r < 0.8 else ("completed" if r < 0.97 else "rejected")
+        if age_days < 14:
+            return "pending" if r < 0.35 else ("completed" if r < 0.88 else "rejected")
+        return "pending" if r < 0.06 else ("completed" if r < 0.86 else "rejected")
+
+    def _row(self, rnd: random.Random, i: int, u: int, created: datetime, bodies: List[str],
+             status: Optional[str] = None) -> Dict[str, Any]:
+        profile = self._profiles.get(u)
+        if profile is None:
+            profile = self._profiles[u] = _user_profile(u)
+        fullname, phone, fin = profile
+        status = status or self._status(rnd, created)
+        body = rnd.choice(bodies)
+        digest, sh = self._fingerprint(body)
+        label, code, _ = rnd.choices(_FORM_TYPES, weights=_FORM_WEIGHTS)[0]
+        executor = f"icraci{rnd.randrange(12)}"
+        notes = reply_text = None
+        updated = created
+        if status != "pending":
+            updated = min(created + timedelta(hours=rnd.expovariate(1 / 30)), self.now)
+            if status == "completed":
+                reply_text = rnd.choice(_REPLIES)
+                notes = f"Replied by @{executor}"
+            else:
+                reply_text = rnd.choice(_REJECT_REASONS)
+                notes = f"Rejected by @{executor}: {reply_text}"
+                if created >= self.now - timedelta(days=self.window_days):
+                    self.rejections[USER_BASE + u] += 1
+        return {
+            "user_telegram_id": USER_BASE + u,
+            "user_username": f"user{u}",
+            "fullname": fullname,
+            "phone": phone,
+            "fin": fin,
+            "id_photo_file_id": f"AgACAgIAAxkBAAI{i:012d}",
+            "form_label": label,
+            "form_code": code,
+            "body": body,
+            "status": status,
+            "notes": notes,
+            "reply_text": reply_text,
+            "body_hash": digest,
+            "simhash": sh,
+            "submit_key": f"{self.key_prefix}:{i}",
+            "photo_hash": rnd.getrandbits(63) if rnd.random() < 0.8 else None,
+            "created_at": created,
+            "updated_at": updated,
+        }
+
+    # ---------- İctimai ----------
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Xronoloji sıra ilə müraciətlər; istifadəçi seçimi əyridir (u ~ N·r^2.5)"""
+        rnd = random.Random(self.seed)
+        self.rejections.clear()
+        bodies = [" ".join(rnd.sample(_PHRASES, rnd.randint(2, 5))) for _ in range(_BODY_POOL)]
+        bursts = self._abuse_bursts(rnd)[: self.total]
+        counts = self._day_counts(rnd, self.total - len(bursts))
+        day0 = datetime.combine((self.now - timedelta(days=self.days)).date(), datetime.min.time())
+        hours = list(range(24))
+        b = 0
+        i = 0
+        for d, count in enumerate(counts):
+            if not count:
+                continue
+            day = day0 + timedelta(days=d)
+            times = sorted(
+                min(day + timedelta(hours=h, seconds=rnd.randrange(3600)), self.now - timedelta(seconds=1))
+                for h in rnd.choices(hours, weights=_HOUR_WEIGHT, k=count)
+            )
+            for created in times:
+                while b < len(bursts) and bursts[b][0] <= created:
+                    yield self._row(rnd, i, bursts[b][1], bursts[b][0], bodies, status="rejected")
+                    b += 1
+                    i += 1
+                u = int(self.users * rnd.random() ** 2.5)
+                yield self._row(rnd, i, u, created, bodies)
+                i += 1
+        for created, u in bursts[b:]:
+            yield self._row(rnd, i, u, created, bodies, status="rejected")
+            i += 1
+
+    def blacklist(self) -> List[Tuple[int, str]]:
+        """(user_telegram_id, səbəb): son pəncərədə imtina sayı həddə çatanlar"""
+        return [(uid, f"{n} imtina / {self.window_days} gün")
+                for uid, n in sorted(self.rejections.items()) if n >= self.threshold]
+
+
+def batches(it: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for row in it:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------- Yükləmə ----------
+def _progress(done: int, total: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed else 0.0
+    print(f"\r  {done:>10,}/{total:,} sətir  {rate:>9,.0f} sətir/s", end="", file=sys.stderr, flush=True)
+
+
+def _ts(value: datetime) -> str:
+    """db_sqlite formatı: YYYY-MM-DD HH:MM:SS (strftime-dan sürətli)"""
+    return value.isoformat(sep=" ", timespec="seconds")
+
+
+def existing_rows(use_sqlite: bool) -> int:
+    if use_sqlite:
+        from db_sqlite import get_sqlite_connection, init_sqlite_db
+        init_sqlite_db()
+        with get_sqlite_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM applications").fetchone()[0]
+    from sqlalchemy import func, select
+    from database import Application
+    from db_operations import engine, init_db
+    init_db()
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Application.__table__)).scalar_one()
+
+
+def load_sqlite(data: SyntheticData, batch: int = 20_000, progress: bool = False) -> int:
+    """executemany partiyaları bir tranzaksiyada; sinxronizasiya yükləmə müddətinə söndürülür"""
+    from db_sqlite import get_sqlite_connection, init_sqlite_db
+
+    init_sqlite_db()
+    done = 0
+    started = time.perf_counter()
+    with get_sqlite_connection() as conn:
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-262144")  # 256 MB
+        dropped: List[str] = []
+        if conn.execute("SELECT 1 FROM applications LIMIT 1").fetchone() is None:
+            # Boş cədvəldə indekslər sonda bir dəfə qurulur (hər sətirdə yenilənməkdən xeyli sürətli);
+            # yükləmə yarımçıq qalsa da init_sqlite_db onları bərpa edir
+            dropped = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='applications' AND sql IS NOT NULL")]
+            for name in dropped:
+                conn.execute(f"DROP INDEX {name}")
+        for chunk in batches(data.rows(), batch):
+            conn.executemany(
+                "INSERT INTO applications (user_telegram_id, user_username, fullname, phone, fin, id_photo_file_id, "
+                "form_type, subject, body, status, notes, reply_text, body_hash, simhash, submit_key, photo_hash, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                # SQLite-da imtina səbəbi yalnız notes-da saxlanılır (bot kimi)
+                [(r["user_telegram_id"], r["user_username"], r["fullname"], r["phone"], r["fin"],
+                  r["id_photo_file_id"], r["form_label"], r["body"][:150], r["body"], r["status"], r["notes"],
+                  r["reply_text"] if r["status"] == "completed" else None, r["body_hash"], r["simhash"],
+                  r["submit_key"], r["photo_hash"], _ts(r["created_at"]), _ts(r["updated_at"]))
+                 for r in chunk],
+            )
+            done += len(chunk)
+            if progress:
+                _progress(done, data.total, started)
+        now = _ts(data.now)
+        conn.executemany(
+            "INSERT OR IGNORE INTO blacklisted_users (user_telegram_id, reason, created_at) VALUES (?, ?, ?)",
+            [(uid, reason, now) for uid, reason in data.blacklist()],
+        )
+    if dropped:
+        init_sqlite_db()
+    with get_sqlite_connection() as conn:
+        conn.execute("ANALYZE")
+    return done
+
+
+_COPY_COLUMNS = ("user_telegram_id", "user_username", "fullname", "phone", "fin", "form_type", "body",
+                 "body_hash", "simhash", "submit_key", "photo_hash", "status", "notes", "reply_text",
+                 "created_at", "updated_at")
+
+
+def load_sqlalchemy(data: SyntheticData, batch: int = 20_000, progress: bool = False) -> int:
+    """PostgreSQL-də COPY FROM STDIN, digər dialektlərdə Core insert executemany"""
+    from sqlalchemy import select
+    from database import Application, ApplicationStatus, BlacklistedUser, FormTypeDB
+    from db_operations import engine, init_db
+
+    init_db()
+    statuses = {"pending": ApplicationStatus.PENDING, "completed": ApplicationStatus.COMPLETED,
+                "rejected": ApplicationStatus.REJECTED}
+    table = Application.__table__
+    done = 0
+    started = time.perf_counter()
+    raw = engine.raw_connection() if engine.dialect.name == "postgresql" else None
+    try:
+        cursor = raw.cursor() if raw is not None else None
+        if cursor is not None and hasattr(cursor, "copy_expert"):
+            # SQLAlchemy Enum sütunları enum ADLARINI saxlayır (PENDING, COMPLAINT)
+            sql = f"COPY applications ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+            for chunk in batches(data.rows(), batch):
+                buf = io.StringIO()
+                writer = csv.writer(buf)
+                for r in chunk:
+                    writer.writerow((
+                        r["user_telegram_id"], r["user_username"], r["fullname"], r["phone"], r["fin"],
+                        FormTypeDB(r["form_code"]).name, r["body"], r["body_hash"], r["simhash"], r["submit_key"],
+                        r["photo_hash"], statuses[r["status"]].name, r["notes"], r["reply_text"],
+                        _ts(r["created_at"]), _ts(r["updated_at"]),
+                    ))
+                buf.seek(0)
+                cursor.copy_expert(sql, buf)
+                done += len(chunk)
+                if progress:
+                    _progress(done, data.total, started)
+            raw.commit()
+        else:
+            with engine.begin() as conn:
+                for chunk in batches(data.rows(), batch):
+                    conn.execute(table.insert(), [{
+                        "user_telegram_id": r["user_telegram_id"], "user_username": r["user_username"],
+                        "fullname": r["fullname"], "phone": r["phone"], "fin": r["fin"],
+                        "form_type": FormTypeDB(r["form_code"]), "body": r["body"],
+                        "status": statuses[r["status"]], "notes": r["notes"], "reply_text": r["reply_text"],
+                        "body_hash": r["body_hash"], "simhash": r["simhash"], "submit_key": r["submit_key"],
+                        "photo_hash": r["photo_hash"], "created_at": r["created_at"], "updated_at": r["updated_at"],
+                    } for r in chunk])
+                    done += len(chunk)
+                    if progress:
+                        _progress(done, data.total, started)
+    finally:
+        if raw is not None:
+            raw.close()
+
+    blacklist = data.blacklist()
+    with engine.begin() as conn:
+        if blacklist:
+            bl = BlacklistedUser.__table__
+            existing = set(conn.execute(
+                select(bl.c.user_telegram_id).where(bl.c.user_telegram_id >= USER_BASE)).scalars())
+            rows = [{"user_telegram_id": uid, "reason": reason, "created_at": data.now}
+                    for uid, reason in blacklist if uid not in existing]
+            if rows:
+                conn.execute(bl.insert(), rows)
+        conn.exec_driver_sql("ANALYZE")
+    return done
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Sintetik müraciətlərlə DB doldurma (miqyas testləri)")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--backend", choices=("auto", "sqlite", "sqlalchemy"), default="auto",
+                        help="auto: bot kimi FORCE_SQLITE/DB_MODE əsasında")
+    parser.add_argument("--days", type=int, default=365, help="created_at bu qədər gün geriyə paylanır")
+    parser.add_argument("--users", type=int, default=0, help="fərqli istifadəçi sayı (default: rows/3)")
+    parser.add_argument("--abusers", type=float, default=0.002,
+                        help="imtina həddini keçən istifadəçilərin payı (blacklist)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=20_000)
+    parser.add_argument("--append", action="store_true", help="cədvəldə sətirlər varsa da əlavə et")
+    args = parser.parse_args(argv)
+
+    if args.backend == "sqlite":
+        os.environ["FORCE_SQLITE"] = "1"
+    elif args.backend == "sqlalchemy":
+        os.environ["FORCE_SQLITE"] = "0"
+        os.environ.pop("DB_MODE", None)
+    os.environ.setdefault("SQL_TRACE", "0")  # toplu INSERT-lər yavaş sorğu kimi loglanmasın
+    use_sqlite = os.getenv("FORCE_SQLITE", "0").lower() in ("1", "true", "yes") \
+        or os.getenv("DB_MODE", "").lower() == "sqlite"
+
+    count = existing_rows(use_sqlite)
+    if count and not args.append:
+        print(f"❌ applications cədvəlində artıq {count} sətir var. Əlavə etmək üçün --append verin.",
+              file=sys.stderr)
+        return 1
+    # Təkrar doldurmada submit_key unikal qalsın
+    prefix = f"seed{int(time.time())}" if count else "seed"
+    data = SyntheticData(args.rows, args.seed, users=args.users or None, days=args.days,
+                         abuser_share=args.abusers, key_prefix=prefix)
+    target = os.getenv("SQLITE_DB_PATH", "data/applications.db") if use_sqlite else "SQLAlchemy (DATABASE_URL)"
+    print(f"🌱 {args.rows:,} müraciət → {target}", file=sys.stderr)
+    started = time.perf_counter()
+    done = (load_sqlite if use_sqlite else load_sqlalchemy)(data, args.batch, progress=True)
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ {done:,} sətir {elapsed:.1f} s-də ({done / elapsed:,.0f} sətir/s), "
+          f"{len(data.blacklist())} istifadəçi qara siyahıda", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+Telegram-a gedən sorğular üçün mərkəzi göndərmə planlayıcısı
+
+PTB-nin BaseRateLimiter interfeysi üzərindən bütün context.bot.* çağırışları
+buradan keçir:
+  - qlobal və hər chat üçün ayrıca token bucket (Telegram flood limitləri)
+  - prioritet sinifləri: vətəndaş > icraçı > kosmetik redaktə > kütləvi göndəriş
+  - RetryAfter (429) alındıqda chat dondurulur və sorğu yenidən növbəyə qoyulur
+  - eyni mesajın hələ göndərilməmiş redaktəsi yenisi ilə əvəzlənir (coalescing)
+"""
+import asyncio
+import bisect
+import contextvars
+import itertools
+import logging
+import time
+from enum import IntEnum
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from metrics import REGISTRY
+
+logger = logging.getLogger("dsmf-send")
+
+
+class Priority(IntEnum):
+    CITIZEN = 0    # Vətəndaşa təsdiq/cavab mesajları
+    EXECUTOR = 1   # İcraçı qrupuna bildirişlər
+    COSMETIC = 2   # Qrup mesajlarının status redaktələri
+    BULK = 3       # Kütləvi elanlar
+
+
+# Limitlənən (mesaj yaradan/dəyişən) endpoint-lər; qalanları birbaşa gedir
+_EDIT_ENDPOINTS = frozenset({
+    "editMessageText",
+    "editMessageCaption",
+    "editMessageReplyMarkup",
+    "editMessageMedia",
+})
+_SEND_ENDPOINTS = frozenset({
+    "sendMessage",
+    "sendPhoto",
+    "sendDocument",
+    "sendMediaGroup",
+    "sendVideo",
+    "sendAudio",
+    "sendVoice",
+    "sendAnimation",
+    "sendSticker",
+    "copyMessage",
+    "forwardMessage",
+})
+THROTTLED_ENDPOINTS = _EDIT_ENDPOINTS | _SEND_ENDPOINTS
+
+_queue_depth = REGISTRY.gauge("send_queue_depth", "Göndərilməyi gözləyən Bot API sorğuları")
+_queue_wait = REGISTRY.histogram("send_queue_wait_seconds", "Sorğunun növbədə gözləmə müddəti")
+_requests_total = REGISTRY.counter("send_requests_total", "Planlayıcıdan keçən Bot API sorğuları")
+_retry_after_total = REGISTRY.counter("send_retry_after_total", "Alınan RetryAfter (429) cavabları")
+_coalesced_total = REGISTRY.counter("send_coalesced_total", "Əvəzlənmiş (birləşdirilmiş) redaktələr")
+
+
+def _retry_seconds(exc: RetryAfter) -> float:
+    value = exc.retry_after
+    if hasattr(value, "total_seconds"):
+        return float(value.total_seconds())  # type: ignore[union-attr]
+    return float(value)
+
+
+class TokenBucket:
+    """Sadə token bucket: saniyədə `rate` token, maksimum `capacity`"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Növbəti token üçün gözləmə (saniyə); 0 - dərhal olar"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1.0
+
+    def block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class _Pending:
+    __slots__ = (
+        "priority", "seq", "chat_id", "endpoint", "callback", "args", "kwargs",
+        "future", "enqueued", "attempts", "edit_key", "ctx",
+    )
+
+    def __init__(self, priority, seq, chat_id, endpoint, callback, args, kwargs, future, edit_key):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.endpoint = endpoint
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.future: asyncio.Future = future
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+        self.edit_key = edit_key
+        # Çağıranın konteksti (loq/trace dəyişənləri göndərmə taskına ötürülür)
+        self.ctx = contextvars.copy_context()
+
+
+class SendScheduler(BaseRateLimiter[Dict[str, Any]]):
+    """Prioritetli, chat-əsaslı limitli göndərmə növbəsi.
+
+    rate_limit_args: {"priority": Priority.X} ilə prioritet açıq verilə bilər.
+    Verilmədikdə: şəxsi chat -> CITIZEN, qrupa göndəriş -> EXECUTOR,
+    qrupda redaktə -> COSMETIC.
+    """
+
+    def __init__(
+        self,
+        global_per_sec: float = 25.0,
+        private_per_sec: float = 1.0,
+        group_per_min: float = 20.0,
+        burst: int = 3,
+        max_retries: int = 3,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.max_retries = max_retries
+        self._private_rate = private_per_sec
+        self._group_rate = group_per_min / 60.0
+        self._burst = max(1, burst)
+        self._global = TokenBucket(global_per_sec, max(1.0, global_per_sec))
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        self._queue: List[Tuple[int, int, _Pending]] = []
+        self._edits: Dict[tuple, _Pending] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+        self._last_gc = time.monotonic()
+        for prio in Priority:
+            _queue_depth.set_function(lambda p=prio: self._depth(p), priority=prio.name.lower())
+
+    # ---------- BaseRateLimiter interfeysi ----------
+    async def initialize(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch_loop(), name="send-scheduler")
+            logger.info("✅ Send scheduler işə düşdü")
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        # Növbədə qalanları limitsiz göndər ki, vətəndaş bildirişləri itməsin
+        pending = [item for _, _, item in self._queue]
+        self._queue.clear()
+        self._edits.clear()
+        for item in pending:
+            await self._execute(item, final=True)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        if not self.enabled or endpoint not in THROTTLED_ENDPOINTS or self._dispatcher is None:
+            return await self._call_direct(callback, args, kwargs, endpoint)
+
+        chat_id = data.get("chat_id")
+        priority = self._priority_for(endpoint, chat_id, rate_limit_args)
+        _requests_total.inc(endpoint=endpoint, priority=priority.name.lower())
+
+        edit_key = None
+        if endpoint in _EDIT_ENDPOINTS:
+            edit_key = (endpoint, chat_id, data.get("message_id"), data.get("inline_message_id"))
+            queued = self._edits.get(edit_key)
+            if queued is not None and not queued.future.done():
+                # Köhnə redaktə hələ göndərilməyib - yenisi ilə əvəzlə
+                queued.callback, queued.args, queued.kwargs = callback, args, kwargs
+                _coalesced_total.inc(endpoint=endpoint)
+                return await asyncio.shield(queued.future)
+
+        loop = asyncio.get_running_loop()
+        item = _Pending(
+            int(priority), next(self._seq), chat_id, endpoint,
+            callback, args, kwargs, loop.create_future(), edit_key,
+        )
+        self._enqueue(item)
+        if edit_key is not None:
+            self._edits[edit_key] = item
+        return await asyncio.shield(item.future)
+
+    # ---------- Daxili məntiq ----------
+    @staticmethod
+    def _priority_for(endpoint: str, chat_id: Any, rate_limit_args: Optional[Dict[str, Any]]) -> Priority:
+        if rate_limit_args and "priority" in rate_limit_args:
+            return Priority(rate_limit_args["priority"])
+        is_private = isinstance(chat_id, int) and chat_id > 0
+        if is_private:
+            return Priority.CITIZEN
+        if endpoint in _EDIT_ENDPOINTS:
+            return Priority.COSMETIC
+        return Priority.EXECUTOR
+
+    def _bucket_for(self, chat_id: Any) -> Optional[TokenBucket]:
+        if chat_id is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            rate = self._private_rate if is_private else self._group_rate
+            bucket = TokenBucket(rate, self._burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _enqueue(self, item: _Pending) -> None:
+        bisect.insort(self._queue, (item.priority, item.seq, item), key=lambda t: (t[0], t[1]))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _depth(self, priority: Optional[Priority] = None) -> int:
+        if priority is None:
+            return len(self._queue)
+        return sum(1 for p, _, _ in self._queue if p == priority)
+
+    async def _sleep(self, seconds: float) -> None:
+        assert self._wakeup is not None
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=max(seconds, 0.001))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            if not self._queue:
+                self._gc_buckets()
+                await self._sleep(60.0)
+                continue
+            now = time.monotonic()
+            global_wait = self._global.delay(now)
+            if global_wait > 0:
+                await self._sleep(global_wait)
+                continue
+            chosen: Optional[int] = None
+            min_wait = 60.0
+            blocked = set()
+            for idx, (_, _, item) in enumerate(self._queue):
+                if item.chat_id in blocked:
+                    continue
+                bucket = self._bucket_for(item.chat_id)
+                wait = bucket.delay(now) if bucket else 0.0
+                if wait <= 0:
+                    chosen = idx
+                    break
+                # Eyni chat-in sonrakı sorğuları da gözləməlidir (FIFO)
+                blocked.add(item.chat_id)
+                min_wait = min(min_wait, wait)
+            if chosen is None:
+                await self._sleep(min_wait)
+                continue
+            _, _, item = self._queue.pop(chosen)
+            self._global.take(now)
+            bucket = self._bucket_for(item.chat_id)
+            if bucket is not None:
+                bucket.take(now)
+            if item.edit_key is not None and self._edits.get(item.edit_key) is item:
+                del self._edits[item.edit_key]
+            _queue_wait.observe(now - item.enqueued, priority=Priority(item.priority).name.lower())
+            task = asyncio.create_task(self._execute(item), context=item.ctx)
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _execute(self, item: _Pending, final: bool = False) -> None:
+        try:
+            result = await item.callback(*item.args, **item.kwargs)
+        except RetryAfter as exc:
+            delay = _retry_seconds(exc)
+            _retry_after_total.inc(endpoint=item.endpoint)
+            item.attempts += 1
+            logger.warning(
+                "⏳ RetryAfter %.0fs: endpoint=%s chat=%s cəhd=%d",
+                delay, item.endpoint, item.chat_id, item.attempts,
+            )
+            bucket = self._bucket_for(item.chat_id)
+            (bucket or self._global).block(delay)
+            if final or item.attempts > self.max_retries:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+                return
+            self._enqueue(item)
+        except Exception as exc:
+            if not item.future.done():
+                item.future.set_exception(exc)
+        else:
+            if not item.future.done():
+                item.future.set_result(result)
+
+    async def _call_direct(self, callback, args, kwargs, endpoint: str):
+        attempts = 0
+        while True:
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                attempts += 1
+                _retry_after_total.inc(endpoint=endpoint)
+                if attempts > self.max_retries:
+                    raise
+                await asyncio.sleep(_retry_seconds(exc))
+
+    def _gc_buckets(self) -> None:
+        """Uzun müddət istifadə olunmayan chat bucket-lərini sil"""
+        now = time.monotonic()
+        if now - self._last_gc < 300:
+            return
+        self._last_gc = now
+        for chat_id in [cid for cid, b in self._chats.items() if b.idle(now)]:
+            del self._chats[chat_id]
+
+    # ---------- Statistika ----------
+    def stats(self) -> Dict[str, Any]:
+        by_priority = {p.name.lower(): self._depth(p) for p in Priority}
+        waits = {}
+        for p in Priority:
+            label = p.name.lower()
+            if _queue_wait.count(priority=label):
+                waits[label] = _queue_wait.percentiles((0.5, 0.95, 0.99), priority=label)
+        return {
+            "depth": len(self._queue),
+            "by_priority": by_priority,
+            "inflight": len(self._inflight),
+            "chats_tracked": len(self._chats),
+            "wait": waits,
+            "retry_after": sum(v for _, v in _retry_after_total.samples()),
+            "coalesced": sum(v for _, v in _coalesced_total.samples()),
+        }
@@ -0,0 +1,300 @@
+"""
+SQL sorğularının ölçülməsi və yavaş sorğu jurnalı
+
+- PostgreSQL (SQLAlchemy): engine-ə before/after_cursor_execute hadisələri
+  bağlanır. SQLite: bağlantı TracedConnection fabriki ilə açılır; trace
+  callback icra olunan hər ifadəni (executescript daxil) sayır, kursor
+  execute-u müddəti ölçür (sqlite3 trace callback-i vaxt vermir).
+- Sorğular literal və parametrləri "?" ilə əvəzlənmiş formaya salınıb
+  toplanır (/perf-də ən ağır ifadələr). SLOW_QUERY_MS-dən uzun çəkənlər
+  EXPLAIN planı ilə loglanır (SLOW_QUERY_ANALYZE=1: PostgreSQL-də SELECT
+  üçün EXPLAIN ANALYZE - sorğu event loop-da təkrar icra olunur, default söndürülüb);
+  eyni ifadə üçün plan SLOW_QUERY_EXPLAIN_INTERVAL_S-də bir dəfə alınır.
+- Hər yenilik üzrə sorğu sayı contextvar ilə hesablanır (update_processor);
+  hədd aşılanda ən çox təkrarlanan ifadə loglanır - N+1 nümunələri görünür.
+"""
+import contextvars
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter as _Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    SQL_TRACE_ENABLED,
+    SLOW_QUERY_MS,
+    SLOW_QUERY_EXPLAIN,
+    SLOW_QUERY_ANALYZE,
+    SLOW_QUERY_EXPLAIN_INTERVAL_S,
+    UPDATE_QUERY_WARN,
+)
+import tracing
+from metrics import REGISTRY
+
+logger = logging.getLogger("dsmf-sql")
+
+_SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_stmt_seconds = REGISTRY.histogram("sql_statement_seconds", "SQL ifadələrinin müddəti", buckets=_SQL_BUCKETS)
+_slow_total = REGISTRY.counter("sql_slow_total", "SLOW_QUERY_MS-dən uzun çəkən ifadələr")
+_per_update = REGISTRY.histogram("sql_queries_per_update", "Bir yenilik emalında icra olunan SQL ifadələri",
+                                 buckets=_COUNT_BUCKETS)
+
+_MAX_STATEMENTS = 500  # toplanan fərqli ifadələrin sayı (qalanları "<digər>")
+
+# ---------- Normallaşdırma ----------
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PARAM_RE = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize(sql: str) -> str:
+    """Literal və parametrləri "?" ilə əvəzlə, boşluqları sıxlaşdır"""
+    s = _STRING_RE.sub("?", sql)
+    s = _PARAM_RE.sub("?", s)
+    s = _NUMBER_RE.sub("?", s)
+    s = _SPACE_RE.sub(" ", s).strip()
+    return _IN_LIST_RE.sub("(?)", s)
+
+
+# ---------- Toplama ----------
+class _Scope:
+    """Bir yeniliyin emalı ərzində icra olunan ifadələr"""
+
+    __slots__ = ("count", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.statements: _Counter = _Counter()
+
+
+_scope: contextvars.ContextVar[Optional[_Scope]] = contextvars.ContextVar("sql_scope", default=None)
+# normallaşdırılmış ifadə -> [say, cəmi san, maks san]
+_stats: Dict[str, List[float]] = {}
+_last_explain: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _record(backend: str, sql: str, elapsed: float, scoped: bool = True) -> str:
+    key = normalize(sql)
+    _stmt_seconds.observe(elapsed, backend=backend)
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            if len(_stats) >= _MAX_STATEMENTS:
+                entry = _stats.setdefault("<digər>", [0, 0.0, 0.0])
+            else:
+                entry = _stats[key] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed
+        if elapsed > entry[2]:
+            entry[2] = elapsed
+    tracing.record("sql", "sql", time.time() - elapsed, elapsed, sql=key[:200])
+    if scoped:
+        scope = _scope.get()
+        if scope is not None:
+            scope.count += 1
+            scope.statements[key] += 1
+    return key
+
+
+def _should_explain(key: str) -> bool:
+    if not SLOW_QUERY_EXPLAIN:
+        return False
+    now = time.monotonic()
+    with _lock:
+        last = _last_explain.get(key)
+        if last is not None and now - last < SLOW_QUERY_EXPLAIN_INTERVAL_S:
+            return False
+        _last_explain[key] = now
+    return True
+
+
+def _log_slow(backend: str, key: str, elapsed: float, plan: Optional[str]) -> None:
+    _slow_total.inc(backend=backend)
+    if plan:
+        logger.warning("🐢 Yavaş sorğu (%s, %.1f ms): %s\n%s", backend, elapsed * 1000, key, plan)
+    else:
+        logger.warning("🐢 Yavaş sorğu (%s, %.1f ms): %s", backend, elapsed * 1000, key)
+
+
+def _verb(sql: str) -> str:
+    parts = sql.split(None, 1)
+    return parts[0].upper() if parts else ""
+
+
+def _explainable(sql: str) -> bool:
+    # DDL/PRAGMA üçün plan yoxdur (EXPLAIN onları yenidən yoxlayıb xəta verir)
+    return _verb(sql) in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+# ---------- SQLAlchemy ----------
+def _sa_before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_trace_start", []).append(time.perf_counter())
+
+
+def _sa_explain(conn, cursor, statement: str, parameters) -> Optional[str]:
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if SLOW_QUERY_ANALYZE and _verb(statement) in ("SELECT", "WITH") else "EXPLAIN "
+    elif dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+    raw = cursor.connection
+    explain = raw.cursor()
+    # PostgreSQL-də uğursuz EXPLAIN tranzaksiyanı pozmasın
+    savepoint = dialect == "postgresql"
+    try:
+        if savepoint:
+            explain.execute("SAVEPOINT sql_trace_explain")
+        explain.execute(prefix + statement, parameters)
+        rows = explain.fetchall()
+        if savepoint:
+            explain.execute("RELEASE SAVEPOINT sql_trace_explain")
+    except Exception as e:
+        if savepoint:
+            try:
+                explain.execute("ROLLBACK TO SAVEPOINT sql_trace_explain")
+            except Exception:
+                pass
+        return f"(plan alınmadı: {e})"
+    finally:
+        explain.close()
+    return "\n".join("  " + " | ".join(str(c) for c in row) for row in rows)
+
+
+def _sa_after(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("sql_trace_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    key = _record(conn.dialect.name, statement, elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        explain = not executemany and _explainable(statement) and _should_explain(key)
+        plan = _sa_explain(conn, cursor, statement, parameters) if explain else None
+        _log_slow(conn.dialect.name, key, elapsed, plan)
+
+
+def _sa_error(context) -> None:
+    # Xəta ilə bitən ifadədə after_cursor_execute çağırılmır - başlanğıc vaxtı yığılmasın
+    conn = context.connection
+    if conn is not None:
+        starts = conn.info.get("sql_trace_start")
+        if starts:
+            starts.pop()
+
+
+def install_sqlalchemy(engine) -> None:
+    """Engine-in bütün ifadələrini ölç (db_operations idxalında çağırılır)"""
+    if not SQL_TRACE_ENABLED:
+        return
+    from sqlalchemy import event
+
+    event.listen(engine, "before_cursor_execute", _sa_before)
+    event.listen(engine, "after_cursor_execute", _sa_after)
+    event.listen(engine, "handle_error", _sa_error)
+
+
+# ---------- SQLite ----------
+class TracedCursor(sqlite3.Cursor):
+    """execute/executemany müddətini ölçən kursor"""
+
+    def execute(self, sql, parameters=()):  # type: ignore[override]
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._done(sql, parameters, time.perf_counter() - started, explain=True)
+
+    def executemany(self, sql, seq_of_parameters):  # type: ignore[override]
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._done(sql, None, time.perf_counter() - started, explain=False)
+
+    def _done(self, sql: str, parameters, elapsed: float, explain: bool) -> None:
+        # Yenilik üzrə say trace callback-dədir (skript daxilindəki ifadələr də sayılır)
+        key = _record("sqlite3", sql, elapsed, scoped=False)
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            explain = explain and _explainable(sql) and _should_explain(key)
+            plan = self._explain(sql, parameters) if explain else None
+            _log_slow("sqlite3", key, elapsed, plan)
+
+    def _explain(self, sql: str, parameters) -> Optional[str]:
+        try:
+            rows = sqlite3.Cursor(self.connection).execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            return f"(plan alınmadı: {e})"
+        return "\n".join("  " + " | ".join(str(c) for c in tuple(row)) for row in rows)
+
+
+def _sqlite_trace(statement: str) -> None:
+    # Trace callback hər icra olunan ifadədə (skript daxilindəkilər də) çağırılır
+    scope = _scope.get()
+    if scope is not None:
+        scope.count += 1
+        scope.statements[normalize(statement)] += 1
+
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3.connect(factory=...) üçün: ölçən kursor + trace callback"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_sqlite_trace)
+
+    def cursor(self, factory=TracedCursor):  # type: ignore[override]
+        return super().cursor(factory)
+
+    # Connection.execute C səviyyəsində standart kursor yaradır - ölçən kursordan keçirilir
+    def execute(self, sql, parameters=()):  # type: ignore[override]
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):  # type: ignore[override]
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def sqlite_factory():
+    """get_sqlite_connection üçün bağlantı sinfi (ölçmə söndürülübsə standart)"""
+    return TracedConnection if SQL_TRACE_ENABLED else sqlite3.Connection
+
+
+# ---------- Yenilik üzrə say ----------
+def begin_update() -> Tuple[_Scope, contextvars.Token]:
+    scope = _Scope()
+    return scope, _scope.set(scope)
+
+
+def end_update(handle: Tuple[_Scope, contextvars.Token]) -> int:
+    scope, token = handle
+    _scope.reset(token)
+    _per_update.observe(scope.count)
+    if UPDATE_QUERY_WARN and scope.count >= UPDATE_QUERY_WARN:
+        stmt, repeats = scope.statements.most_common(1)[0]
+        logger.warning("🔁 Bir yenilikdə %s SQL ifadəsi (N+1 ehtimalı); ən çox təkrarlanan ×%s: %s",
+                       scope.count, repeats, stmt[:300])
+    return scope.count
+
+
+# ---------- Hesabat ----------
+def top(n: int = 5, sort_by: str = "total") -> List[Dict]:
+    """Ən ağır ifadələr (/perf üçün)"""
+    with _lock:
+        rows = [{"sql": k, "count": int(v[0]), "total": v[1], "max": v[2]} for k, v in _stats.items()]
+    rows.sort(key=lambda r: r[sort_by], reverse=True)
+    return rows[:n]
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+        _last_explain.clear()
@@ -0,0 +1,316 @@
+"""
+Yenilik üzrə trace-lər: handler, DB və Bot API span-ları
+
+Hər Update üçün update_processor kök span açır (update_id, istifadəçi,
+chat, yenilik növü). Aktiv span contextvar-da saxlanılır və handler-lərə,
+asyncio.to_thread ilə icra olunan DB funksiyalarına, SQL ifadələrinə və
+göndərmə növbəsindən keçən Bot API sorğularına ötürülür (növbə çağıranın
+kontekstini saxlayır). Bitmiş trace-lər yaddaşdakı halqa buferə düşür
+(/trace) və TRACE_FILE verilibsə JSON lines kimi ayrıca thread-də yazılır.
+Log sətirlərinə aktiv trace ID-si əlavə olunur.
+
+Aktiv trace yoxdursa span() heç nə etmir - fon tapşırıqları ölçülmür.
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+from metrics import REGISTRY
+
+logger = logging.getLogger("dsmf-trace")
+
+_traces_total = REGISTRY.counter("traces_total", "Bitmiş trace-lər (nəticə üzrə)")
+_spans_dropped = REGISTRY.counter("trace_spans_dropped_total", "Limit aşıldığı üçün yazılmayan span-lar")
+
+_MAX_SPANS = 300  # bir trace-də span limiti (N+1 dövrləri yaddaşı şişirtməsin)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start", "duration", "attrs", "error")
+
+    def __init__(self, trace: "Trace", name: str, kind: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(4)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.attrs = attrs
+        self.error: Optional[str] = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+class Trace:
+    __slots__ = ("trace_id", "root", "spans", "finished", "dropped")
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(6)
+        self.root: Optional[Span] = None
+        self.spans: List[Span] = []
+        self.finished = False
+        self.dropped = 0
+
+    @property
+    def error(self) -> Optional[str]:
+        for span in self.spans:
+            if span.error:
+                return f"{span.name}: {span.error}"
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name if root else None,
+            "start": round(root.start, 6) if root else None,
+            "duration_ms": round(root.duration * 1000, 3) if root and root.duration is not None else None,
+            "attrs": root.attrs if root else {},
+            "error": self.error,
+            "dropped_spans": self.dropped,
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+_enabled = False
+_sample_rate = 1.0
+_buffer: Deque[Trace] = deque(maxlen=500)
+_file_queue: "Optional[queue.SimpleQueue]" = None
+_writer: Optional[threading.Thread] = None
+
+
+# ---------- Konfiqurasiya ----------
+def configure(*, enabled: bool, buffer_size: int = 500, sample_rate: float = 1.0,
+              file_path: Optional[str] = None) -> None:
+    global _enabled, _sample_rate, _buffer
+    _enabled = enabled
+    _sample_rate = sample_rate
+    if buffer_size != _buffer.maxlen:
+        _buffer = deque(_buffer, maxlen=buffer_size)
+    if enabled and file_path:
+        _start_writer(file_path)
+
+
+def _start_writer(path: str) -> None:
+    global _file_queue, _writer
+    if _writer is not None:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _file_queue = queue.SimpleQueue()
+    _writer = threading.Thread(target=_write_loop, args=(path, _file_queue), name="trace-writer", daemon=True)
+    _writer.start()
+    logger.info("🧵 Trace-lər fayla yazılır: %s", path)
+
+
+def _write_loop(path: str, q: "queue.SimpleQueue") -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        while True:
+            item = q.get()
+            if item is None:
+                break
+            f.write(item)
+            f.write("\n")
+            if q.empty():
+                f.flush()
+
+
+def shutdown() -> None:
+    """Fayl yazan thread-i dayandır (növbədəki trace-lər yazılır)"""
+    global _writer, _file_queue
+    if _writer is not None and _file_queue is not None:
+        _file_queue.put(None)
+        _writer.join(timeout=5)
+    _writer = None
+    _file_queue = None
+
+
+# ---------- Span-lar ----------
+def _update_attrs(update: Any) -> Dict[str, Any]:
+    attrs: Dict[str, Any] = {"update_id": getattr(update, "update_id", None)}
+    user = getattr(update, "effective_user", None)
+    chat = getattr(update, "effective_chat", None)
+    if user is not None:
+        attrs["user_id"] = user.id
+    if chat is not None:
+        attrs["chat_id"] = chat.id
+    if getattr(update, "callback_query", None) is not None:
+        attrs["type"] = "callback"
+        attrs["data"] = (update.callback_query.data or "")[:64]
+    elif getattr(update, "message", None) is not None:
+        msg = update.message
+        attrs["type"] = "command" if (msg.text or "").startswith("/") else ("photo" if msg.photo else "message")
+        if attrs["type"] == "command":
+            attrs["command"] = msg.text.split()[0][:32]
+    else:
+        attrs["type"] = "other"
+    return attrs
+
+
+def begin_update(update: Any) -> Optional[contextvars.Token]:
+    """Yenilik üçün kök span aç (update_processor); söndürülübsə None"""
+    if not _enabled or (_sample_rate < 1.0 and random.random() >= _sample_rate):
+        return None
+    trace = Trace()
+    root = Span(trace, "update", "update", None, _update_attrs(update))
+    trace.root = root
+    trace.spans.append(root)
+    return _current.set(root)
+
+
+def end_update(token: Optional[contextvars.Token], error: Optional[BaseException] = None) -> None:
+    if token is None:
+        return
+    root = _current.get()
+    _current.reset(token)
+    if root is None:
+        return
+    trace = root.trace
+    root.duration = time.time() - root.start
+    if error is not None:
+        root.error = f"{type(error).__name__}: {error}"[:300]
+    trace.finished = True
+    _traces_total.inc(result="error" if trace.error else "ok")
+    _buffer.append(trace)
+    if _file_queue is not None:
+        try:
+            _file_queue.put(json.dumps(trace.to_dict(), ensure_ascii=False, default=str))
+        except Exception as e:
+            logger.warning("Trace serializasiya olunmadı: %s", e)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attrs):
+    """Aktiv trace daxilində uşaq span; trace yoxdursa None verir"""
+    parent = _current.get()
+    if parent is None or parent.trace.finished:
+        yield None
+        return
+    trace = parent.trace
+    if len(trace.spans) >= _MAX_SPANS:
+        trace.dropped += 1
+        _spans_dropped.inc()
+        yield None
+        return
+    current = Span(trace, name, kind, parent.span_id, attrs)
+    trace.spans.append(current)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        current.duration = time.time() - current.start
+        _current.reset(token)
+
+
+def record(name: str, kind: str, start: float, duration: float, error: Optional[str] = None, **attrs) -> None:
+    """Artıq ölçülmüş əməliyyatı span kimi əlavə et (SQL hadisələri üçün)"""
+    parent = _current.get()
+    if parent is None or parent.trace.finished:
+        return
+    trace = parent.trace
+    if len(trace.spans) >= _MAX_SPANS:
+        trace.dropped += 1
+        _spans_dropped.inc()
+        return
+    s = Span(trace, name, kind, parent.span_id, attrs)
+    s.start = start
+    s.duration = duration
+    s.error = error
+    trace.spans.append(s)
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current.get()
+    return current.trace.trace_id if current is not None else None
+
+
+class TraceLogFilter(logging.Filter):
+    """Log qeydlərinə trace ID-si əlavə edir (%(trace)s)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = current_trace_id()
+        record.trace_id = trace_id or ""
+        record.trace = f" [{trace_id}]" if trace_id else ""
+        return True
+
+
+# ---------- Oxuma ----------
+def recent(limit: int = 10, user_id: Optional[int] = None, slow: bool = False) -> List[Trace]:
+    traces = list(_buffer)
+    if user_id is not None:
+        traces = [t for t in traces if t.root and t.root.attrs.get("user_id") == user_id]
+    if slow:
+        traces.sort(key=lambda t: t.root.duration or 0.0 if t.root else 0.0, reverse=True)
+    else:
+        traces.reverse()
+    return traces[:limit]
+
+
+def find(trace_id: str) -> Optional[Trace]:
+    trace_id = trace_id.lower()
+    for trace in reversed(_buffer):
+        if trace.trace_id.startswith(trace_id):
+            return trace
+    return None
+
+
+def render_tree(trace: Trace, max_lines: int = 60) -> str:
+    """Span ağacı: başlanğıcdan offset, müddət, xəta"""
+    root = trace.root
+    if root is None:
+        return trace.trace_id
+    children: Dict[Optional[str], List[Span]] = {}
+    for s in trace.spans:
+        if s is not root:
+            children.setdefault(s.parent_id, []).append(s)
+    lines: List[str] = []
+
+    def walk(node: Span, depth: int) -> None:
+        if len(lines) >= max_lines:
+            return
+        offset = (node.start - root.start) * 1000
+        dur = f"{node.duration * 1000:.1f}ms" if node.duration is not None else "…"
+        label = node.name
+        detail = node.attrs.get("sql") or node.attrs.get("method")
+        if detail and node.kind == "sql":
+            label = f"{label} {str(detail)[:60]}"
+        mark = f" ❌ {node.error}" if node.error else ""
+        lines.append(f"{'  ' * depth}+{offset:.0f}ms {label} [{node.kind}] {dur}{mark}")
+        for child in sorted(children.get(node.span_id, []), key=lambda c: c.start):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    hidden = len(trace.spans) - len(lines)
+    if hidden > 0:
+        lines.append(f"… daha {hidden} span")
+    if trace.dropped:
+        lines.append(f"… limitə görə yazılmayan: {trace.dropped}")
+    return "\n".join(lines)
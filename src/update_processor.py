@@ -0,0 +1,114 @@
+"""
+Yeniliklərin paralel emalı (istifadəçi daxilində ardıcıllıq saxlanılır)
+
+Eyni istifadəçinin (və ya istifadəçisiz yeniliklərdə eyni chat-in) yenilikləri
+gəliş sırası ilə, bir-birinin ardınca emal olunur - ConversationHandler
+vəziyyəti ziddiyyətli olmur. Fərqli istifadəçilər isə məhdud sayda işçi ilə
+paralel emal olunur.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+import sql_trace
+import tracing
+import update_recorder
+from metrics import REGISTRY
+
+logger = logging.getLogger("dsmf-updates")
+
+_lock_wait = REGISTRY.histogram("update_lock_wait_seconds", "Eyni istifadəçinin əvvəlki yeniliyini gözləmə müddəti")
+_handle_time = REGISTRY.histogram("update_handle_seconds", "Yeniliyin emal müddəti")
+_processed = REGISTRY.counter("updates_processed_total", "Emalı başa çatan yeniliklər")
+_in_flight = REGISTRY.gauge("updates_in_flight", "Hazırda emal olunan yeniliklər")
+
+
+def update_key(update: object) -> Optional[int]:
+    """Ardıcıllıq açarı: istifadəçi ID-si, yoxdursa chat ID-si"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Açar üzrə ardıcıl, açarlar arası paralel emal.
+
+    Baza semafor yalnız gözləyən yeniliklərin ümumi sayını məhdudlaşdırır;
+    işçi limiti açar kilidi alındıqdan SONRA tətbiq olunur. Beləliklə bir
+    istifadəçinin növbəsi işçi yerlərini tutub digərlərini bloklamır.
+    """
+
+    def __init__(self, max_concurrent_updates: int, max_pending: int = 1024):
+        super().__init__(max(max_pending, max_concurrent_updates))
+        self._workers_limit = max_concurrent_updates
+        self._workers = asyncio.Semaphore(max_concurrent_updates)
+        # açar -> [kilid, istifadəçi sayı]; sayğac sıfırlananda açar silinir
+        self._locks: Dict[int, List[Any]] = {}
+        self._active = 0
+        _in_flight.set_function(lambda: self._active)
+
+    @property
+    def workers(self) -> int:
+        return self._workers_limit
+
+    async def do_process_update(self, update: object, coroutine: "Awaitable[Any]") -> None:
+        update_recorder.record(update)
+        key = update_key(update)
+        if key is None:
+            await self._run(update, coroutine)
+            return
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        started = time.monotonic()
+        try:
+            async with entry[0]:
+                _lock_wait.observe(time.monotonic() - started)
+                await self._run(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+    async def _run(self, update: object, coroutine: "Awaitable[Any]") -> None:
+        async with self._workers:
+            self._active += 1
+            started = time.monotonic()
+            # Yenilik ərzində icra olunan SQL ifadələri sayılır (N+1 aşkarlanması)
+            queries = sql_trace.begin_update()
+            trace = tracing.begin_update(update)
+            error: Optional[BaseException] = None
+            try:
+                await coroutine
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._active -= 1
+                _handle_time.observe(time.monotonic() - started)
+                _processed.inc()
+                sql_trace.end_update(queries)
+                tracing.end_update(trace, error)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self._workers_limit,
+            "active": self._active,
+            "keys_waiting": sum(1 for e in self._locks.values() if e[1] > 1),
+            "keys_tracked": len(self._locks),
+        }
+
+    async def initialize(self) -> None:
+        logger.info("⚙️ Paralel emal: %s işçi (istifadəçi üzrə ardıcıl)", self._workers_limit)
+
+    async def shutdown(self) -> None:
+        self._locks.clear()
@@ -0,0 +1,240 @@
+"""
+Gələn yeniliklərin anonimləşdirilmiş qeydi (bench/replay.py üçün)
+
+UPDATE_RECORD_FILE verilibsə update_processor hər Update-i gəliş anında
+növbəyə qoyur; ayrıca thread onu dict-ə çevirir, şəxsi məlumatları
+deterministik qarışdırır və gzip JSON lines faylına əlavə edir. Event loop
+yalnız növbəyə qoyma qədər vaxt itirir, növbə doludursa yenilik atılır.
+
+Qarışdırma (HMAC açarı UPDATE_RECORD_KEY, yoxdursa tokendən törədilir):
+    - istifadəçi ID-ləri sabit süni ID-yə çevrilir (admin və qrup ID-ləri qalır)
+    - ad, username, mətn, caption, telefon: hər söz eyni uzunluqda, eyni
+      simvol sinfi ilə (böyük/kiçik hərf, rəqəm) əvəzlənir - eyni söz hər
+      yerdə eyni nəticə verir, FIN/telefon yoxlamaları və dublikat aşkarlanması
+      replay zamanı real trafikdəki kimi işləyir
+    - telefon nömrəsində ölkə/operator kodu saxlanılır, son 7 rəqəm qarışdırılır
+    - file_id/file_unique_id açarlı HMAC tokenə çevrilir (tokenlə vəsiqə
+      şəkli yüklənə bilməz; eyni fayl eyni token - dublikat yoxlaması qalır)
+    - komandalar, callback data, /start reply_<id>|reject_<id> deep link-ləri
+      və tarixlər dəyişmir
+
+Fayl formatı: {"meta": {...}} başlıq sətri (hər işə düşmədə) və
+{"t": unix_vaxt, "update": {...}} sətirləri. Fayl append rejimində açılır -
+bir neçə gzip üzvü ardıcıl oxunur.
+"""
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from metrics import REGISTRY
+from phone import normalize_phone
+
+logger = logging.getLogger("dsmf-recorder")
+
+_recorded = REGISTRY.counter("updates_recorded_total", "Qeyd faylına yazılan yeniliklər")
+_dropped = REGISTRY.counter("updates_record_dropped_total", "Növbə dolu olduğu üçün yazılmayan yeniliklər")
+
+FORMAT_VERSION = 1
+FAKE_USER_BASE = 7_000_000_000
+
+_LOWER = "abcçdeəfgğhxıijkqlmnoöprsştuüvyz"
+_UPPER = "ABCÇDEƏFGĞHXIİJKQLMNOÖPRSŞTUÜVYZ"
+_DIGITS = "0123456789"
+_WORD_RE = re.compile(r"\w+")
+# İcraçı deep link-i (bot.start): müraciət ID-si şəxsi məlumat deyil, replay onu bağlayır
+_DEEP_LINK_RE = re.compile(r"^/start(?:@\w+)? (?:reply|reject)_\d+$")
+
+# Bu açarlardakı sətirlər qarışdırılır
+_TEXT_KEYS = frozenset({
+    "text", "caption", "first_name", "last_name", "username", "phone_number",
+    "title", "bio", "vcard", "address", "query",
+})
+# Telegram fayl identifikatorları (bot tokeni ilə faylı yükləməyə imkan verir)
+_FILE_KEYS = frozenset({"file_id", "file_unique_id"})
+# Bu obyektlərin "id" sahəsi istifadəçi/chat ID-sidir
+_ID_PARENTS = frozenset({
+    "from", "chat", "user", "sender_chat", "forward_from", "forward_from_chat",
+    "new_chat_member", "old_chat_member", "left_chat_member", "new_chat_members", "via_bot",
+})
+
+
+class Scrambler:
+    """Deterministik, uzunluğu və simvol sinfini saxlayan qarışdırıcı"""
+
+    def __init__(self, key: bytes, keep_ids: Iterable[int] = ()):
+        self._key = key
+        self._keep_ids = frozenset(keep_ids)
+        self._words: Dict[str, str] = {}
+
+    def _digest(self, kind: str, value: str, length: int) -> bytes:
+        out = b""
+        counter = 0
+        while len(out) < length:
+            out += hmac.new(self._key, f"{kind}:{counter}:{value}".encode(), hashlib.sha256).digest()
+            counter += 1
+        return out
+
+    def user_id(self, uid: int) -> int:
+        if uid <= 0 or uid in self._keep_ids:
+            return uid
+        digest = self._digest("id", str(uid), 8)
+        return FAKE_USER_BASE + int.from_bytes(digest[:8], "big") % 1_000_000_000
+
+    def file_id(self, value: str) -> str:
+        digest = self._digest("f", value, 24)
+        return "rec-" + base64.urlsafe_b64encode(digest[:24]).decode()
+
+    def word(self, word: str) -> str:
+        cached = self._words.get(word)
+        if cached is not None:
+            return cached
+        digest = self._digest("w", word, len(word))
+        chars = []
+        for ch, b in zip(word, digest):
+            if ch.isdigit():
+                chars.append(_DIGITS[b % 10])
+            elif ch.isupper():
+                chars.append(_UPPER[b % len(_UPPER)])
+            elif ch.isalpha():
+                chars.append(_LOWER[b % len(_LOWER)])
+            else:
+                chars.append(ch)
+        result = "".join(chars)
+        if len(self._words) < 100_000:
+            self._words[word] = result
+        return result
+
+    def phone(self, raw: str) -> str:
+        """Son 7 rəqəm qarışdırılır, format və operator kodu qalır"""
+        normalized = normalize_phone(raw) or raw
+        replacement = iter(self.word(normalized[-7:]))
+        chars = list(raw)
+        remaining = 7
+        for i in range(len(chars) - 1, -1, -1):
+            if remaining == 0:
+                break
+            if chars[i].isdigit():
+                remaining -= 1
+                chars[i] = "#"
+        return "".join(next(replacement) if ch == "#" else ch for ch in chars)
+
+    def text(self, value: str) -> str:
+        if not value:
+            return value
+        if normalize_phone(value.strip()):
+            return self.phone(value)
+        if value.startswith("/"):
+            if _DEEP_LINK_RE.match(value):
+                return value
+            command, sep, rest = value.partition(" ")
+            return command + sep + _WORD_RE.sub(lambda m: self.word(m.group()), rest)
+        return _WORD_RE.sub(lambda m: self.word(m.group()), value)
+
+    def update(self, data: Any, parent: Optional[str] = None) -> Any:
+        """Update.to_dict() nəticəsini qarışdır (yeni obyekt qaytarır)"""
+        if isinstance(data, list):
+            return [self.update(item, parent) for item in data]
+        if not isinstance(data, dict):
+            return data
+        out: Dict[str, Any] = {}
+        for key, value in data.items():
+            if key in _TEXT_KEYS and isinstance(value, str):
+                out[key] = self.text(value)
+            elif key in _FILE_KEYS and isinstance(value, str):
+                out[key] = self.file_id(value)
+            elif key == "id" and parent in _ID_PARENTS and isinstance(value, int):
+                out[key] = self.user_id(value)
+            elif key in ("user_id", "chat_id") and isinstance(value, int):
+                out[key] = self.user_id(value)
+            elif key == "url" and isinstance(value, str):
+                out[key] = None
+            else:
+                out[key] = self.update(value, key)
+        return out
+
+
+def derive_key(secret: str, token: Optional[str]) -> bytes:
+    """UPDATE_RECORD_KEY verilməyibsə tokendən sabit açar (restartlar arası eyni nəticə)"""
+    if secret:
+        return secret.encode()
+    return hashlib.sha256(f"dsmf-record:{token}".encode()).digest()
+
+
+_queue: "Optional[queue.Queue]" = None
+_writer: Optional[threading.Thread] = None
+
+
+def configure(path: str, *, key: bytes, keep_ids: Iterable[int] = (), meta: Optional[Dict[str, Any]] = None,
+              max_mb: float = 0, queue_size: int = 10000) -> None:
+    """Qeydi başlat (path boşdursa heç nə etmir)"""
+    global _queue, _writer
+    if not path or _writer is not None:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    header = {"version": FORMAT_VERSION, "started": round(time.time(), 3), **(meta or {})}
+    _queue = queue.Queue(maxsize=queue_size)
+    _writer = threading.Thread(
+        target=_write_loop,
+        args=(path, _queue, Scrambler(key, keep_ids), header, int(max_mb * 1024 * 1024)),
+        name="update-recorder",
+        daemon=True,
+    )
+    _writer.start()
+    logger.warning("🎙️ Yeniliklər anonimləşdirilərək qeyd olunur: %s", path)
+
+
+def record(update: object) -> None:
+    """Yeniliyi növbəyə qoy (event loop-dan çağırılır, bloklamır)"""
+    if _queue is None:
+        return
+    try:
+        _queue.put_nowait((time.time(), update))
+    except queue.Full:
+        _dropped.inc()
+
+
+def _write_loop(path: str, q: "queue.Queue", scrambler: Scrambler, header: Dict[str, Any], max_bytes: int) -> None:
+    written = 0
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        f.write(json.dumps({"meta": header}, ensure_ascii=False) + "\n")
+        while True:
+            item = q.get()
+            if item is None:
+                break
+            if max_bytes and written >= max_bytes:
+                continue
+            ts, update = item
+            try:
+                line = json.dumps({"t": round(ts, 3), "update": scrambler.update(update.to_dict())},
+                                  ensure_ascii=False, default=str)
+            except Exception as e:
+                logger.warning("⚠️ Yenilik qeyd edilmədi: %s", e)
+                continue
+            f.write(line + "\n")
+            written += len(line) + 1
+            _recorded.inc()
+            if max_bytes and written >= max_bytes:
+                logger.warning("🎙️ Qeyd limiti (%s MB) doldu - yeni yeniliklər yazılmır", max_bytes // (1024 * 1024))
+            if q.empty():
+                f.flush()
+
+
+def shutdown() -> None:
+    """Yazan thread-i dayandır (növbədəki yeniliklər yazılır)"""
+    global _writer, _queue
+    if _writer is not None and _queue is not None:
+        _queue.put(None)
+        _writer.join(timeout=10)
+    _writer = None
+    _queue = None